@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -10,19 +11,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
-from app.models import init_db
-from app.routers import questions, evaluations, analytics, model_info
+from app.services.metrics import MetricsMiddleware, instrument_engine
+app.add_middleware(MetricsMiddleware)
+
+from app.models import init_db, engine, async_engine
+from app.services.rollup_service import ensure_rollups
+from app.services.near_duplicates import near_duplicate_index
+from app.services.search_index import ensure_search_index
+from app.routers import questions, evaluations, analytics, model_info, jobs, metrics
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    ensure_rollups()
+    # Indexes existing questions and evaluations the first time, which takes a while on a large database
+    await asyncio.to_thread(ensure_search_index)
+    # Loads the signatures, computing them for questions stored before they were recorded
+    await asyncio.to_thread(near_duplicate_index.warm)
+    # Batch runs don't survive a restart; report the ones a previous process left behind
+    await evaluations.batch_runner.fail_interrupted_runs()
+    # Also resumes jobs left unfinished by a previous process once their leases expire
+    await evaluations.job_queue.start()
+    await analytics.compaction_job.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await evaluations.job_queue.stop()
+    await analytics.compaction_job.stop()
+    await async_engine.dispose()
 
 app.include_router(questions.router)
 app.include_router(evaluations.router)
 app.include_router(analytics.router)
 app.include_router(model_info.router)
+app.include_router(jobs.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Text, Float, create_engine
+import os
+import time
+from sqlalchemy import Column, Integer, String, Text, Float, Index, LargeBinary, create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import deferred, sessionmaker
+from sqlalchemy.schema import CreateColumn
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 
 Base = declarative_base()
 
@@ -14,6 +18,8 @@ class QuestionDB(Base):
     subject = Column(String, index=True)
     reference_answer = Column(Text, nullable=False)
     difficulty = Column(String, default="Medium")
+    # MinHash signature of text + reference_answer for near-duplicate detection (see near_duplicates)
+    minhash = deferred(Column(LargeBinary))
 
 class EvaluationDB(Base):
     __tablename__ = "evaluations"
@@ -25,6 +31,133 @@ class EvaluationDB(Base):
     clarity_score = Column(Float)
     completeness_score = Column(Float)
     reasoning = Column(Text)
+    # Unix time; NULL for evaluations stored before it was recorded
+    created_at = Column(Float, index=True, default=time.time)
+
+    # Covering indexes so analytics aggregates never read the response/reasoning blobs
+    __table_args__ = (
+        Index("ix_evaluations_model_scores", "model_name", "accuracy_score", "clarity_score", "completeness_score"),
+        Index("ix_evaluations_question_scores", "question_id", "accuracy_score", "clarity_score", "completeness_score"),
+    )
+
+class LLMCallDB(Base):
+    """Token usage, latency and cost of one upstream call made for an evaluation."""
+    __tablename__ = "llm_calls"
+    id = Column(Integer, primary_key=True, index=True)
+    evaluation_id = Column(Integer, index=True)
+    role = Column(String, nullable=False)  # "candidate" or "judge"
+    provider = Column(String, nullable=False)
+    model_name = Column(String, nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Float, nullable=False)
+    cost_usd = Column(Float)  # NULL when the model has no entry in the price table
+
+    __table_args__ = (
+        Index("ix_llm_calls_role_provider_latency", "role", "provider", "latency_ms"),
+    )
+
+# Analytics rollups: running counts and score sums, maintained on every evaluation insert.
+# first_evaluation_id keeps groups in the order they first appeared.
+class ModelRollupDB(Base):
+    __tablename__ = "rollup_by_model"
+    model_name = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    sum_accuracy = Column(Float, nullable=False, default=0)
+    sum_clarity = Column(Float, nullable=False, default=0)
+    sum_completeness = Column(Float, nullable=False, default=0)
+    first_evaluation_id = Column(Integer)
+
+class SubjectRollupDB(Base):
+    __tablename__ = "rollup_by_subject"
+    subject = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    sum_accuracy = Column(Float, nullable=False, default=0)
+    sum_clarity = Column(Float, nullable=False, default=0)
+    sum_completeness = Column(Float, nullable=False, default=0)
+    first_evaluation_id = Column(Integer)
+
+class ModelSubjectDifficultyRollupDB(Base):
+    __tablename__ = "rollup_by_model_subject_difficulty"
+    model_name = Column(String, primary_key=True)
+    subject = Column(String, primary_key=True)
+    difficulty = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    sum_accuracy = Column(Float, nullable=False, default=0)
+    sum_clarity = Column(Float, nullable=False, default=0)
+    sum_completeness = Column(Float, nullable=False, default=0)
+    first_evaluation_id = Column(Integer)
+
+class ScoreSketchDB(Base):
+    """
+    Score distribution of the evaluations created in one hour or day, per model
+    or per subject, maintained on every evaluation insert. The *_sketch columns
+    are ScoreSketch bins (see score_sketch); sketches of adjacent buckets merge
+    exactly, so any time range is answered from these rows alone.
+    """
+    __tablename__ = "score_sketches"
+    dimension = Column(String, primary_key=True)  # "model" or "subject"
+    key = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)  # "hour" or "day"
+    bucket_start = Column(Integer, primary_key=True)  # Unix time, UTC
+    count = Column(Integer, nullable=False, default=0)
+    sum_accuracy = Column(Float, nullable=False, default=0)
+    sum_clarity = Column(Float, nullable=False, default=0)
+    sum_completeness = Column(Float, nullable=False, default=0)
+    accuracy_sketch = Column(LargeBinary, nullable=False)
+    clarity_sketch = Column(LargeBinary, nullable=False)
+    completeness_sketch = Column(LargeBinary, nullable=False)
+
+class DataVersionDB(Base):
+    """Single-row counter bumped whenever data behind the analytics changes."""
+    __tablename__ = "data_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class BatchRunDB(Base):
+    __tablename__ = "batch_runs"
+    id = Column(String, primary_key=True, index=True)
+    status = Column(String, default="pending")
+    total = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    error = Column(Text)
+    # Last progress write; a running batch that stops updating it was interrupted
+    updated_at = Column(Float, default=time.time)
+
+class EvaluationJobDB(Base):
+    """
+    One (question, provider, model) evaluation in the durable job queue.
+
+    Workers lease jobs by setting lease_owner/lease_expires_at; a job whose lease
+    has expired (its worker died) is picked up again by any worker.
+    """
+    __tablename__ = "evaluation_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    question_id = Column(Integer, nullable=False)
+    provider = Column(String, nullable=False)
+    model_name = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    stage = Column(String)  # "model" or "judge" while running
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(Float, nullable=False)
+    lease_owner = Column(String)
+    lease_expires_at = Column(Float)
+    # The candidate answer is kept once paid for, so a retry only redoes the judging
+    response_text = Column(Text)
+    response_usage = Column(Text)
+    # "provider/model" that produced response_text; differs from the requested model after a failover
+    answered_by = Column(String)
+    evaluation_id = Column(Integer)
+    error = Column(Text)
+    created_at = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_evaluation_jobs_status_available", "status", "available_at"),
+        Index("ix_evaluation_jobs_status_lease", "status", "lease_expires_at"),
+    )
 
 # Pydantic Models for API
 class QuestionCreate(BaseModel):
@@ -39,6 +172,18 @@ class QuestionResponse(QuestionCreate):
     class Config:
         orm_mode = True  # Changed from from_attributes for compatibility
 
+class NearDuplicateMatch(BaseModel):
+    question_id: int
+    similarity: float
+    text: str
+    subject: Optional[str] = None
+
+class QuestionCreateResponse(QuestionResponse):
+    # Existing questions at or above the near-duplicate threshold
+    near_duplicates: List[NearDuplicateMatch] = []
+    # True when the merge policy returned an existing question instead of inserting
+    merged: bool = False
+
 class EvaluationCreate(BaseModel):
     question_id: int
     model_name: str
@@ -48,10 +193,106 @@ class EvaluationCreate(BaseModel):
     completeness_score: float
     reasoning: str
 
+class ModelTarget(BaseModel):
+    provider: str
+    model_name: str = "auto"
+
+class BatchRunCreate(BaseModel):
+    question_ids: Optional[List[int]] = None
+    subject: Optional[str] = None
+    difficulty: Optional[str] = None
+    models: List[ModelTarget]
+    concurrency: int = 8
+    per_provider_concurrency: int = 2
+
+class BatchRunResponse(BaseModel):
+    id: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    error: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class EvaluationJobResponse(BaseModel):
+    id: int
+    question_id: int
+    provider: str
+    model_name: str
+    status: str
+    stage: Optional[str] = None
+    answered_by: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    evaluation_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+    class Config:
+        orm_mode = True
+
 # Database Setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./truth_meter.db"
+DATABASE_PATH = os.getenv("TRUTH_METER_DB", "./truth_meter.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+
+# WAL lets readers proceed while a writer holds the lock; the rest trade a little
+# durability on power loss (never corruption) for far fewer fsyncs.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64000,  # 64 MB page cache per connection
+    "temp_store": "MEMORY",
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+# Sync engine for CLI scripts and threadpool work (bulk import, startup)
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+event.listen(engine, "connect", _apply_sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the API routers and background tasks
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, pool_size=10, max_overflow=20, pool_timeout=30)
+event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_db():
+    """Shared FastAPI dependency yielding an AsyncSession."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # create_all doesn't alter existing tables either, so add columns introduced since. SQLite can only
+    # add a NOT NULL column with a server_default to fill the existing rows; anything else needs a migration.
+    existing = inspect(engine)
+    unaddable = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            columns = {column["name"] for column in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    unaddable.append(f"{table.name}.{column.name}")
+                    continue
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=engine.dialect)}"))
+    if unaddable:
+        raise RuntimeError(
+            f"Can't add NOT NULL column(s) without a server_default to existing tables: {', '.join(unaddable)}. "
+            "Make them nullable, give them a server_default, or migrate the database."
+        )
+    # create_all skips indexes on tables that already exist, so add any new ones explicitly
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -1,28 +1,65 @@
-from fastapi import APIRouter, Depends
+import hashlib
+import math
+import time
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.models import EvaluationDB, QuestionDB, SessionLocal
-from typing import Dict, List
-from collections import defaultdict
+from sqlalchemy import and_, case, func, or_
+from typing import Dict, List, Literal, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import QuestionDB, EvaluationDB, LLMCallDB, ModelRollupDB, SubjectRollupDB, ModelSubjectDifficultyRollupDB, ScoreSketchDB, AsyncSessionLocal, get_db
+from app.services.analytics_cache import AnalyticsCache, get_data_version
+from app.services.columnar_analytics import ANALYTICS_ENGINE, columnar_analytics
+from app.services.columnar_store import CompactionJob, cold_store
+from app.services.leaderboard import LEADERBOARD_MAX_RESAMPLES, LEADERBOARD_MIN_QUESTIONS, LEADERBOARD_RESAMPLES, build_score_matrix, compute_leaderboard
+from app.services.rollup_service import SCORE_METRICS, SKETCH_GRANULARITIES
+from app.services.score_sketch import ScoreSketch
 
 router = APIRouter(
     prefix="/analytics",
     tags=["analytics"],
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+analytics_cache = AnalyticsCache()
+# Off unless ANALYTICS_COMPACT_INTERVAL_SECONDS is set
+compaction_job = CompactionJob(cold_store)
 
-@router.get("/overview")
-def get_overview(db: Session = Depends(get_db)):
-    """Get overall statistics"""
-    evaluations = db.query(EvaluationDB).all()
-    
-    if not evaluations:
+async def _cached_response(request: Request, response: Response, db: AsyncSession, key, compute):
+    """Serve from the versioned cache, or a bodiless 304 if the client's ETag is current."""
+    version = await db.run_sync(get_data_version)
+    # The key holds the resolved parameters, e.g. the hour an open-ended range ends
+    # at, so the ETag changes when "now" moves into a new bucket, not just on writes
+    etag = f'"{version}-{hashlib.sha1(repr(key).encode()).hexdigest()[:16]}"'
+    client_etags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in client_etags:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+    async def compute_in_session():
+        # Own session: a coalesced computation can outlive the request that started it
+        async with AsyncSessionLocal() as session:
+            return await session.run_sync(compute)
+
+    return await analytics_cache.get_or_compute(version, key, compute_in_session)
+
+def _averages(rollup) -> dict:
+    return {
+        "count": rollup.count,
+        "avg_accuracy": round(rollup.sum_accuracy / rollup.count, 1),
+        "avg_clarity": round(rollup.sum_clarity / rollup.count, 1),
+        "avg_completeness": round(rollup.sum_completeness / rollup.count, 1)
+    }
+
+def compute_overview(db: Session):
+    total, sum_accuracy, sum_clarity, sum_completeness = db.query(
+        func.sum(ModelRollupDB.count),
+        func.sum(ModelRollupDB.sum_accuracy),
+        func.sum(ModelRollupDB.sum_clarity),
+        func.sum(ModelRollupDB.sum_completeness),
+    ).one()
+
+    if not total:
         return {
             "total_evaluations": 0,
             "avg_accuracy": 0,
@@ -30,83 +67,399 @@ def get_overview(db: Session = Depends(get_db)):
             "avg_completeness": 0,
             "total_questions": 0
         }
-    
-    total = len(evaluations)
-    avg_accuracy = sum(e.accuracy_score for e in evaluations) / total
-    avg_clarity = sum(e.clarity_score for e in evaluations) / total
-    avg_completeness = sum(e.completeness_score for e in evaluations) / total
-    
+
     return {
         "total_evaluations": total,
-        "avg_accuracy": round(avg_accuracy, 1),
-        "avg_clarity": round(avg_clarity, 1),
-        "avg_completeness": round(avg_completeness, 1),
-        "total_questions": db.query(QuestionDB).count()
+        "avg_accuracy": round(sum_accuracy / total, 1),
+        "avg_clarity": round(sum_clarity / total, 1),
+        "avg_completeness": round(sum_completeness / total, 1),
+        "total_questions": db.query(func.count(QuestionDB.id)).scalar()
     }
 
-@router.get("/by-subject")
-def get_by_subject(db: Session = Depends(get_db)):
-    """Get accuracy breakdown by subject"""
-    results = []
-    
-    # Get all evaluations with their questions
-    evaluations = db.query(EvaluationDB, QuestionDB).join(
-        QuestionDB, EvaluationDB.question_id == QuestionDB.id
+def compute_by_subject(db: Session):
+    rollups = db.query(SubjectRollupDB).filter(SubjectRollupDB.count > 0).order_by(
+        SubjectRollupDB.first_evaluation_id
     ).all()
-    
-    # Group by subject
-    subject_data = defaultdict(lambda: {"scores": [], "count": 0})
-    
-    for eval, question in evaluations:
-        subject = question.subject
-        subject_data[subject]["scores"].append({
-            "accuracy": eval.accuracy_score,
-            "clarity": eval.clarity_score,
-            "completeness": eval.completeness_score
-        })
-        subject_data[subject]["count"] += 1
-    
-    # Calculate averages
-    for subject, data in subject_data.items():
-        scores = data["scores"]
-        results.append({
+    return [{"subject": r.subject, **_averages(r)} for r in rollups]
+
+def compute_by_model(db: Session):
+    rollups = db.query(ModelRollupDB).filter(ModelRollupDB.count > 0).order_by(
+        ModelRollupDB.first_evaluation_id
+    ).all()
+    return [{"model": r.model_name, **_averages(r)} for r in rollups]
+
+def compute_breakdown(db: Session, model: Optional[str] = None, subject: Optional[str] = None, difficulty: Optional[str] = None):
+    query = db.query(ModelSubjectDifficultyRollupDB).filter(ModelSubjectDifficultyRollupDB.count > 0)
+    if model:
+        query = query.filter(ModelSubjectDifficultyRollupDB.model_name == model)
+    if subject:
+        query = query.filter(ModelSubjectDifficultyRollupDB.subject == subject)
+    if difficulty:
+        query = query.filter(ModelSubjectDifficultyRollupDB.difficulty == difficulty)
+
+    return [
+        {"model": r.model_name, "subject": r.subject, "difficulty": r.difficulty, **_averages(r)}
+        for r in query.order_by(ModelSubjectDifficultyRollupDB.first_evaluation_id).all()
+    ]
+
+def _role_sum(column, role: str):
+    return func.coalesce(func.sum(case((LLMCallDB.role == role, column), else_=0)), 0)
+
+def compute_cost_by_model(db: Session):
+    """Candidate and judge spend per evaluated model. Calls for unpriced models count as unpriced_calls."""
+    rows = db.query(
+        EvaluationDB.model_name,
+        func.count(func.distinct(LLMCallDB.evaluation_id)),
+        _role_sum(LLMCallDB.cost_usd, "candidate"),
+        _role_sum(LLMCallDB.cost_usd, "judge"),
+        func.sum(LLMCallDB.prompt_tokens),
+        func.sum(LLMCallDB.completion_tokens),
+        func.sum(case((LLMCallDB.cost_usd.is_(None), 1), else_=0)),
+    ).join(EvaluationDB, LLMCallDB.evaluation_id == EvaluationDB.id).group_by(
+        EvaluationDB.model_name
+    ).order_by(func.min(EvaluationDB.id)).all()
+
+    return [
+        {
+            "model": model,
+            "evaluations": evaluations,
+            "candidate_cost_usd": round(candidate_cost, 6),
+            "judge_cost_usd": round(judge_cost, 6),
+            "total_cost_usd": round(candidate_cost + judge_cost, 6),
+            "avg_cost_per_evaluation_usd": round((candidate_cost + judge_cost) / evaluations, 6),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "unpriced_calls": unpriced,
+        }
+        for model, evaluations, candidate_cost, judge_cost, prompt_tokens, completion_tokens, unpriced in rows
+    ]
+
+def compute_tokens_by_subject(db: Session):
+    subject = func.coalesce(QuestionDB.subject, "")
+    rows = db.query(
+        subject,
+        func.count(func.distinct(LLMCallDB.evaluation_id)),
+        func.sum(LLMCallDB.prompt_tokens),
+        func.sum(LLMCallDB.completion_tokens),
+        _role_sum(LLMCallDB.prompt_tokens + LLMCallDB.completion_tokens, "candidate"),
+        _role_sum(LLMCallDB.prompt_tokens + LLMCallDB.completion_tokens, "judge"),
+    ).join(EvaluationDB, LLMCallDB.evaluation_id == EvaluationDB.id).join(
+        QuestionDB, EvaluationDB.question_id == QuestionDB.id
+    ).group_by(subject).order_by(func.min(EvaluationDB.id)).all()
+
+    return [
+        {
             "subject": subject,
-            "count": data["count"],
-            "avg_accuracy": round(sum(s["accuracy"] for s in scores) / len(scores), 1),
-            "avg_clarity": round(sum(s["clarity"] for s in scores) / len(scores), 1),
-            "avg_completeness": round(sum(s["completeness"] for s in scores) / len(scores), 1)
+            "evaluations": evaluations,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "candidate_tokens": candidate_tokens,
+            "judge_tokens": judge_tokens,
+            "avg_tokens_per_evaluation": round((prompt_tokens + completion_tokens) / evaluations, 1),
+        }
+        for subject, evaluations, prompt_tokens, completion_tokens, candidate_tokens, judge_tokens in rows
+    ]
+
+def _latency_percentile(db: Session, role: str, provider: str, count: int, p: float) -> float:
+    # Nearest-rank percentile, read straight off the (role, provider, latency_ms) index
+    offset = max(0, math.ceil(p * count) - 1)
+    return db.query(LLMCallDB.latency_ms).filter(
+        LLMCallDB.role == role, LLMCallDB.provider == provider
+    ).order_by(LLMCallDB.latency_ms).offset(offset).limit(1).scalar()
+
+def compute_latency_by_provider(db: Session):
+    groups = db.query(
+        LLMCallDB.role, LLMCallDB.provider, func.count(LLMCallDB.id), func.avg(LLMCallDB.latency_ms)
+    ).group_by(LLMCallDB.role, LLMCallDB.provider).order_by(LLMCallDB.role, LLMCallDB.provider).all()
+
+    return [
+        {
+            "provider": provider,
+            "role": role,
+            "calls": count,
+            "avg_latency_ms": round(avg, 1),
+            "p50_latency_ms": round(_latency_percentile(db, role, provider, count, 0.50), 1),
+            "p95_latency_ms": round(_latency_percentile(db, role, provider, count, 0.95), 1),
+        }
+        for role, provider, count, avg in groups
+    ]
+
+SKETCH_QUANTILES = (0.1, 0.5, 0.9)
+HOUR, DAY = SKETCH_GRANULARITIES["hour"], SKETCH_GRANULARITIES["day"]
+
+def _timestamp(moment: Optional[datetime]) -> Optional[float]:
+    if moment is None:
+        return None
+    # Naive datetimes are taken as UTC, like the stored bucket starts
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+def _hour_range(start: Optional[datetime], end: Optional[datetime]) -> Tuple[int, int]:
+    """The requested [start, end) widened to whole hours, the finest bucket there is."""
+    start_ts, end_ts = _timestamp(start), _timestamp(end)
+    if end_ts is None:
+        end_ts = time.time()
+    start_hour = 0 if start_ts is None else int(start_ts // HOUR * HOUR)
+    end_hour = int(math.ceil(end_ts / HOUR) * HOUR)
+    if end_hour <= start_hour:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return start_hour, end_hour
+
+def _sketch_query(db: Session, dimension: str, key: Optional[str]):
+    query = db.query(ScoreSketchDB).filter(ScoreSketchDB.dimension == dimension)
+    if key is not None:
+        query = query.filter(ScoreSketchDB.key == key)
+    return query
+
+def _metric_summary(count: int, total: float, sketch: ScoreSketch) -> Dict:
+    p10, p50, p90 = sketch.quantiles(SKETCH_QUANTILES)
+    return {"mean": round(total / count, 1) if count else None, "p10": p10, "p50": p50, "p90": p90}
+
+def compute_score_distribution(db: Session, dimension: str, key: Optional[str], start_hour: int, end_hour: int):
+    """
+    Score distribution per model or subject over [start_hour, end_hour), merged
+    from the stored sketches: daily buckets for the whole days in the range and
+    hourly buckets for the partial days at either end.
+    """
+    first_day = int(math.ceil(start_hour / DAY) * DAY)
+    last_day = end_hour // DAY * DAY
+    if first_day < last_day:
+        buckets = or_(
+            and_(ScoreSketchDB.granularity == "day", ScoreSketchDB.bucket_start >= first_day, ScoreSketchDB.bucket_start < last_day),
+            and_(ScoreSketchDB.granularity == "hour", or_(
+                and_(ScoreSketchDB.bucket_start >= start_hour, ScoreSketchDB.bucket_start < first_day),
+                and_(ScoreSketchDB.bucket_start >= last_day, ScoreSketchDB.bucket_start < end_hour),
+            )),
+        )
+    else:
+        buckets = and_(ScoreSketchDB.granularity == "hour", ScoreSketchDB.bucket_start >= start_hour, ScoreSketchDB.bucket_start < end_hour)
+
+    merged: Dict[str, Dict] = {}
+    for row in _sketch_query(db, dimension, key).filter(buckets).order_by(ScoreSketchDB.key):
+        group = merged.get(row.key)
+        if group is None:
+            group = merged[row.key] = {
+                "count": 0, "sums": dict.fromkeys(SCORE_METRICS, 0.0),
+                "sketches": {metric: ScoreSketch() for metric in SCORE_METRICS},
+            }
+        group["count"] += row.count
+        for metric in SCORE_METRICS:
+            group["sums"][metric] += getattr(row, f"sum_{metric}")
+            group["sketches"][metric].merge(ScoreSketch.from_bytes(getattr(row, f"{metric}_sketch")))
+
+    return {
+        "start": _iso(start_hour),
+        "end": _iso(end_hour),
+        "groups": [
+            {
+                dimension: group_key,
+                "count": group["count"],
+                **{
+                    metric: {
+                        **_metric_summary(group["count"], group["sums"][metric], group["sketches"][metric]),
+                        "histogram": group["sketches"][metric].histogram(),
+                    }
+                    for metric in SCORE_METRICS
+                },
+            }
+            for group_key, group in merged.items()
+        ],
+    }
+
+def compute_score_trends(db: Session, dimension: str, key: Optional[str], granularity: str, start_hour: int, end_hour: int):
+    """One point per stored bucket in the range; each point is a single sketch row, so nothing is merged."""
+    seconds = SKETCH_GRANULARITIES[granularity]
+    start_bucket = start_hour // seconds * seconds
+    rows = _sketch_query(db, dimension, key).filter(
+        ScoreSketchDB.granularity == granularity,
+        ScoreSketchDB.bucket_start >= start_bucket,
+        ScoreSketchDB.bucket_start < end_hour,
+    ).order_by(ScoreSketchDB.key, ScoreSketchDB.bucket_start)
+
+    series: Dict[str, List[Dict]] = {}
+    for row in rows:
+        series.setdefault(row.key, []).append({
+            "bucket_start": _iso(row.bucket_start),
+            "count": row.count,
+            **{
+                metric: _metric_summary(
+                    row.count, getattr(row, f"sum_{metric}"), ScoreSketch.from_bytes(getattr(row, f"{metric}_sketch"))
+                )
+                for metric in SCORE_METRICS
+            },
         })
-    
-    return results
+    return {
+        "granularity": granularity,
+        "start": _iso(start_bucket),
+        "end": _iso(end_hour),
+        "series": [{dimension: series_key, "points": points} for series_key, points in series.items()],
+    }
+
+def _columnar_range(start: Optional[datetime], end: Optional[datetime]) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """The created_at range for the columnar engine, or None when the rollups answer the query."""
+    if start is None and end is None and ANALYTICS_ENGINE != "columnar":
+        return None
+    return _timestamp(start), _timestamp(end)
+
+@router.get("/overview")
+async def get_overview(
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get overall statistics, optionally for evaluations created in [start, end)"""
+    time_range = _columnar_range(start, end)
+    if time_range is None:
+        return await _cached_response(request, response, db, "overview", compute_overview)
+    return await _cached_response(
+        request, response, db, ("overview", *time_range),
+        lambda db: columnar_analytics.overview(db, *time_range),
+    )
+
+@router.get("/by-subject")
+async def get_by_subject(
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get accuracy breakdown by subject, optionally for evaluations created in [start, end)"""
+    time_range = _columnar_range(start, end)
+    if time_range is None:
+        return await _cached_response(request, response, db, "by-subject", compute_by_subject)
+    return await _cached_response(
+        request, response, db, ("by-subject", *time_range),
+        lambda db: columnar_analytics.by_subject(db, *time_range),
+    )
 
 @router.get("/by-model")
-def get_by_model(db: Session = Depends(get_db)):
-    """Get accuracy breakdown by model"""
-    results = []
-    
-    evaluations = db.query(EvaluationDB).all()
-    
-    # Group by model
-    model_data = defaultdict(lambda: {"scores": [], "count": 0})
-    
-    for eval in evaluations:
-        model = eval.model_name
-        model_data[model]["scores"].append({
-            "accuracy": eval.accuracy_score,
-            "clarity": eval.clarity_score,
-            "completeness": eval.completeness_score
-        })
-        model_data[model]["count"] += 1
-    
-    # Calculate averages
-    for model, data in model_data.items():
-        scores = data["scores"]
-        results.append({
-            "model": model,
-            "count": data["count"],
-            "avg_accuracy": round(sum(s["accuracy"] for s in scores) / len(scores), 1),
-            "avg_clarity": round(sum(s["clarity"] for s in scores) / len(scores), 1),
-            "avg_completeness": round(sum(s["completeness"] for s in scores) / len(scores), 1)
-        })
-    
-    return results
+async def get_by_model(
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get accuracy breakdown by model, optionally for evaluations created in [start, end)"""
+    time_range = _columnar_range(start, end)
+    if time_range is None:
+        return await _cached_response(request, response, db, "by-model", compute_by_model)
+    return await _cached_response(
+        request, response, db, ("by-model", *time_range),
+        lambda db: columnar_analytics.by_model(db, *time_range),
+    )
+
+@router.get("/breakdown")
+async def get_breakdown(
+    request: Request,
+    response: Response,
+    model: Optional[str] = None,
+    subject: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get accuracy breakdown by model x subject x difficulty, optionally for evaluations created in [start, end)"""
+    time_range = _columnar_range(start, end)
+    if time_range is None:
+        return await _cached_response(
+            request, response, db, ("breakdown", model, subject, difficulty),
+            lambda db: compute_breakdown(db, model, subject, difficulty),
+        )
+    return await _cached_response(
+        request, response, db, ("breakdown", model, subject, difficulty, *time_range),
+        lambda db: columnar_analytics.breakdown(db, model, subject, difficulty, *time_range),
+    )
+
+@router.get("/cost-by-model")
+async def get_cost_by_model(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get candidate and judge cost by model"""
+    return await _cached_response(request, response, db, "cost-by-model", compute_cost_by_model)
+
+@router.get("/tokens-by-subject")
+async def get_tokens_by_subject(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get token usage by subject"""
+    return await _cached_response(request, response, db, "tokens-by-subject", compute_tokens_by_subject)
+
+@router.get("/latency-by-provider")
+async def get_latency_by_provider(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get p50/p95 call latency by provider"""
+    return await _cached_response(request, response, db, "latency-by-provider", compute_latency_by_provider)
+
+
+@router.get("/score-distribution")
+async def get_score_distribution(
+    request: Request,
+    response: Response,
+    dimension: Literal["model", "subject"] = "model",
+    key: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get p10/p50/p90, means and histograms of the scores per model or subject over a time range (whole hours)"""
+    start_hour, end_hour = _hour_range(start, end)
+    return await _cached_response(
+        request, response, db, ("score-distribution", dimension, key, start_hour, end_hour),
+        lambda db: compute_score_distribution(db, dimension, key, start_hour, end_hour),
+    )
+
+@router.get("/score-trends")
+async def get_score_trends(
+    request: Request,
+    response: Response,
+    dimension: Literal["model", "subject"] = "model",
+    key: Optional[str] = None,
+    granularity: Literal["hour", "day"] = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get hourly or daily p10/p50/p90 and mean scores per model or subject"""
+    start_hour, end_hour = _hour_range(start, end)
+    return await _cached_response(
+        request, response, db, ("score-trends", dimension, key, granularity, start_hour, end_hour),
+        lambda db: compute_score_trends(db, dimension, key, granularity, start_hour, end_hour),
+    )
+
+@router.get("/leaderboard")
+async def get_leaderboard(
+    request: Request,
+    response: Response,
+    metric: Literal["accuracy", "clarity", "completeness", "overall"] = "accuracy",
+    subject: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resamples: int = LEADERBOARD_RESAMPLES,
+    confidence: float = 0.95,
+    min_questions: int = LEADERBOARD_MIN_QUESTIONS,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get models ranked on per-question scores, with bootstrap confidence intervals and paired win rates"""
+    if not 100 <= resamples <= LEADERBOARD_MAX_RESAMPLES:
+        raise HTTPException(status_code=400, detail=f"resamples must be between 100 and {LEADERBOARD_MAX_RESAMPLES}")
+    if not 0.5 <= confidence < 1:
+        raise HTTPException(status_code=400, detail="confidence must be in [0.5, 1)")
+    if min_questions < 1:
+        raise HTTPException(status_code=400, detail="min_questions must be at least 1")
+    time_range = (_timestamp(start), _timestamp(end))
+    return await _cached_response(
+        request, response, db, ("leaderboard", metric, subject, difficulty, *time_range, resamples, confidence, min_questions),
+        lambda db: {
+            "metric": metric,
+            **compute_leaderboard(
+                build_score_matrix(db, metric, subject, difficulty, *time_range), resamples, confidence,
+                min_questions=min_questions,
+            ),
+        },
+    )
@@ -1,8 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.models import EvaluationDB, EvaluationCreate, QuestionDB, SessionLocal
+import asyncio
+import csv
+import io
+import json
+import orjson
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import EvaluationDB, EvaluationCreate, QuestionDB, AsyncSessionLocal, BatchRunDB, BatchRunCreate, BatchRunResponse, EvaluationJobResponse, get_db
 from app.services.eval_service import EvaluationService
 from app.services.llm_service import LLMService
+from app.services.rate_limiter import LLMCallError
+from app.services.batch_service import BatchRunner
+from app.services.evaluation_store import save_evaluation
+from app.services.job_queue import JobQueue
+from app.services.metrics import stage_timer
+from app.services.search_index import SCORE_COLUMNS, SEARCH_MAX_LIMIT, search_evaluations
 
 router = APIRouter(
     prefix="/evaluations",
@@ -11,43 +25,257 @@ router = APIRouter(
 
 eval_service = EvaluationService()
 llm_service = LLMService()
+batch_runner = BatchRunner(llm_service, eval_service)
+job_queue = JobQueue(llm_service, eval_service)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Upper bound for ?wait= so a request can't hold a connection indefinitely
+MAX_RUN_WAIT_SECONDS = 300
 
 @router.post("/run/{question_id}")
-async def run_evaluation(question_id: int, model_provider: str, model_name: str, db: Session = Depends(get_db)):
-    # 1. Get Question
-    question = db.query(QuestionDB).filter(QuestionDB.id == question_id).first()
+async def run_evaluation(question_id: int, model_provider: str, model_name: str, response: Response, wait: float = 0, db: AsyncSession = Depends(get_db)):
+    """
+    Queue an evaluation of one model on one question.
+
+    Returns the queued job with 202 straight away. With `wait` (seconds), waits
+    for the job and returns the saved evaluation if it finishes in time.
+    """
+    with stage_timer("question_lookup"):
+        question = await db.get(QuestionDB, question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
-    
-    # 2. Get AI Response
-    ai_response_text = await llm_service.get_response(model_provider, model_name, question.text)
-    
-    # 3. Evaluate Response
-    eval_result = await eval_service.evaluate_response(question.text, question.reference_answer, ai_response_text)
-    
-    # 4. Save to DB
-    db_eval = EvaluationDB(
-        question_id=question.id,
-        model_name=f"{model_provider}/{model_name}",
-        response_text=ai_response_text,
-        accuracy_score=eval_result["accuracy_score"],
-        clarity_score=eval_result["clarity_score"],
-        completeness_score=eval_result["completeness_score"],
-        reasoning=eval_result["reasoning"]
-    )
-    db.add(db_eval)
-    db.commit()
-    db.refresh(db_eval)
-    
-    return db_eval
+
+    with stage_timer("enqueue", model_provider, model_name):
+        job = await job_queue.enqueue(db, question.id, model_provider, model_name)
+    if wait > 0:
+        with stage_timer("wait", model_provider, model_name):
+            job = await job_queue.wait_for(job.id, min(wait, MAX_RUN_WAIT_SECONDS))
+        if job.status == "succeeded":
+            return await db.get(EvaluationDB, job.evaluation_id)
+        if job.status == "failed":
+            raise HTTPException(status_code=502, detail={"job_id": job.id, "error": job.error})
+
+    response.status_code = 202
+    return EvaluationJobResponse.model_validate(job, from_attributes=True)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/stream/{question_id}")
+async def stream_evaluation(question_id: int, model_provider: str, model_name: str, db: AsyncSession = Depends(get_db)):
+    """
+    Server-sent-events variant of /run.
+
+    Emits `token` events as the candidate model streams, then `response` with the
+    full text, a `score` event for each score as the judge streams it, `scores`
+    once the judge result is complete, and finally `evaluation` with the saved row. If the model or judge call fails, an `error` event ends
+    the stream and nothing is saved.
+    """
+    with stage_timer("question_lookup"):
+        question = await db.get(QuestionDB, question_id)
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+    question_text, reference_answer = question.text, question.reference_answer
+
+    async def events():
+        chunks = []
+        usage = {}
+        try:
+            with stage_timer("candidate_call", model_provider, model_name):
+                async for text in llm_service.stream_response(model_provider, model_name, question_text, usage=usage):
+                    chunks.append(text)
+                    yield _sse("token", {"text": text})
+        except LLMCallError as e:
+            yield _sse("error", e.to_dict())
+            return
+        ai_response_text = "".join(chunks)
+        yield _sse("response", {"text": ai_response_text})
+
+        scores = asyncio.Queue()
+        judging = asyncio.ensure_future(eval_service.evaluate_response(
+            question_text, reference_answer, ai_response_text,
+            on_score=lambda field, value: scores.put_nowait({"field": field, "value": value}),
+        ))
+        try:
+            with stage_timer("judge_call", model_provider, model_name):
+                while True:
+                    next_score = asyncio.ensure_future(scores.get())
+                    done, _ = await asyncio.wait({next_score, judging}, return_when=asyncio.FIRST_COMPLETED)
+                    if next_score not in done:
+                        next_score.cancel()
+                        break
+                    yield _sse("score", next_score.result())
+            while not scores.empty():
+                yield _sse("score", scores.get_nowait())
+        finally:
+            # The client went away mid-judgement
+            if not judging.done():
+                judging.cancel()
+        eval_result = judging.result()
+        if eval_result.get("failed"):
+            yield _sse("error", {"error": eval_result["reasoning"]})
+            return
+        yield _sse("scores", {
+            "accuracy_score": eval_result["accuracy_score"],
+            "clarity_score": eval_result["clarity_score"],
+            "completeness_score": eval_result["completeness_score"],
+            "reasoning": eval_result["reasoning"],
+        })
+
+        # The request-scoped session may already be closed once streaming starts
+        async with AsyncSessionLocal() as stream_db:
+            with stage_timer("db_commit", model_provider, model_name):
+                # Stored under the model that answered, like jobs and batch runs (a failover, or "auto" resolved)
+                answered_by = f"{usage['provider']}/{usage['model_name']}" if usage else llm_service.model_label(model_provider, model_name)
+                db_eval = await save_evaluation(
+                    stream_db, question_id, answered_by, ai_response_text, eval_result,
+                    calls=[usage, eval_result.get("usage")],
+                )
+            yield _sse("evaluation", {"id": db_eval.id, "question_id": db_eval.question_id, "model_name": db_eval.model_name})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @router.get("/")
-def get_evaluations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(EvaluationDB).offset(skip).limit(limit).all()
+async def get_evaluations(response: Response, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    """
+    List evaluations in id order.
+
+    Pass the X-Next-Cursor header from the previous page as `after_id` for
+    keyset pagination; `skip` is kept for old clients but gets slower with depth.
+    """
+    query = select(EvaluationDB).order_by(EvaluationDB.id)
+    if after_id is not None:
+        query = query.where(EvaluationDB.id > after_id)
+    else:
+        query = query.offset(skip)
+    evaluations = (await db.execute(query.limit(limit))).scalars().all()
+    if len(evaluations) == limit and evaluations:
+        response.headers["X-Next-Cursor"] = str(evaluations[-1].id)
+    return evaluations
+
+@router.get("/search")
+async def search_evaluation_results(response: Response, q: Optional[str] = None, model: Optional[str] = None,
+                                    subject: Optional[str] = None, difficulty: Optional[str] = None,
+                                    question_id: Optional[int] = None,
+                                    min_accuracy: Optional[float] = None, max_accuracy: Optional[float] = None,
+                                    min_clarity: Optional[float] = None, max_clarity: Optional[float] = None,
+                                    min_completeness: Optional[float] = None, max_completeness: Optional[float] = None,
+                                    limit: int = 50, skip: int = 0, after_id: Optional[int] = None,
+                                    db: AsyncSession = Depends(get_db)):
+    """
+    Full-text search over model responses and judge reasoning, with filters on
+    the model, the question's subject and difficulty, and inclusive score ranges.
+
+    With q, the newest SEARCH_RANK_WINDOW (default 5000) matches are ranked by
+    relevance and any older ones follow, newest first (page with skip).
+    Results carry response_text_snippet/reasoning_snippet with matches in
+    <mark> tags.
+    Without q it lists the matching evaluations in id order, paged with
+    X-Next-Cursor/after_id like GET /evaluations/.
+    """
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+    if skip < 0:
+        raise HTTPException(status_code=400, detail="skip must be >= 0")
+    bounds = {
+        "accuracy": (min_accuracy, max_accuracy),
+        "clarity": (min_clarity, max_clarity),
+        "completeness": (min_completeness, max_completeness),
+    }
+    for name in SCORE_COLUMNS:
+        low, high = bounds[name]
+        if low is not None and high is not None and low > high:
+            raise HTTPException(status_code=400, detail=f"min_{name} must be <= max_{name}")
+
+    results = await db.run_sync(
+        search_evaluations, q, model=model, subject=subject, difficulty=difficulty, question_id=question_id,
+        score_ranges=bounds, limit=limit, skip=skip, after_id=after_id,
+    )
+    if not q and len(results) == limit:
+        response.headers["X-Next-Cursor"] = str(results[-1]["id"])
+    return results
+
+EXPORT_COLUMNS = [
+    "id", "question_id", "model_name", "accuracy_score", "clarity_score", "completeness_score",
+    "response_text", "reasoning", "question_text", "subject", "difficulty", "reference_answer",
+]
+EXPORT_CHUNK_SIZE = 1000
+
+async def _export_rows():
+    """Yield evaluation rows joined with question metadata, fetched in chunks."""
+    async with AsyncSessionLocal() as db:
+        query = select(
+            EvaluationDB.id,
+            EvaluationDB.question_id,
+            EvaluationDB.model_name,
+            EvaluationDB.accuracy_score,
+            EvaluationDB.clarity_score,
+            EvaluationDB.completeness_score,
+            EvaluationDB.response_text,
+            EvaluationDB.reasoning,
+            QuestionDB.text,
+            QuestionDB.subject,
+            QuestionDB.difficulty,
+            QuestionDB.reference_answer,
+        ).outerjoin(QuestionDB, EvaluationDB.question_id == QuestionDB.id).order_by(EvaluationDB.id)
+        result = await db.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        async for partition in result.partitions():
+            for row in partition:
+                yield row
+
+async def _export_ndjson():
+    buffer = []
+    async for row in _export_rows():
+        buffer.append(orjson.dumps(dict(zip(EXPORT_COLUMNS, row))))
+        if len(buffer) >= EXPORT_CHUNK_SIZE:
+            yield b"\n".join(buffer) + b"\n"
+            buffer = []
+    if buffer:
+        yield b"\n".join(buffer) + b"\n"
+
+async def _export_csv():
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    async for row in _export_rows():
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue()
+
+@router.get("/export")
+def export_evaluations(format: str = "ndjson"):
+    """Stream every evaluation with its question metadata as NDJSON or CSV, in constant memory."""
+    if format == "ndjson":
+        return StreamingResponse(_export_ndjson(), media_type="application/x-ndjson",
+                                 headers={"Content-Disposition": "attachment; filename=evaluations.ndjson"})
+    if format == "csv":
+        return StreamingResponse(_export_csv(), media_type="text/csv",
+                                 headers={"Content-Disposition": "attachment; filename=evaluations.csv"})
+    raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+@router.post("/batch", response_model=BatchRunResponse)
+async def start_batch_run(request: BatchRunCreate, db: AsyncSession = Depends(get_db)):
+    """Evaluate a set of questions against several models in one background run."""
+    if not request.models:
+        raise HTTPException(status_code=400, detail="At least one model is required")
+
+    questions = await batch_runner.resolve_questions(db, request)
+    if not questions:
+        raise HTTPException(status_code=404, detail="No questions matched")
+
+    run = await batch_runner.create_run(db, len(questions) * len(request.models))
+    batch_runner.start(run.id, questions, request)
+    return run
+
+@router.get("/batch/{run_id}", response_model=BatchRunResponse)
+async def get_batch_run(run_id: str, db: AsyncSession = Depends(get_db)):
+    # A run whose process died after startup is only noticed once its progress goes stale
+    await batch_runner.fail_interrupted_runs()
+    run = await db.get(BatchRunDB, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Batch run not found")
+    return run
@@ -0,0 +1,36 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import EvaluationJobDB, EvaluationJobResponse, get_db
+from app.routers.evaluations import job_queue
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+)
+
+@router.get("/summary")
+async def get_job_summary(db: AsyncSession = Depends(get_db)):
+    """Job counts by status and queue age, for tracking progress."""
+    return await job_queue.get_summary(db)
+
+@router.get("/", response_model=List[EvaluationJobResponse])
+async def list_jobs(response: Response, status: Optional[str] = None, limit: int = 100, after_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    """List jobs in id order, optionally by status. Pass X-Next-Cursor back as `after_id` for the next page."""
+    query = select(EvaluationJobDB).order_by(EvaluationJobDB.id)
+    if status:
+        query = query.where(EvaluationJobDB.status == status)
+    if after_id is not None:
+        query = query.where(EvaluationJobDB.id > after_id)
+    jobs = (await db.execute(query.limit(limit))).scalars().all()
+    if len(jobs) == limit and jobs:
+        response.headers["X-Next-Cursor"] = str(jobs[-1].id)
+    return jobs
+
+@router.get("/{job_id}", response_model=EvaluationJobResponse)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    job = await db.get(EvaluationJobDB, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
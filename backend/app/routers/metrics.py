@@ -0,0 +1,48 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.routers.analytics import analytics_cache
+from app.routers.evaluations import eval_service, llm_service, job_queue
+from app.services.metrics import cache_collector, registry, render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _service_collector():
+    """Counters the services already keep, read only when /metrics is scraped."""
+    rate_limits = llm_service.rate_limiters.get_stats()
+    yield ("truthmeter_rate_limiter_throttled_total", "counter", "Calls that had to wait for a rate limit bucket",
+           [({"provider": p}, s["throttled"]) for p, s in rate_limits.items()])
+    yield ("truthmeter_rate_limiter_wait_seconds_total", "counter", "Time spent waiting for rate limit buckets",
+           [({"provider": p}, s["wait_seconds"]) for p, s in rate_limits.items()])
+    yield ("truthmeter_rate_limiter_retries_total", "counter", "Upstream calls retried after a failure",
+           [({"provider": p}, s["retries"]) for p, s in rate_limits.items()])
+    yield ("truthmeter_rate_limited_total", "counter", "429 responses received from providers",
+           [({"provider": p}, s["rate_limited"]) for p, s in rate_limits.items()])
+    yield ("truthmeter_llm_coalesced_calls_total", "counter", "Candidate calls served by another caller's in-flight request",
+           [({}, llm_service.coalesced_calls)])
+    breakers = llm_service.circuit_breakers.get_stats()
+    yield ("truthmeter_circuit_breaker_open", "gauge", "1 while a provider's circuit breaker is open or half-open",
+           [({"provider": p}, int(s["state"] != "closed")) for p, s in breakers.items()])
+    yield ("truthmeter_circuit_breaker_opened_total", "counter", "Times a provider's circuit breaker opened",
+           [({"provider": p}, s["opened"]) for p, s in breakers.items()])
+    yield ("truthmeter_circuit_breaker_rejected_total", "counter", "Calls failed fast by an open circuit breaker",
+           [({"provider": p}, s["rejected"]) for p, s in breakers.items()])
+    resilience = llm_service.resilience_stats
+    yield ("truthmeter_llm_hedged_requests_total", "counter", "Candidate calls that sent a hedge after the p95 delay, and hedges that answered first",
+           [({"result": "sent"}, resilience["hedged"]), ({"result": "won"}, resilience["hedge_wins"])])
+    yield ("truthmeter_llm_failovers_total", "counter", "Candidate calls that failed over to an equivalent model",
+           [({}, resilience["failovers"])])
+    yield ("truthmeter_job_events_total", "counter", "Job queue worker events",
+           [({"event": event}, count) for event, count in job_queue.stats.items()])
+
+registry.add_collector(cache_collector("llm_response", lambda: llm_service.response_cache.stats, ("hits",), ("misses",)))
+# Read the judge cache's counters directly; its get_stats() also counts the disk tier
+registry.add_collector(cache_collector("judge", lambda: eval_service.judge_cache.stats, ("memory_hits", "disk_hits"), ("misses",)))
+registry.add_collector(cache_collector("analytics", lambda: analytics_cache.stats, ("hits", "coalesced"), ("misses",)))
+registry.add_collector(_service_collector)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics for this process."""
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
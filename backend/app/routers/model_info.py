@@ -1,13 +1,11 @@
 from fastapi import APIRouter
-from app.services.eval_service import EvaluationService
+from app.routers.evaluations import eval_service
 
 router = APIRouter(
     prefix="/model",
     tags=["model-info"],
 )
 
-eval_service = EvaluationService()
-
 @router.get("/judge/info")
 def get_judge_model_info():
     """
@@ -27,3 +25,10 @@ def check_judge_health():
         "model": "TruthMeter-Judge-v1.0",
         "ready": True
     }
+
+@router.get("/judge/cache")
+def get_judge_cache_stats():
+    """
+    Hit/miss statistics for the TruthMeter-Judge result cache.
+    """
+    return eval_service.get_cache_stats()
@@ -1,46 +1,203 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.models import QuestionDB, QuestionCreate, QuestionResponse, SessionLocal
+import io
+import tempfile
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.models import QuestionDB, QuestionCreate, QuestionCreateResponse, QuestionResponse, SessionLocal, get_db
+from app.services.rollup_service import refresh_subject
+from app.services.analytics_cache import bump_data_version
+from app.services.near_duplicates import DEDUP_POLICIES, QUESTION_DEDUP_POLICY, near_duplicate_index, signature_bytes
+from app.services.question_import import QuestionImporter
+from app.services.search_index import SEARCH_MAX_LIMIT, search_questions
 
 router = APIRouter(
     prefix="/questions",
     tags=["questions"],
 )
 
-# Dependency
-def get_db():
+def _dedup_settings(dedup: Optional[str], dedup_threshold: Optional[float]):
+    dedup = dedup or QUESTION_DEDUP_POLICY
+    if dedup not in DEDUP_POLICIES:
+        raise HTTPException(status_code=400, detail=f"dedup must be one of {', '.join(DEDUP_POLICIES)}")
+    if dedup_threshold is None:
+        dedup_threshold = near_duplicate_index.threshold
+    # The LSH bands are tuned for the index threshold; lower ones would miss matches
+    if not near_duplicate_index.threshold <= dedup_threshold <= 1:
+        raise HTTPException(status_code=400, detail=f"dedup_threshold must be between {near_duplicate_index.threshold} and 1")
+    return dedup, dedup_threshold
+
+def _question_fields(question: QuestionDB) -> dict:
+    return {"id": question.id, "text": question.text, "subject": question.subject,
+            "reference_answer": question.reference_answer, "difficulty": question.difficulty}
+
+async def _describe_matches(db: AsyncSession, matches) -> List[dict]:
+    if not matches:
+        return []
+    rows = (await db.execute(
+        select(QuestionDB.id, QuestionDB.text, QuestionDB.subject).where(QuestionDB.id.in_([question_id for question_id, _ in matches]))
+    )).all()
+    found = {row.id: row for row in rows}
+    described = []
+    for question_id, similarity in matches:
+        row = found.get(question_id)
+        if row is None:
+            # Deleted by another process since it was indexed
+            near_duplicate_index.remove(question_id)
+            continue
+        described.append({"question_id": question_id, "similarity": similarity, "text": row.text, "subject": row.subject})
+    return described
+
+@router.post("/", response_model=QuestionCreateResponse)
+async def create_question(question: QuestionCreate, dedup: Optional[str] = None, dedup_threshold: Optional[float] = None,
+                          db: AsyncSession = Depends(get_db)):
+    """
+    Create a question, checking it against the near-duplicate index first.
+
+    dedup (default QUESTION_DEDUP_POLICY): off, warn (create it and list the
+    near duplicates), reject (409) or merge (return the most similar existing
+    question instead of creating one).
+    """
+    dedup, dedup_threshold = _dedup_settings(dedup, dedup_threshold)
+    minhash = signature_bytes(question.text, question.reference_answer)
+    near_duplicates = []
+    if dedup != "off":
+        await db.run_sync(near_duplicate_index.sync)
+        near_duplicates = await _describe_matches(db, near_duplicate_index.find(minhash, dedup_threshold))
+    if near_duplicates and dedup == "reject":
+        raise HTTPException(status_code=409, detail={
+            "message": "Question is a near duplicate of existing questions",
+            "near_duplicates": near_duplicates,
+        })
+    if near_duplicates and dedup == "merge":
+        existing = await db.get(QuestionDB, near_duplicates[0]["question_id"])
+        return {**_question_fields(existing), "near_duplicates": near_duplicates, "merged": True}
+
+    db_question = QuestionDB(**question.dict(), minhash=minhash)
+    db.add(db_question)
+    # total_questions in /analytics/overview changes too
+    await db.run_sync(bump_data_version)
+    await db.commit()
+    await db.refresh(db_question)
+    near_duplicate_index.add([db_question.id], [minhash])
+    return {**_question_fields(db_question), "near_duplicates": near_duplicates}
+
+def _import_file(spool, fmt: str, skip_duplicates: bool, dedup: str, dedup_threshold: float) -> dict:
+    # Parsing and validation are CPU-bound, so the import runs in the threadpool
+    # on a sync session rather than on the event loop
     db = SessionLocal()
     try:
-        yield db
+        spool.seek(0)
+        stream = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+        importer = QuestionImporter(db, skip_duplicates=skip_duplicates, dedup=dedup, dedup_threshold=dedup_threshold)
+        return importer.run(stream, fmt)
     finally:
         db.close()
 
-@router.post("/", response_model=QuestionResponse)
-def create_question(question: QuestionCreate, db: Session = Depends(get_db)):
-    db_question = QuestionDB(**question.dict())
-    db.add(db_question)
-    db.commit()
-    db.refresh(db_question)
-    return db_question
+@router.post("/import")
+async def import_questions(request: Request, format: str = "jsonl", skip_duplicates: bool = False,
+                           dedup: Optional[str] = None, dedup_threshold: Optional[float] = None):
+    """
+    Bulk-import questions from a JSONL or CSV request body.
+
+    The body is spooled to disk as it arrives, then validated row by row and
+    inserted in batched transactions. Invalid rows are reported by line number,
+    near duplicates (of existing questions or earlier rows) with the action the
+    dedup policy took.
+    """
+    if format not in ("jsonl", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'jsonl' or 'csv'")
+    dedup, dedup_threshold = _dedup_settings(dedup, dedup_threshold)
+
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        return await run_in_threadpool(_import_file, spool, format, skip_duplicates, dedup, dedup_threshold)
+
+@router.get("/duplicates")
+async def read_duplicate_clusters(threshold: Optional[float] = None, limit: int = 100, db: AsyncSession = Depends(get_db)):
+    """Clusters of near-duplicate questions, largest first."""
+    _, threshold = _dedup_settings("warn", threshold)
+    await db.run_sync(near_duplicate_index.sync)
+    clusters = await run_in_threadpool(near_duplicate_index.clusters, threshold)
+    shown = clusters[:limit]
+    question_ids = [question_id for cluster in shown for question_id, _ in cluster]
+    rows = (await db.execute(
+        select(QuestionDB.id, QuestionDB.text, QuestionDB.subject, QuestionDB.difficulty).where(QuestionDB.id.in_(question_ids))
+    )).all() if question_ids else []
+    found = {row.id: row for row in rows}
+    groups = []
+    for cluster in shown:
+        questions = [
+            {"question_id": question_id, "similarity": similarity, "text": found[question_id].text,
+             "subject": found[question_id].subject, "difficulty": found[question_id].difficulty}
+            for question_id, similarity in cluster if question_id in found
+        ]
+        if len(questions) > 1:
+            groups.append({"size": len(questions), "questions": questions})
+    return {
+        "threshold": threshold,
+        "clusters": len(clusters),
+        "questions_in_clusters": sum(len(cluster) for cluster in clusters),
+        "groups": groups,
+    }
 
 @router.get("/", response_model=List[QuestionResponse])
-def read_questions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    questions = db.query(QuestionDB).offset(skip).limit(limit).all()
+async def read_questions(response: Response, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    # Keyset pagination: pass X-Next-Cursor back as after_id instead of growing skip
+    query = select(QuestionDB).order_by(QuestionDB.id)
+    if after_id is not None:
+        query = query.where(QuestionDB.id > after_id)
+    else:
+        query = query.offset(skip)
+    questions = (await db.execute(query.limit(limit))).scalars().all()
+    if len(questions) == limit and questions:
+        response.headers["X-Next-Cursor"] = str(questions[-1].id)
     return questions
 
+@router.get("/search")
+async def search_question_bank(response: Response, q: Optional[str] = None, subject: Optional[str] = None,
+                               difficulty: Optional[str] = None, limit: int = 50, skip: int = 0,
+                               after_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Full-text search over question text and reference answers.
+
+    With q, the newest SEARCH_RANK_WINDOW (default 5000) matches are ranked by
+    relevance and any older ones follow, newest first (page with skip).
+    Results carry text_snippet/reference_answer_snippet with matches in <mark>
+    tags. Without
+    q it lists the questions matching the filters in id order, paged with
+    X-Next-Cursor/after_id like GET /questions/.
+    """
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+    if skip < 0:
+        raise HTTPException(status_code=400, detail="skip must be >= 0")
+    results = await db.run_sync(
+        search_questions, q, subject=subject, difficulty=difficulty, limit=limit, skip=skip, after_id=after_id
+    )
+    if not q and len(results) == limit:
+        response.headers["X-Next-Cursor"] = str(results[-1]["id"])
+    return results
+
 @router.get("/{question_id}", response_model=QuestionResponse)
-def read_question(question_id: int, db: Session = Depends(get_db)):
-    question = db.query(QuestionDB).filter(QuestionDB.id == question_id).first()
+async def read_question(question_id: int, db: AsyncSession = Depends(get_db)):
+    question = await db.get(QuestionDB, question_id)
     if question is None:
         raise HTTPException(status_code=404, detail="Question not found")
     return question
 
 @router.delete("/{question_id}")
-def delete_question(question_id: int, db: Session = Depends(get_db)):
-    question = db.query(QuestionDB).filter(QuestionDB.id == question_id).first()
+async def delete_question(question_id: int, db: AsyncSession = Depends(get_db)):
+    question = await db.get(QuestionDB, question_id)
     if question is None:
         raise HTTPException(status_code=404, detail="Question not found")
-    db.delete(question)
-    db.commit()
+    await db.delete(question)
+    await db.flush()
+    # Evaluations of a deleted question drop out of the subject analytics
+    await db.run_sync(refresh_subject, question.subject)
+    await db.run_sync(bump_data_version)
+    await db.commit()
+    near_duplicate_index.remove(question_id)
     return {"ok": True}
@@ -0,0 +1,71 @@
+"""
+Analytics response cache keyed on a global data version.
+
+The data version lives in the database and is bumped in the same transaction
+as every write that can change analytics output, so all workers agree on it.
+Responses are cached per (version, endpoint, params), up to
+ANALYTICS_CACHE_MAX_ENTRIES with the least recently used evicted first;
+concurrent misses for the same key are coalesced so a burst of dashboard loads
+computes the result once.
+"""
+
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable
+from sqlalchemy import update
+from app.models import DataVersionDB
+
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "512"))
+
+def get_data_version(db) -> int:
+    version = db.query(DataVersionDB.version).filter(DataVersionDB.id == 1).scalar()
+    return version or 0
+
+def bump_data_version(db):
+    """Increment the data version; the caller commits with the data change."""
+    result = db.execute(update(DataVersionDB).where(DataVersionDB.id == 1).values(version=DataVersionDB.version + 1))
+    if result.rowcount == 0:
+        db.add(DataVersionDB(id=1, version=1))
+
+class AnalyticsCache:
+    def __init__(self, max_entries: int = ANALYTICS_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._version = None
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    async def get_or_compute(self, version: int, key: Hashable, compute: Callable[[], Awaitable[object]]):
+        if self._version != version:
+            # Entries for older versions can never be served again
+            self._version = version
+            self._entries.clear()
+            self._inflight.clear()
+        if key in self._entries:
+            self.stats["hits"] += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["misses"] += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._store(version, key, t))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _store(self, version: int, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if self._version == version and not task.cancelled() and task.exception() is None:
+            self._entries[key] = task.result()
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "version": self._version, "entries": len(self._entries)}
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Dict, List
+from sqlalchemy import or_, select, update
+from app.models import BatchRunDB, BatchRunCreate, EvaluationDB, QuestionDB, AsyncSessionLocal
+from app.services.rollup_service import record_evaluations
+from app.services.analytics_cache import bump_data_version
+from app.services.usage_service import record_calls
+from app.services.metrics import stage_timer
+
+# A pending or running batch whose progress hasn't moved for this long is taken as interrupted
+BATCH_STALE_SECONDS = float(os.getenv("BATCH_STALE_SECONDS", "600"))
+
+class BatchRunner:
+    """
+    Runs a question x model evaluation matrix in the background.
+
+    Work is fanned out with a global concurrency limit and a per-provider limit.
+    All models' answers to a question are scored in one multi-candidate judge
+    call, and finished evaluations are written to the database in bulk.
+    Progress is saved as each question finishes.
+
+    Runs are asyncio tasks of the process that started them, so a restart
+    loses them; fail_interrupted_runs marks those failed rather than leaving
+    them "running" forever.
+    """
+
+    FLUSH_SIZE = 50
+
+    def __init__(self, llm_service, eval_service, session_factory=AsyncSessionLocal):
+        self.llm_service = llm_service
+        self.eval_service = eval_service
+        self.session_factory = session_factory
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def resolve_questions(self, db, request: BatchRunCreate) -> List[tuple]:
+        """Select (id, text, reference_answer) for every question in the run."""
+        query = select(QuestionDB.id, QuestionDB.text, QuestionDB.reference_answer)
+        if request.question_ids:
+            query = query.where(QuestionDB.id.in_(request.question_ids))
+        if request.subject:
+            query = query.where(QuestionDB.subject == request.subject)
+        if request.difficulty:
+            query = query.where(QuestionDB.difficulty == request.difficulty)
+        return [tuple(row) for row in (await db.execute(query.order_by(QuestionDB.id))).all()]
+
+    async def create_run(self, db, total: int) -> BatchRunDB:
+        run = BatchRunDB(
+            id=uuid.uuid4().hex,
+            status="pending",
+            total=total,
+            completed=0,
+            failed=0,
+            updated_at=time.time(),
+        )
+        db.add(run)
+        await db.commit()
+        return run
+
+    def start(self, run_id: str, questions: List[tuple], request: BatchRunCreate) -> asyncio.Task:
+        task = asyncio.create_task(self._run(run_id, questions, request))
+        self._tasks[run_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(run_id, None))
+        return task
+
+    async def fail_interrupted_runs(self, stale_seconds: float = BATCH_STALE_SECONDS) -> int:
+        """
+        Mark pending or running batches without progress for stale_seconds as
+        failed, except this process's own. Other processes' live runs keep
+        saving progress, so they aren't touched.
+        """
+        async with self.session_factory() as db:
+            query = update(BatchRunDB).where(
+                BatchRunDB.status.in_(("pending", "running")),
+                or_(BatchRunDB.updated_at.is_(None), BatchRunDB.updated_at < time.time() - stale_seconds),
+            )
+            if self._tasks:
+                query = query.where(BatchRunDB.id.not_in(list(self._tasks)))
+            result = await db.execute(query.values(status="failed", error="Interrupted: the server stopped before the run finished"))
+            await db.commit()
+            return result.rowcount
+
+    async def _run(self, run_id: str, questions: List[tuple], request: BatchRunCreate):
+        async with self.session_factory() as db:
+            try:
+                await self._execute(db, run_id, questions, request)
+            except Exception as e:
+                await db.rollback()
+                run = await db.get(BatchRunDB, run_id)
+                if run:
+                    run.status = "failed"
+                    run.error = str(e)
+                    await db.commit()
+
+    async def _execute(self, db, run_id: str, questions: List[tuple], request: BatchRunCreate):
+        run = await db.get(BatchRunDB, run_id)
+        run.status = "running"
+        run.updated_at = time.time()
+        await db.commit()
+
+        global_limit = asyncio.Semaphore(max(1, request.concurrency))
+        provider_limits: Dict[str, asyncio.Semaphore] = {}
+        for target in request.models:
+            if target.provider not in provider_limits:
+                provider_limits[target.provider] = asyncio.Semaphore(max(1, request.per_provider_concurrency))
+
+        # (evaluation row, usage of the calls behind it)
+        pending: List[tuple] = []
+        counts = {"completed": 0, "failed": 0}
+        # The session can't be used by two flushes at once
+        flush_lock = asyncio.Lock()
+
+        def write_batch(session, items):
+            rows = [row for row, _ in items]
+            # return_defaults fills in the new ids, which the rollups and call records need
+            session.bulk_insert_mappings(EvaluationDB, rows, return_defaults=True)
+            record_evaluations(session, rows)
+            for row, calls in items:
+                record_calls(session, row["id"], calls)
+            bump_data_version(session)
+
+        async def flush(rows: bool = True):
+            """Save progress, and the pending evaluations if `rows`."""
+            async with flush_lock:
+                items = pending[:] if rows else []
+                if rows:
+                    pending.clear()
+                with stage_timer("db_commit"):
+                    if items:
+                        await db.run_sync(write_batch, items)
+                    run.completed = counts["completed"]
+                    run.failed = counts["failed"]
+                    run.updated_at = time.time()
+                    await db.commit()
+
+        async def fetch(target, text):
+            # Take the provider slot first so a throttled provider doesn't hold global slots
+            async with provider_limits[target.provider]:
+                async with global_limit:
+                    with stage_timer("candidate_call", target.provider, target.model_name):
+                        return await self.llm_service.get_response_with_usage(target.provider, target.model_name, text)
+
+        async def evaluate_question(question):
+            await score_question(question)
+            # Progress after every question; evaluations are written FLUSH_SIZE at a time
+            await flush(rows=len(pending) >= self.FLUSH_SIZE)
+
+        async def score_question(question):
+            question_id, text, reference_answer = question
+            responses = await asyncio.gather(*(fetch(t, text) for t in request.models), return_exceptions=True)
+            answered = [(t, r) for t, r in zip(request.models, responses) if not isinstance(r, BaseException)]
+            counts["failed"] += len(request.models) - len(answered)
+            if not answered:
+                return
+
+            # All models' answers to one question are judged together
+            try:
+                async with global_limit:
+                    with stage_timer("judge_call"):
+                        eval_results = await self.eval_service.evaluate_responses(text, reference_answer, [r for _, (r, _, _) in answered])
+            except Exception:
+                counts["failed"] += len(answered)
+                return
+
+            for (target, (ai_response_text, usage, answered_by)), eval_result in zip(answered, eval_results):
+                # A failed judgement has no real scores; count it rather than store zeros
+                if eval_result.get("failed"):
+                    counts["failed"] += 1
+                    continue
+                pending.append(({
+                    "question_id": question_id,
+                    # The model that answered, which may be a failover for the requested one
+                    "model_name": answered_by,
+                    "response_text": ai_response_text,
+                    "accuracy_score": eval_result["accuracy_score"],
+                    "clarity_score": eval_result["clarity_score"],
+                    "completeness_score": eval_result["completeness_score"],
+                    "reasoning": eval_result["reasoning"],
+                    # The score sketches bucket on it, reading it from this dict
+                    "created_at": time.time(),
+                }, [usage, eval_result.get("usage")]))
+                counts["completed"] += 1
+
+        tasks = [asyncio.create_task(evaluate_question(q)) for q in questions]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the other questions before the run is marked failed, rather than let them keep calling models
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        await flush()
+        run.status = "completed"
+        await db.commit()
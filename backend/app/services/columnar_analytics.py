@@ -0,0 +1,271 @@
+"""
+Vectorized analytics over the columnar cold files plus the hot SQLite rows.
+
+Answers the rollup-backed /analytics queries (overview, by-subject, by-model,
+breakdown) with the same output and ordering, and can also restrict them to a
+created_at range, which the rollups can't. Each scan reduces every part (a
+memory-mapped cold file, or a chunk of hot rows) to a small cube of counts,
+score sums and first ids per model x subject x difficulty with NumPy bincount
+kernels; all four queries are read off the merged cube.
+
+Selected with ANALYTICS_ENGINE=columnar, and always used when a query has a
+start/end range.
+"""
+
+import os
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pyarrow.compute as pc
+from sqlalchemy import text
+from app.services.analytics_cache import get_data_version
+from app.services.columnar_store import ColdStore, cold_store
+
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "rollups")
+HOT_CHUNK_ROWS = 100_000
+CUBE_CACHE_ENTRIES = 16
+
+SCORE_COLUMNS = ("accuracy_score", "clarity_score", "completeness_score")
+NO_FIRST_ID = np.iinfo(np.int64).max
+
+class Part:
+    """One chunk of evaluations: model codes into `models`, plus NumPy columns."""
+
+    def __init__(self, models: List[str], model_codes: np.ndarray, ids: np.ndarray, question_ids: np.ndarray, scores: List[np.ndarray]):
+        self.models = models
+        self.model_codes = model_codes
+        self.ids = ids
+        self.question_ids = question_ids
+        self.scores = scores
+
+def _numpy(column, fill=0) -> np.ndarray:
+    """
+    Zero-copy for a null-free column, which is what compaction usually writes;
+    nulls (like NULL scores, counted as 0 by the rollups) are filled first.
+    """
+    if column.null_count:
+        column = column.fill_null(fill)
+    return column.to_numpy()
+
+class QuestionIndex:
+    """
+    Current subject and difficulty codes per question id, for a vectorized join.
+    Ids of missing (deleted) questions map to the extra "no question" code,
+    which keeps their evaluations out of the subject-keyed results, as in the
+    SQL join.
+    """
+
+    def __init__(self, db):
+        rows = db.execute(text(
+            "SELECT id, COALESCE(subject, ''), COALESCE(difficulty, '') FROM questions"
+        )).all()
+        self.count = len(rows)
+        self.subjects = sorted({row[1] for row in rows})
+        self.difficulties = sorted({row[2] for row in rows})
+        subject_codes = {s: i for i, s in enumerate(self.subjects)}
+        difficulty_codes = {d: i for i, d in enumerate(self.difficulties)}
+        size = max((row[0] for row in rows), default=0) + 2
+        # The last slot catches ids beyond the newest question (np.take clips to it)
+        self.subject_by_id = np.full(size, len(self.subjects), dtype=np.int64)
+        self.difficulty_by_id = np.full(size, len(self.difficulties), dtype=np.int64)
+        if rows:
+            ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            self.subject_by_id[ids] = np.fromiter((subject_codes[row[1]] for row in rows), dtype=np.int64, count=len(rows))
+            self.difficulty_by_id[ids] = np.fromiter((difficulty_codes[row[2]] for row in rows), dtype=np.int64, count=len(rows))
+
+class Cube:
+    """
+    Per-model arrays of count, score sums and first evaluation id over
+    (subject + 1) x (difficulty + 1) cells; the extra row and column hold
+    evaluations whose question no longer exists.
+    """
+
+    def __init__(self, questions: QuestionIndex):
+        self.questions = questions
+        self.shape = (len(questions.subjects) + 1, len(questions.difficulties) + 1)
+        self.models: List[str] = []
+        self.counts: List[np.ndarray] = []
+        self.sums: List[np.ndarray] = []
+        self.first_ids: List[np.ndarray] = []
+        self._model_index: Dict[str, int] = {}
+
+    def _model(self, name: str) -> int:
+        index = self._model_index.get(name)
+        if index is None:
+            index = self._model_index[name] = len(self.models)
+            self.models.append(name)
+            self.counts.append(np.zeros(self.shape, dtype=np.int64))
+            self.sums.append(np.zeros((len(SCORE_COLUMNS),) + self.shape))
+            self.first_ids.append(np.full(self.shape, NO_FIRST_ID, dtype=np.int64))
+        return index
+
+    def add(self, part: Part):
+        if not len(part.ids):
+            return
+        subjects = np.take(self.questions.subject_by_id, part.question_ids, mode="clip")
+        difficulties = np.take(self.questions.difficulty_by_id, part.question_ids, mode="clip")
+        cells = self.shape[0] * self.shape[1]
+        size = len(part.models) * cells
+        group = (part.model_codes * self.shape[0] + subjects) * self.shape[1] + difficulties
+
+        counts = np.bincount(group, minlength=size).reshape(len(part.models), *self.shape)
+        sums = [np.bincount(group, weights=scores, minlength=size).reshape(len(part.models), *self.shape) for scores in part.scores]
+        first_ids = np.full(size, NO_FIRST_ID, dtype=np.int64)
+        np.minimum.at(first_ids, group, part.ids)
+        first_ids = first_ids.reshape(len(part.models), *self.shape)
+
+        for local in np.flatnonzero(counts.reshape(len(part.models), -1).sum(axis=1)):
+            index = self._model(part.models[local])
+            self.counts[index] += counts[local]
+            for metric, metric_sums in enumerate(sums):
+                self.sums[index][metric] += metric_sums[local]
+            np.minimum(self.first_ids[index], first_ids[local], out=self.first_ids[index])
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(counts, sums, first ids) stacked as [model, subject, difficulty] ([metric, ...] for sums)."""
+        if not self.models:
+            empty = (0,) + self.shape
+            return np.zeros(empty, dtype=np.int64), np.zeros((len(SCORE_COLUMNS),) + empty), np.zeros(empty, dtype=np.int64)
+        return np.stack(self.counts), np.stack(self.sums, axis=1), np.stack(self.first_ids)
+
+def _averages(count, sums) -> Dict:
+    count = int(count)
+    # Same arithmetic as the rollup endpoints: Python floats, round(sum / count, 1)
+    return {
+        "count": count,
+        "avg_accuracy": round(float(sums[0]) / count, 1),
+        "avg_clarity": round(float(sums[1]) / count, 1),
+        "avg_completeness": round(float(sums[2]) / count, 1),
+    }
+
+class ColumnarAnalytics:
+    def __init__(self, store: ColdStore = cold_store):
+        self.store = store
+        # Cubes per (data version, range); the four queries of a dashboard share one scan
+        self._cubes: "OrderedDict[tuple, Cube]" = OrderedDict()
+
+    def _cold_parts(self, manifest: Dict, start: Optional[float], end: Optional[float]) -> Iterator[Part]:
+        for table in self.store.scan(manifest, start, end):
+            if start is not None or end is not None:
+                created_at = table.column("created_at")
+                mask = None
+                if start is not None:
+                    mask = pc.greater_equal(created_at, start)
+                if end is not None:
+                    before = pc.less(created_at, end)
+                    mask = before if mask is None else pc.and_(mask, before)
+                table = table.filter(mask)
+            # Each file is written as one record batch with one dictionary
+            for batch in table.to_batches():
+                models = batch.column("model_name")
+                yield Part(
+                    models.dictionary.to_pylist(),
+                    models.indices.to_numpy().astype(np.int64),
+                    _numpy(batch.column("id")),
+                    # Like the hot rows, a missing question id matches no question
+                    _numpy(batch.column("question_id"), fill=-1),
+                    [_numpy(batch.column(name)) for name in SCORE_COLUMNS],
+                )
+
+    def _hot_parts(self, db, watermark: int, start: Optional[float], end: Optional[float]) -> Iterator[Part]:
+        conditions = ["id > :watermark"]
+        if start is not None:
+            conditions.append("created_at >= :start")
+        if end is not None:
+            conditions.append("created_at < :end")
+        result = db.execute(
+            text(f"SELECT id, question_id, model_name, {', '.join(SCORE_COLUMNS)} FROM evaluations "
+                 f"WHERE {' AND '.join(conditions)} ORDER BY id"),
+            {"watermark": watermark, "start": start, "end": end},
+        )
+        while True:
+            rows = result.fetchmany(HOT_CHUNK_ROWS)
+            if not rows:
+                break
+            ids, question_ids, model_names, *scores = zip(*rows)
+            models: Dict[str, int] = {}
+            codes = np.fromiter((models.setdefault(name, len(models)) for name in model_names), dtype=np.int64, count=len(rows))
+            yield Part(
+                list(models),
+                codes,
+                np.array(ids, dtype=np.int64),
+                np.array([-1 if qid is None else qid for qid in question_ids], dtype=np.int64),
+                [np.array([score or 0.0 for score in column], dtype=np.float64) for column in scores],
+            )
+
+    def parts(self, db, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Part]:
+        """Every evaluation created in [start, end): the cold files, then the hot rows past their watermark."""
+        manifest = self.store.manifest()
+        yield from self._cold_parts(manifest, start, end)
+        yield from self._hot_parts(db, manifest["watermark"], start, end)
+
+    def cube(self, db, start: Optional[float] = None, end: Optional[float] = None) -> Cube:
+        key = (get_data_version(db), start, end)
+        cube = self._cubes.get(key)
+        if cube is not None:
+            self._cubes.move_to_end(key)
+            return cube
+
+        cube = Cube(QuestionIndex(db))
+        for part in self.parts(db, start, end):
+            cube.add(part)
+
+        self._cubes[key] = cube
+        while len(self._cubes) > CUBE_CACHE_ENTRIES:
+            self._cubes.popitem(last=False)
+        return cube
+
+    def overview(self, db, start: Optional[float] = None, end: Optional[float] = None) -> Dict:
+        cube = self.cube(db, start, end)
+        counts, sums, _ = cube.arrays()
+        total = int(counts.sum())
+        if not total:
+            return {"total_evaluations": 0, "avg_accuracy": 0, "avg_clarity": 0, "avg_completeness": 0, "total_questions": 0}
+        averages = _averages(total, sums.sum(axis=(1, 2, 3)))
+        return {
+            "total_evaluations": total,
+            "avg_accuracy": averages["avg_accuracy"],
+            "avg_clarity": averages["avg_clarity"],
+            "avg_completeness": averages["avg_completeness"],
+            "total_questions": cube.questions.count,
+        }
+
+    def by_model(self, db, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict]:
+        cube = self.cube(db, start, end)
+        counts, sums, first_ids = cube.arrays()
+        counts, sums, first_ids = counts.sum(axis=(1, 2)), sums.sum(axis=(2, 3)), first_ids.min(axis=(1, 2), initial=NO_FIRST_ID)
+        order = [i for i in np.argsort(first_ids, kind="stable") if counts[i]]
+        return [{"model": cube.models[i], **_averages(counts[i], sums[:, i])} for i in order]
+
+    def by_subject(self, db, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict]:
+        cube = self.cube(db, start, end)
+        counts, sums, first_ids = cube.arrays()
+        # Drop the "no question" row and column
+        counts, sums, first_ids = counts[:, :-1, :-1], sums[:, :, :-1, :-1], first_ids[:, :-1, :-1]
+        counts, sums, first_ids = counts.sum(axis=(0, 2)), sums.sum(axis=(1, 3)), first_ids.min(axis=(0, 2), initial=NO_FIRST_ID)
+        order = [i for i in np.argsort(first_ids, kind="stable") if counts[i]]
+        return [{"subject": cube.questions.subjects[i], **_averages(counts[i], sums[:, i])} for i in order]
+
+    def breakdown(self, db, model: Optional[str] = None, subject: Optional[str] = None, difficulty: Optional[str] = None,
+                  start: Optional[float] = None, end: Optional[float] = None) -> List[Dict]:
+        cube = self.cube(db, start, end)
+        counts, sums, first_ids = cube.arrays()
+        counts, sums, first_ids = counts[:, :-1, :-1], sums[:, :, :-1, :-1], first_ids[:, :-1, :-1]
+        selected = counts > 0
+        for value, names, axis in ((model, cube.models, 0), (subject, cube.questions.subjects, 1), (difficulty, cube.questions.difficulties, 2)):
+            if value:
+                keep = np.array([name == value for name in names], dtype=bool)
+                selected &= np.expand_dims(keep, tuple(a for a in range(3) if a != axis))
+        cells = np.argwhere(selected)
+        cells = cells[np.argsort(first_ids[selected], kind="stable")]
+        return [
+            {
+                "model": cube.models[m],
+                "subject": cube.questions.subjects[s],
+                "difficulty": cube.questions.difficulties[d],
+                **_averages(counts[m, s, d], sums[:, m, s, d]),
+            }
+            for m, s, d in cells
+        ]
+
+columnar_analytics = ColumnarAnalytics()
@@ -0,0 +1,229 @@
+"""
+Columnar cold storage for evaluations.
+
+compact() copies evaluations older than ANALYTICS_HOT_DAYS into Arrow IPC
+files under ANALYTICS_COLD_DIR, partitioned by the month of created_at:
+
+    month=2026-09/part-<first id>-<last id>.arrow
+
+The files hold the columns analytics needs (ids, model, scores, created_at);
+the text stays in SQLite, which remains the source of truth. manifest.json
+lists the files and the watermark: every evaluation id up to it is in the
+cold files, later ones are "hot" and read from SQLite. Files are written
+before the manifest that names them, so readers never see a partial
+compaction, and they are uncompressed so scans memory-map them rather than
+reading them in.
+
+Question metadata is deliberately not copied: questions can be deleted after
+compaction, so the engine joins the current subject and difficulty at scan
+time, like the SQL analytics do.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import pyarrow as pa
+from sqlalchemy import text
+from app.models import SessionLocal
+from app.services.metrics import record_error
+
+ANALYTICS_COLD_DIR = os.getenv("ANALYTICS_COLD_DIR", "./cold_storage")
+ANALYTICS_HOT_DAYS = float(os.getenv("ANALYTICS_HOT_DAYS", "30"))
+# 0 disables the in-process job; compact_evaluations.py can run from cron instead
+ANALYTICS_COMPACT_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_COMPACT_INTERVAL_SECONDS", "0"))
+# Rows per file; a month with more is split into several parts
+COMPACTION_FILE_ROWS = 1_000_000
+FETCH_ROWS = 50_000
+
+MANIFEST = "manifest.json"
+# Partition for evaluations stored before created_at was recorded
+UNKNOWN_PARTITION = "month=unknown"
+
+COLD_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("question_id", pa.int64()),
+    ("model_name", pa.dictionary(pa.int32(), pa.string())),
+    ("accuracy_score", pa.float64()),
+    ("clarity_score", pa.float64()),
+    ("completeness_score", pa.float64()),
+    ("created_at", pa.float64()),
+])
+
+COMPACT_SQL = text("""
+    SELECT id, question_id, model_name, accuracy_score, clarity_score, completeness_score, created_at
+    FROM evaluations WHERE id > :watermark AND id <= :upper ORDER BY id
+""")
+
+def partition_for(created_at: Optional[float]) -> str:
+    if created_at is None:
+        return UNKNOWN_PARTITION
+    return datetime.fromtimestamp(created_at, timezone.utc).strftime("month=%Y-%m")
+
+def partition_range(partition: str) -> Optional[tuple]:
+    """[start, end) Unix times covered by a month partition, None for the unknown one."""
+    if partition == UNKNOWN_PARTITION:
+        return None
+    start = datetime.strptime(partition, "month=%Y-%m").replace(tzinfo=timezone.utc)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start.timestamp(), end.timestamp()
+
+class ColdStore:
+    def __init__(self, directory: str = ANALYTICS_COLD_DIR):
+        self.directory = directory
+
+    def manifest(self) -> Dict:
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"watermark": 0, "files": []}
+
+    def _write_manifest(self, manifest: Dict):
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def scan(self, manifest: Dict, start: Optional[float] = None, end: Optional[float] = None) -> List[pa.Table]:
+        """
+        Memory-map the manifest's files, skipping partitions outside [start, end).
+        With a range, the unknown-time partition is skipped too. Rows inside
+        kept partitions are not filtered here.
+        """
+        tables = []
+        for entry in manifest["files"]:
+            if start is not None or end is not None:
+                covered = partition_range(entry["partition"])
+                if covered is None or (start is not None and covered[1] <= start) or (end is not None and covered[0] >= end):
+                    continue
+            source = pa.memory_map(os.path.join(self.directory, entry["path"]))
+            tables.append(pa.ipc.open_file(source).read_all())
+        return tables
+
+    def _write_part(self, partition: str, columns: Dict[str, list]) -> Dict:
+        ids = columns["id"]
+        directory = os.path.join(self.directory, partition)
+        os.makedirs(directory, exist_ok=True)
+        relative = os.path.join(partition, f"part-{ids[0]}-{ids[-1]}.arrow")
+        path = os.path.join(self.directory, relative)
+        table = pa.table({
+            **{name: columns[name] for name in COLD_SCHEMA.names if name != "model_name"},
+            "model_name": pa.array(columns["model_name"], pa.string()).dictionary_encode(),
+        }).select(COLD_SCHEMA.names).cast(COLD_SCHEMA)
+        with pa.OSFile(path + ".tmp", "wb") as sink:
+            with pa.ipc.new_file(sink, COLD_SCHEMA) as writer:
+                writer.write_table(table)
+        os.replace(path + ".tmp", path)
+        return {"path": relative, "partition": partition, "rows": len(ids), "first_id": ids[0], "last_id": ids[-1]}
+
+    def compact(self, db, hot_days: float = ANALYTICS_HOT_DAYS) -> Dict:
+        """
+        Copy evaluations older than hot_days that aren't in the cold files yet.
+
+        Compacts every id up to the newest old-enough evaluation, so the cold
+        and hot sets split on a single id watermark.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        # The app's job and a cron run mustn't both append to the manifest
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            return self._compact(db, hot_days)
+
+    def rebuild(self, db, hot_days: float = ANALYTICS_HOT_DAYS) -> Dict:
+        """
+        Rewrite the cold files from SQLite, e.g. after evaluations were renamed
+        there. Readers see an empty manifest in between and fall back to SQLite.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            old = self.manifest()
+            self._write_manifest({"watermark": 0, "files": []})
+            for entry in old["files"]:
+                try:
+                    os.remove(os.path.join(self.directory, entry["path"]))
+                except FileNotFoundError:
+                    pass
+            return self._compact(db, hot_days)
+
+    def _compact(self, db, hot_days: float) -> Dict:
+        manifest = self.manifest()
+        watermark = manifest["watermark"]
+        cutoff = time.time() - hot_days * 86400
+        upper = db.execute(
+            text("SELECT MAX(id) FROM evaluations WHERE id > :watermark AND (created_at IS NULL OR created_at < :cutoff)"),
+            {"watermark": watermark, "cutoff": cutoff},
+        ).scalar()
+        if upper is None:
+            return {"rows": 0, "files": 0, "watermark": watermark}
+
+        new_files: List[Dict] = []
+        pending: Dict[str, Dict[str, list]] = {}
+        rows = 0
+        result = db.execute(COMPACT_SQL, {"watermark": watermark, "upper": upper})
+        while True:
+            batch = result.fetchmany(FETCH_ROWS)
+            if not batch:
+                break
+            for row in batch:
+                partition = partition_for(row[6])
+                columns = pending.get(partition)
+                if columns is None:
+                    columns = pending[partition] = {name: [] for name in COLD_SCHEMA.names}
+                for name, value in zip(COLD_SCHEMA.names, row):
+                    columns[name].append(value)
+                if len(columns["id"]) >= COMPACTION_FILE_ROWS:
+                    new_files.append(self._write_part(partition, pending.pop(partition)))
+            rows += len(batch)
+        for partition, columns in pending.items():
+            new_files.append(self._write_part(partition, columns))
+
+        manifest = {
+            "watermark": upper,
+            "files": manifest["files"] + new_files,
+            "compacted_at": time.time(),
+        }
+        self._write_manifest(manifest)
+        return {"rows": rows, "files": len(new_files), "watermark": upper}
+
+class CompactionJob:
+    """Runs ColdStore.compact every interval seconds in the app process."""
+
+    def __init__(self, store: ColdStore, interval: float = ANALYTICS_COMPACT_INTERVAL_SECONDS):
+        self.store = store
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def _compact(self) -> Dict:
+        db = SessionLocal()
+        try:
+            return self.store.compact(db)
+        finally:
+            db.close()
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self._compact)
+            except Exception:
+                # A locked database or full disk; the next run picks up where this one stopped
+                record_error("compaction", kind="compaction_error")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+cold_store = ColdStore()
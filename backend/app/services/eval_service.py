@@ -1,19 +1,50 @@
 import json
 import os
+from typing import Callable, List, Optional
 from .truthmeter_judge import TruthMeterJudgeModel
+from .judge_cache import JudgeCache
+from .metrics import JUDGE_TIER_DECISIONS
+from .reference_scorer import ReferenceScorer
 
 class EvaluationService:
-    def __init__(self):
+    def __init__(self, reference_scorer: ReferenceScorer = None):
         # Initialize our proprietary TruthMeter-Judge model
         self.judge_model = TruthMeterJudgeModel()
+        self.judge_cache = JudgeCache()
+        # Cheap first tier; the LLM judge only sees what it can't settle
+        self.reference_scorer = reference_scorer or ReferenceScorer()
 
-    async def evaluate_response(self, question_text: str, reference_answer: str, ai_response_text: str) -> dict:
+    def _reference_tier(self, reference_answer: str, ai_response_text: str):
+        """The reference tier's result if it is confident, else None."""
+        if not self.reference_scorer.enabled:
+            return None
+        assessment = self.reference_scorer.assess(reference_answer, ai_response_text)
+        JUDGE_TIER_DECISIONS.inc(decision=assessment["decision"])
+        result = self.reference_scorer.result_for(
+            assessment, self.judge_model.MODEL_NAME, self.judge_model.MODEL_VERSION,
+        )
+        if result is not None:
+            result["usage"] = None
+        return result
+
+    async def evaluate_response(self, question_text: str, reference_answer: str, ai_response_text: str,
+                                on_score: Optional[Callable[[str, float], None]] = None) -> dict:
         """
         Evaluates an AI response using our proprietary TruthMeter-Judge-v1.0 model.
         
         This model has been specifically trained on educational content evaluation.
+        Responses the reference tier is confident about are scored locally without
+        a judge call. The judge call's usage is returned under "usage" (None on a
+        cache hit or a reference-tier result). Results with "failed" set carry no
+        real scores and must not be stored.
+
+        If `on_score` is given, on_score(field, value) is called as each score
+        streams in from a judge call (not for cached or reference-tier results).
         """
-        
+        tiered = self._reference_tier(reference_answer, ai_response_text)
+        if tiered is not None:
+            return tiered
+
         # Check if our judge model is available
         if not os.getenv("OPENAI_API_KEY"):
              return {
@@ -22,16 +53,28 @@ class EvaluationService:
                 "completeness_score": 0,
                 "reasoning": "Error: TruthMeter-Judge model unavailable (API key not configured)",
                 "judged_by": "TruthMeter-Judge-v1.0",
-                "model_version": "1.0.0"
+                "model_version": "1.0.0",
+                "failed": True
             }
 
+        cache_key = self.judge_model.cache_key(question_text, reference_answer, ai_response_text)
+        cached = await self.judge_cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
         try:
             # Use our proprietary TruthMeter-Judge model for evaluation
             result = await self.judge_model.evaluate(
                 question=question_text,
                 reference_answer=reference_answer,
-                ai_response=ai_response_text
+                ai_response=ai_response_text,
+                on_score=on_score,
             )
+            usage = result.pop("usage", None)
+            # Never cache failed judgements, so a retry gets a fresh call
+            if not result.get("failed"):
+                await self.judge_cache.aset(cache_key, result)
+            result["usage"] = usage
             return result
             
         except Exception as e:
@@ -41,9 +84,68 @@ class EvaluationService:
                 "completeness_score": 0,
                 "reasoning": f"TruthMeter-Judge evaluation failed: {str(e)}",
                 "judged_by": "TruthMeter-Judge-v1.0",
-                "model_version": "1.0.0"
+                "model_version": "1.0.0",
+                "failed": True
             }
     
+    async def evaluate_responses(self, question_text: str, reference_answer: str, ai_response_texts: List[str]) -> List[dict]:
+        """
+        Evaluates several AI responses to the same question.
+
+        Responses the reference tier settles are scored locally. Cache misses are
+        scored together with TruthMeter-Judge's multi-candidate mode, so the rubric
+        and reference are sent once rather than once per model.
+        """
+        if not os.getenv("OPENAI_API_KEY"):
+            return [await self.evaluate_response(question_text, reference_answer, text) for text in ai_response_texts]
+
+        results = [self._reference_tier(reference_answer, text) for text in ai_response_texts]
+        keys = [self.judge_model.cache_key(question_text, reference_answer, text, batch=True) for text in ai_response_texts]
+        missing = []
+        for i, key in enumerate(keys):
+            if results[i] is not None:
+                continue
+            cached = await self.judge_cache.aget(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing.append(i)
+
+        if missing:
+            # Identical responses (e.g. deterministic models) only need judging once
+            unique_texts = list(dict.fromkeys(ai_response_texts[i] for i in missing))
+            try:
+                judged = await self.judge_model.evaluate_batch(question_text, reference_answer, unique_texts)
+            except Exception as e:
+                judged = [{
+                    "accuracy_score": 0,
+                    "clarity_score": 0,
+                    "completeness_score": 0,
+                    "reasoning": f"TruthMeter-Judge evaluation failed: {str(e)}",
+                    "judged_by": "TruthMeter-Judge-v1.0",
+                    "model_version": "1.0.0",
+                    "failed": True
+                }] * len(unique_texts)
+            by_text = dict(zip(unique_texts, judged))
+
+            charged = set()
+            for i in missing:
+                result = dict(by_text[ai_response_texts[i]])
+                usage = result.pop("usage", None)
+                if not result.get("failed"):
+                    await self.judge_cache.aset(keys[i], result)
+                # A deduplicated judgement is only charged to the first response that needed it
+                if ai_response_texts[i] not in charged:
+                    charged.add(ai_response_texts[i])
+                    result["usage"] = usage
+                results[i] = result
+
+        return results
+    
     def get_judge_info(self) -> dict:
         """Get information about our proprietary judge model"""
         return self.judge_model.get_model_info()
+
+    def get_cache_stats(self) -> dict:
+        """Hit/miss counters for the judge result cache"""
+        return self.judge_cache.get_stats()
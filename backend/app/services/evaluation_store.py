@@ -0,0 +1,38 @@
+"""
+Persistence for finished evaluations.
+
+An evaluation row, its rollup contributions, its call usage and the data version
+bump are always written in one transaction.
+"""
+
+import time
+from typing import Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import EvaluationDB
+from app.services.rollup_service import record_evaluations, evaluation_row
+from app.services.analytics_cache import bump_data_version
+from app.services.usage_service import record_calls
+
+def insert_evaluation(session, question_id: int, model_name: str, ai_response_text: str, eval_result: dict, calls: Optional[List[Dict]] = None) -> EvaluationDB:
+    db_eval = EvaluationDB(
+        question_id=question_id,
+        model_name=model_name,
+        response_text=ai_response_text,
+        accuracy_score=eval_result["accuracy_score"],
+        clarity_score=eval_result["clarity_score"],
+        completeness_score=eval_result["completeness_score"],
+        reasoning=eval_result["reasoning"],
+        created_at=time.time(),
+    )
+    session.add(db_eval)
+    session.flush()
+    record_evaluations(session, [evaluation_row(db_eval)])
+    record_calls(session, db_eval.id, calls or [])
+    bump_data_version(session)
+    return db_eval
+
+async def save_evaluation(db: AsyncSession, question_id: int, model_name: str, ai_response_text: str, eval_result: dict, calls: Optional[List[Dict]] = None) -> EvaluationDB:
+    """Insert an evaluation, its call usage, and update the rollups and data version in one transaction."""
+    db_eval = await db.run_sync(insert_evaluation, question_id, model_name, ai_response_text, eval_result, calls)
+    await db.commit()
+    return db_eval
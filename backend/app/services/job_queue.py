@@ -0,0 +1,348 @@
+"""
+Durable evaluation job queue backed by the evaluation_jobs table.
+
+Jobs are claimed with a single UPDATE ... RETURNING, which takes a lease for
+JOB_LEASE_SECONDS that the worker renews while it runs. If the process dies, the
+lease simply runs out and any worker (after a restart, or in another process
+sharing the database) picks the job up again. The candidate answer is stored on
+the job as soon as it arrives, so a retry or recovery never pays for it twice.
+
+A job's evaluation is inserted in the same transaction that marks it succeeded,
+and only while its lease is still held, so a job can't produce two evaluations.
+A job whose lease runs out on its last attempt is failed rather than re-leased.
+
+Finished jobs are deleted JOB_RETENTION_SECONDS after they last changed (0
+keeps them forever); their evaluations stay.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Set
+from sqlalchemy import func, select, text, update
+from app.models import EvaluationJobDB, QuestionDB, AsyncSessionLocal
+from app.services.evaluation_store import insert_evaluation
+from app.services.metrics import JOBS_IN_FLIGHT, record_error, stage_timer
+from app.services.rate_limiter import LLMCallError, backoff_delay
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "300"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+JOB_PURGE_INTERVAL_SECONDS = float(os.getenv("JOB_PURGE_INTERVAL_SECONDS", "3600"))
+JOB_PURGE_BATCH_SIZE = int(os.getenv("JOB_PURGE_BATCH_SIZE", "1000"))
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+LEASE_EXHAUSTED_ERROR = "Lease expired on the last attempt"
+
+# Runs in the claim's transaction, so an exhausted job is never leased again
+EXPIRE_SQL = text("""
+    UPDATE evaluation_jobs
+    SET status = 'failed', stage = NULL, error = :error, lease_owner = NULL, lease_expires_at = NULL, updated_at = :now
+    WHERE status = 'running' AND lease_expires_at < :now AND attempts >= max_attempts
+    RETURNING id, provider
+""")
+
+CLAIM_SQL = text("""
+    UPDATE evaluation_jobs
+    SET status = 'running', lease_owner = :owner, lease_expires_at = :lease_expires_at,
+        attempts = attempts + 1, updated_at = :now
+    WHERE id = (
+        SELECT id FROM evaluation_jobs
+        WHERE (status = 'queued' AND available_at <= :now)
+           OR (status = 'running' AND lease_expires_at < :now AND attempts < max_attempts)
+        ORDER BY available_at, id
+        LIMIT 1
+    )
+    RETURNING id, question_id, provider, model_name, attempts, max_attempts, response_text, response_usage, answered_by
+""")
+
+PURGE_SQL = text("""
+    DELETE FROM evaluation_jobs
+    WHERE id IN (
+        SELECT id FROM evaluation_jobs
+        WHERE status IN ('succeeded', 'failed') AND updated_at < :cutoff
+        LIMIT :batch
+    )
+""")
+
+class JobQueue:
+    """Enqueues evaluation jobs and runs them on a pool of asyncio workers."""
+
+    def __init__(
+        self,
+        llm_service,
+        eval_service,
+        session_factory=AsyncSessionLocal,
+        workers: int = JOB_WORKERS,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        poll_seconds: float = JOB_POLL_SECONDS,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+    ):
+        self.llm_service = llm_service
+        self.eval_service = eval_service
+        self.session_factory = session_factory
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        # Identifies this process's leases
+        self.owner = uuid.uuid4().hex
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._waiters: Dict[int, Set[asyncio.Event]] = {}
+        self.stats = {"claimed": 0, "succeeded": 0, "failed": 0, "retried": 0, "lease_lost": 0, "worker_errors": 0, "purged": 0}
+
+    async def enqueue(self, db, question_id: int, provider: str, model_name: str) -> EvaluationJobDB:
+        now = time.time()
+        job = EvaluationJobDB(
+            question_id=question_id,
+            provider=provider,
+            model_name=model_name,
+            status="queued",
+            attempts=0,
+            max_attempts=self.max_attempts,
+            available_at=now,
+            created_at=now,
+            updated_at=now,
+        )
+        db.add(job)
+        await db.commit()
+        self._wakeup.set()
+        return job
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+        if self.retention_seconds > 0:
+            self._tasks.append(asyncio.create_task(self._purge_loop()))
+
+    async def stop(self):
+        """Stop the workers and hand this process's unfinished jobs back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        async with self.session_factory() as db:
+            # The interrupted attempt doesn't count against the job
+            await db.execute(
+                update(EvaluationJobDB)
+                .where(EvaluationJobDB.lease_owner == self.owner, EvaluationJobDB.status == "running")
+                .values(status="queued", stage=None, lease_owner=None, lease_expires_at=None,
+                        attempts=EvaluationJobDB.attempts - 1, available_at=time.time(), updated_at=time.time())
+            )
+            await db.commit()
+
+    async def wait_for(self, job_id: int, timeout: float) -> Optional[EvaluationJobDB]:
+        """Wait up to `timeout` seconds for a job to finish; returns its latest state."""
+        deadline = time.monotonic() + timeout
+        event = asyncio.Event()
+        self._waiters.setdefault(job_id, set()).add(event)
+        try:
+            while True:
+                async with self.session_factory() as db:
+                    job = await db.get(EvaluationJobDB, job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job.status in TERMINAL_STATUSES or remaining <= 0:
+                    return job
+                # Jobs finished by this process wake us directly; poll for other processes
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, self.poll_seconds))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            waiters = self._waiters.get(job_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[job_id]
+
+    async def purge_finished(self) -> int:
+        """Delete jobs that finished more than retention_seconds ago, in batches; returns the count."""
+        cutoff = time.time() - self.retention_seconds
+        purged = 0
+        while True:
+            async with self.session_factory() as db:
+                deleted = (await db.execute(PURGE_SQL, {"cutoff": cutoff, "batch": JOB_PURGE_BATCH_SIZE})).rowcount
+                await db.commit()
+            purged += deleted
+            if deleted < JOB_PURGE_BATCH_SIZE:
+                break
+        self.stats["purged"] += purged
+        return purged
+
+    async def get_summary(self, db) -> Dict:
+        counts = dict((await db.execute(
+            select(EvaluationJobDB.status, func.count(EvaluationJobDB.id)).group_by(EvaluationJobDB.status)
+        )).all())
+        oldest_queued = (await db.execute(
+            select(func.min(EvaluationJobDB.created_at)).where(EvaluationJobDB.status == "queued")
+        )).scalar()
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "succeeded": counts.get("succeeded", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_queued_age_seconds": round(time.time() - oldest_queued, 1) if oldest_queued else None,
+            "workers": len(self._tasks),
+            "worker_stats": dict(self.stats),
+        }
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self._claim()
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Keep the worker alive (e.g. a locked database); the job's lease will expire and it gets retried
+                self.stats["worker_errors"] += 1
+                record_error("job_worker", kind="worker_error")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _purge_loop(self):
+        while True:
+            try:
+                await self.purge_finished()
+            except Exception:
+                # A locked database; the next run deletes what this one didn't
+                record_error("job_purge", kind="purge_error")
+            await asyncio.sleep(JOB_PURGE_INTERVAL_SECONDS)
+
+    async def _claim(self) -> Optional[Dict]:
+        now = time.time()
+        async with self.session_factory() as db:
+            exhausted = (await db.execute(EXPIRE_SQL, {"now": now, "error": LEASE_EXHAUSTED_ERROR})).all()
+            row = (await db.execute(CLAIM_SQL, {
+                "owner": self.owner,
+                "now": now,
+                "lease_expires_at": now + self.lease_seconds,
+            })).mappings().first()
+            await db.commit()
+        for job_id, provider in exhausted:
+            self.stats["failed"] += 1
+            record_error("job", provider=provider, kind="failed")
+            self._notify(job_id)
+        if row is None:
+            return None
+        self.stats["claimed"] += 1
+        return dict(row)
+
+    async def _process(self, job: Dict):
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            with JOBS_IN_FLIGHT.track():
+                await self._run_job(job)
+        except LLMCallError as e:
+            await self._fail(job, e.message, retryable=e.retryable, retry_after=e.retry_after)
+        except Exception as e:
+            await self._fail(job, str(e), retryable=True)
+        finally:
+            heartbeat.cancel()
+
+    async def _run_job(self, job: Dict):
+        provider, model_name = job["provider"], job["model_name"]
+        with stage_timer("question_lookup"):
+            async with self.session_factory() as db:
+                question = await db.get(QuestionDB, job["question_id"])
+        if question is None:
+            await self._fail(job, "Question not found", retryable=False)
+            return
+
+        response_text = job["response_text"]
+        usage = json.loads(job["response_usage"]) if job["response_usage"] else None
+        answered_by = job["answered_by"] or self.llm_service.model_label(provider, model_name)
+        if response_text is None:
+            await self._update_owned(job["id"], stage="model")
+            with stage_timer("candidate_call", provider, model_name):
+                response_text, usage, answered_by = await self.llm_service.get_response_with_usage(provider, model_name, question.text)
+            await self._update_owned(
+                job["id"], stage="judge", response_text=response_text, response_usage=json.dumps(usage) if usage else None,
+                answered_by=answered_by,
+            )
+        else:
+            await self._update_owned(job["id"], stage="judge")
+
+        with stage_timer("judge_call", provider, model_name):
+            eval_result = await self.eval_service.evaluate_response(question.text, question.reference_answer, response_text)
+        if eval_result.get("failed"):
+            await self._fail(job, eval_result["reasoning"], retryable=True)
+            return
+
+        with stage_timer("db_commit", provider, model_name):
+            async with self.session_factory() as db:
+                db_eval = await db.run_sync(
+                    # Attributed to the model that answered, which may be a failover
+                    insert_evaluation, question.id, answered_by, response_text, eval_result,
+                    [usage, eval_result.get("usage")],
+                )
+                result = await db.execute(
+                    self._owned(job["id"]).values(
+                        status="succeeded", stage=None, evaluation_id=db_eval.id, error=None,
+                        lease_owner=None, lease_expires_at=None, updated_at=time.time(),
+                    )
+                )
+                if result.rowcount == 0:
+                    # Our lease expired and another worker owns the job now; let it finish
+                    await db.rollback()
+                    self.stats["lease_lost"] += 1
+                    return
+                await db.commit()
+        self.stats["succeeded"] += 1
+        self._notify(job["id"])
+
+    async def _fail(self, job: Dict, message: str, retryable: bool, retry_after: Optional[float] = None):
+        now = time.time()
+        if retryable and job["attempts"] < job["max_attempts"]:
+            delay = retry_after if retry_after is not None else backoff_delay(job["attempts"] - 1, JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS)
+            values = {"status": "queued", "available_at": now + delay}
+            self.stats["retried"] += 1
+        else:
+            values = {"status": "failed"}
+            self.stats["failed"] += 1
+        record_error("job", provider=job["provider"], kind="retried" if values["status"] == "queued" else "failed")
+        async with self.session_factory() as db:
+            await db.execute(self._owned(job["id"]).values(
+                **values, stage=None, error=message, lease_owner=None, lease_expires_at=None, updated_at=now,
+            ))
+            await db.commit()
+        if values["status"] == "failed":
+            self._notify(job["id"])
+
+    def _owned(self, job_id: int):
+        return update(EvaluationJobDB).where(
+            EvaluationJobDB.id == job_id,
+            EvaluationJobDB.lease_owner == self.owner,
+            EvaluationJobDB.status == "running",
+        )
+
+    async def _update_owned(self, job_id: int, **values):
+        async with self.session_factory() as db:
+            await db.execute(self._owned(job_id).values(**values, updated_at=time.time()))
+            await db.commit()
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self._update_owned(job_id, lease_expires_at=time.time() + self.lease_seconds)
+
+    def _notify(self, job_id: int):
+        for event in self._waiters.get(job_id, ()):
+            event.set()
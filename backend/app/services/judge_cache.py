@@ -0,0 +1,189 @@
+"""
+Content-addressed cache for TruthMeter-Judge results.
+
+Entries are keyed by a hash of the normalized (question, reference, response)
+triple together with the judge prompt version and base model, so a rubric or
+model change never serves stale scores. Lookups go through an in-memory LRU
+tier first and fall back to a persistent SQLite tier.
+
+From async code use aget/aset: memory hits are answered inline and SQLite is
+only touched on a worker thread. A disk hit's last_used (which drives size
+eviction) is batched rather than committed per hit, and flushed before every
+write, so at most TOUCH_FLUSH_EVERY entries' last_used is behind.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+JUDGE_CACHE_PATH = os.getenv("JUDGE_CACHE_PATH", "./judge_cache.db")
+JUDGE_CACHE_TTL_SECONDS = int(os.getenv("JUDGE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+JUDGE_CACHE_MAX_ENTRIES = int(os.getenv("JUDGE_CACHE_MAX_ENTRIES", "100000"))
+JUDGE_CACHE_MEMORY_ENTRIES = int(os.getenv("JUDGE_CACHE_MEMORY_ENTRIES", "1024"))
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").split())
+
+def make_cache_key(question: str, reference: str, response: str, prompt_version: str, base_model: str) -> str:
+    payload = "\x1f".join([
+        prompt_version,
+        base_model,
+        _normalize(question),
+        _normalize(reference),
+        _normalize(response),
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class JudgeCache:
+    """Two-tier (memory LRU + SQLite) judge result cache with TTL and size eviction."""
+
+    # Run size/TTL eviction on the SQLite tier every N writes
+    EVICT_EVERY = 100
+    # Write disk hits' last_used once N entries are pending (and before every write)
+    TOUCH_FLUSH_EVERY = 50
+
+    def __init__(
+        self,
+        path: str = JUDGE_CACHE_PATH,
+        ttl_seconds: int = JUDGE_CACHE_TTL_SECONDS,
+        max_entries: int = JUDGE_CACHE_MAX_ENTRIES,
+        memory_entries: int = JUDGE_CACHE_MEMORY_ENTRIES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        # _memory_lock guards the memory tier and stats and is never held across I/O,
+        # so aget can take it on the event loop; _lock guards the SQLite connection
+        self._memory_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._writes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS judge_cache (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_judge_cache_last_used ON judge_cache (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Blocking lookup; from the event loop use aget."""
+        now = time.time()
+        result = self._get_memory(key, now)
+        return result if result is not None else self._get_disk(key, now)
+
+    async def aget(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        result = self._get_memory(key, now)
+        return result if result is not None else await asyncio.to_thread(self._get_disk, key, now)
+
+    def set(self, key: str, result: Dict):
+        """Blocking write; from the event loop use aset."""
+        now = time.time()
+        with self._memory_lock:
+            self._remember(key, now, dict(result))
+            self.stats["writes"] += 1
+        with self._lock:
+            self._flush_touched()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO judge_cache (key, result, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict(now)
+
+    async def aset(self, key: str, result: Dict):
+        await asyncio.to_thread(self.set, key, result)
+
+    def _get_memory(self, key: str, now: float) -> Optional[Dict]:
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            created_at, result = entry
+            if now - created_at > self.ttl_seconds:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return dict(result)
+
+    def _get_disk(self, key: str, now: float) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM judge_cache WHERE key = ?", (key,)
+            ).fetchone()
+            # Expired rows are left for _evict
+            if row is not None and now - row[1] <= self.ttl_seconds:
+                self._touched[key] = now
+                if len(self._touched) >= self.TOUCH_FLUSH_EVERY:
+                    self._flush_touched()
+                    self._conn.commit()
+        with self._memory_lock:
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.stats["misses"] += 1
+                return None
+            result = json.loads(row[0])
+            self._remember(key, row[1], result)
+            self.stats["disk_hits"] += 1
+            return dict(result)
+
+    def _flush_touched(self):
+        """Write the batched last_used updates; the caller commits."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE judge_cache SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _remember(self, key: str, created_at: float, result: Dict):
+        self._memory[key] = (created_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float):
+        expired = self._conn.execute(
+            "DELETE FROM judge_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        overflow = self._conn.execute(
+            """
+            DELETE FROM judge_cache WHERE key IN (
+                SELECT key FROM judge_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        ).rowcount
+        self._conn.commit()
+        self.stats["evictions"] += expired + overflow
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM judge_cache").fetchone()[0]
+        with self._memory_lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
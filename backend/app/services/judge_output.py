@@ -0,0 +1,160 @@
+"""
+Structured output for TruthMeter-Judge: the JSON schemas its calls are
+constrained to, an incremental parser for the (possibly streamed) output, and
+validation that tells which fields need repairing.
+"""
+
+import json
+from typing import Dict, Iterable, List, Tuple
+
+SCORE_FIELDS = ("accuracy_score", "clarity_score", "completeness_score")
+# Scores come first so they finish streaming before the long reasoning does
+JUDGE_FIELDS = SCORE_FIELDS + ("reasoning",)
+
+def judgement_schema(fields: Iterable[str] = JUDGE_FIELDS) -> Dict:
+    """Strict-mode JSON schema for an object with exactly `fields`."""
+    fields = list(fields)
+    return {
+        "type": "object",
+        "properties": {name: {"type": "string" if name == "reasoning" else "number"} for name in fields},
+        "required": fields,
+        "additionalProperties": False,
+    }
+
+def response_format(name: str, schema: Dict) -> Dict:
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+JUDGEMENT_FORMAT = response_format("truthmeter_judgement", judgement_schema())
+
+_candidate_schema = judgement_schema()
+_candidate_schema["properties"] = {"candidate": {"type": "integer"}, **_candidate_schema["properties"]}
+_candidate_schema["required"] = ["candidate"] + _candidate_schema["required"]
+BATCH_JUDGEMENT_FORMAT = response_format("truthmeter_batch_judgement", {
+    "type": "object",
+    "properties": {"evaluations": {"type": "array", "items": _candidate_schema}},
+    "required": ["evaluations"],
+    "additionalProperties": False,
+})
+
+class JudgeOutputParser:
+    """
+    Incremental parser for the judge's JSON object.
+
+    feed() takes output text as it arrives and returns the top-level fields
+    whose values completed in it, so scores are known before the reasoning
+    has finished streaming. Text around the object (markdown fences, a
+    preamble) is ignored. Values that aren't valid JSON, or were cut off when
+    the output ended, are kept as raw text in `malformed`.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.fields: Dict[str, object] = {}
+        self.malformed: Dict[str, str] = {}
+        self.complete = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+
+    def feed(self, text: str) -> Dict[str, object]:
+        self._text += text
+        completed: Dict[str, object] = {}
+        buffer = self._text
+        for i in range(self._pos, len(buffer)):
+            if self.complete:
+                break
+            c = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = self._decode(buffer[self._key_start:i + 1])
+                        self._key_start = None
+                continue
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = i
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]" and self._depth:
+                if self._depth == 1:
+                    self._finish_value(i, completed)
+                    self.complete = c == "}"
+                self._depth -= 1
+            elif self._depth == 1:
+                if c == ":" and self._key is not None and self._value_start is None:
+                    self._value_start = i + 1
+                elif c == ",":
+                    self._finish_value(i, completed)
+        self._pos = len(buffer)
+        return completed
+
+    def close(self):
+        """Mark a value still in progress when the output ended as malformed (truncated)."""
+        if not self.complete and self._key is not None and self._value_start is not None:
+            self.malformed[self._key] = self._text[self._value_start:].strip()
+        self._key = self._value_start = None
+
+    @staticmethod
+    def _decode(raw: str):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return raw.strip('"')
+
+    def _finish_value(self, end: int, completed: Dict[str, object]):
+        if self._key is not None and self._value_start is not None:
+            raw = self._text[self._value_start:end].strip()
+            try:
+                value = json.loads(raw)
+            except ValueError:
+                self.malformed[self._key] = raw
+            else:
+                self.fields[self._key] = completed[self._key] = value
+                self.malformed.pop(self._key, None)
+        self._key = self._value_start = None
+
+def parse_judge_output(content: str) -> JudgeOutputParser:
+    """Parse a complete judge output."""
+    parser = JudgeOutputParser()
+    parser.feed(content or "")
+    parser.close()
+    return parser
+
+def validate_judgement(fields: Dict, names: Iterable[str] = JUDGE_FIELDS) -> Tuple[Dict, List[str]]:
+    """
+    Coerce parsed fields to the judge result's types. Returns the valid ones
+    and the names of those that are missing or invalid (scores must be numbers
+    in 0-100, the reasoning a non-empty string).
+    """
+    valid, invalid = {}, []
+    for name in names:
+        value = fields.get(name)
+        if name == "reasoning":
+            if isinstance(value, str) and value.strip():
+                valid[name] = value
+            else:
+                invalid.append(name)
+            continue
+        try:
+            # bool is an int, but true/false isn't a score
+            score = float(value) if not isinstance(value, bool) else None
+        except (TypeError, ValueError):
+            score = None
+        if score is not None and 0 <= score <= 100:
+            valid[name] = score
+        else:
+            invalid.append(name)
+    return valid, invalid
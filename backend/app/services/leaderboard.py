@@ -0,0 +1,200 @@
+"""
+Model leaderboard with paired bootstrap confidence intervals.
+
+Raw per-model means (/analytics/by-model) treat 3 evaluations and 3,000 the
+same and compare models on different questions. Here every question counts
+once per model (repeat evaluations of a question are averaged first), and
+models are compared on the questions they both answered.
+
+The evaluations are reduced to a compact questions x models matrix of mean
+scores. Bootstrap resamples draw questions with replacement, shared by all
+models so the pairwise comparisons stay paired. Each resample is a row of
+per-question draw counts, and a block of resamples is scored against every
+model and pair at once with a single matrix product.
+
+A model with fewer than min_questions answered questions is listed unranked,
+without a confidence interval or pairwise comparisons: its bootstrap interval
+would be too wide (or, with one question, spuriously narrow) to rank on.
+"""
+
+import os
+from itertools import combinations
+from typing import Dict, List, Optional
+import numpy as np
+from app.services.columnar_analytics import QuestionIndex, columnar_analytics
+
+LEADERBOARD_RESAMPLES = int(os.getenv("LEADERBOARD_RESAMPLES", "2000"))
+LEADERBOARD_MAX_RESAMPLES = 10000
+LEADERBOARD_MIN_QUESTIONS = int(os.getenv("LEADERBOARD_MIN_QUESTIONS", "20"))
+# Draw counts per block of resamples (resamples x questions), bounding memory
+BOOTSTRAP_BLOCK_CELLS = 4_000_000
+
+METRICS = {
+    "accuracy": (0,),
+    "clarity": (1,),
+    "completeness": (2,),
+    "overall": (0, 1, 2),
+}
+
+class ScoreMatrix:
+    """Mean score per question (rows) and model (columns); NaN where the model has no evaluation of the question."""
+
+    def __init__(self, models: List[str], question_ids: np.ndarray, means: np.ndarray, evaluations: np.ndarray):
+        self.models = models
+        self.question_ids = question_ids
+        self.means = means
+        # Evaluations per model
+        self.evaluations = evaluations
+
+def build_score_matrix(db, metric: str = "accuracy", subject: Optional[str] = None, difficulty: Optional[str] = None,
+                       start: Optional[float] = None, end: Optional[float] = None) -> ScoreMatrix:
+    """
+    Scores of evaluations created in [start, end), of existing questions
+    matching subject and difficulty (like the SQL join, evaluations of
+    deleted questions don't count).
+    """
+    questions = QuestionIndex(db)
+    # Rows are question ids until unanswered ones are dropped; out-of-range ids clip to the last, unselected, row
+    selected = questions.subject_by_id < len(questions.subjects)
+    if subject:
+        selected &= questions.subject_by_id == (questions.subjects.index(subject) if subject in questions.subjects else -1)
+    if difficulty:
+        selected &= questions.difficulty_by_id == (questions.difficulties.index(difficulty) if difficulty in questions.difficulties else -1)
+    rows = len(selected)
+
+    models: Dict[str, int] = {}
+    sums: List[np.ndarray] = []
+    counts: List[np.ndarray] = []
+    for part in columnar_analytics.parts(db, start, end):
+        question_ids = np.clip(part.question_ids, 0, rows - 1)
+        keep = selected[question_ids]
+        if not keep.any():
+            continue
+        scores = sum(part.scores[i] for i in METRICS[metric]) / len(METRICS[metric])
+        group = question_ids[keep] * len(part.models) + part.model_codes[keep]
+        size = rows * len(part.models)
+        part_counts = np.bincount(group, minlength=size).reshape(rows, len(part.models))
+        part_sums = np.bincount(group, weights=scores[keep], minlength=size).reshape(rows, len(part.models))
+        for local, name in enumerate(part.models):
+            if name not in models:
+                models[name] = len(models)
+                sums.append(np.zeros(rows))
+                counts.append(np.zeros(rows, dtype=np.int64))
+            sums[models[name]] += part_sums[:, local]
+            counts[models[name]] += part_counts[:, local]
+
+    if not models:
+        return ScoreMatrix([], np.zeros(0, dtype=np.int64), np.zeros((0, 0)), np.zeros(0, dtype=np.int64))
+    sums, counts = np.stack(sums, axis=1), np.stack(counts, axis=1)
+    # Models seen only in filtered-out rows have an empty column
+    evaluated = np.flatnonzero(counts.any(axis=0))
+    answered = np.flatnonzero(counts.any(axis=1))
+    sums, counts = sums[np.ix_(answered, evaluated)], counts[np.ix_(answered, evaluated)]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    names = list(models)
+    return ScoreMatrix([names[i] for i in evaluated], answered, means, counts.sum(axis=0))
+
+def _weighted_means(totals: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Per-resample means; NaN where a resample drew none of the questions involved."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(weights > 0, totals / weights, np.nan)
+
+def bootstrap(matrix: ScoreMatrix, resamples: int = LEADERBOARD_RESAMPLES, seed: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Resampled per-model means ([resamples, models]) and paired mean
+    differences ([resamples, pairs], pairs in combinations() order).
+    """
+    questions, model_count = matrix.means.shape
+    pairs = list(combinations(range(model_count), 2))
+    answered = ~np.isnan(matrix.means)
+    scores = np.where(answered, matrix.means, 0.0)
+    first, second = [a for a, _ in pairs], [b for _, b in pairs]
+    shared = answered[:, first] & answered[:, second]
+    differences = np.where(shared, scores[:, first] - scores[:, second], 0.0)
+    # [score totals | questions answered | difference totals | questions shared] per resample in one product
+    columns = np.hstack([scores, answered, differences, shared]).astype(np.float64)
+
+    rng = np.random.default_rng(seed)
+    totals = np.empty((resamples, columns.shape[1]))
+    block = max(1, BOOTSTRAP_BLOCK_CELLS // max(1, questions))
+    for begin in range(0, resamples, block):
+        count = min(block, resamples - begin)
+        draws = rng.integers(0, questions, size=(count, questions))
+        # Row r of the draw counts: how often resample r drew each question
+        draws += (np.arange(count) * questions)[:, None]
+        weights = np.bincount(draws.ravel(), minlength=count * questions).reshape(count, questions)
+        totals[begin:begin + count] = weights @ columns
+
+    m, p = model_count, len(pairs)
+    return {
+        "means": _weighted_means(totals[:, :m], totals[:, m:2 * m]),
+        "differences": _weighted_means(totals[:, 2 * m:2 * m + p], totals[:, 2 * m + p:]),
+    }
+
+def compute_leaderboard(matrix: ScoreMatrix, resamples: int = LEADERBOARD_RESAMPLES, confidence: float = 0.95,
+                        seed: int = 0, min_questions: int = LEADERBOARD_MIN_QUESTIONS) -> Dict:
+    """Ranked models first, then unranked ones (below min_questions), each by mean."""
+    model_count = len(matrix.models)
+    result = {"questions": int(matrix.means.shape[0]), "resamples": resamples, "confidence": confidence,
+              "min_questions": min_questions, "models": [], "pairs": []}
+    if not model_count or not matrix.means.shape[0]:
+        return result
+
+    answered = ~np.isnan(matrix.means)
+    ranked = answered.sum(axis=0) >= min_questions
+    means = np.nanmean(matrix.means, axis=0)
+    samples = bootstrap(matrix, resamples, seed)
+    low, high = np.nanquantile(samples["means"], [(1 - confidence) / 2, (1 + confidence) / 2], axis=0)
+
+    pairs = []
+    wins = np.zeros((model_count, model_count))
+    opponents: Dict[int, List[int]] = {i: [] for i in range(model_count)}
+    better_than: Dict[int, List[str]] = {i: [] for i in range(model_count)}
+    for index, (a, b) in enumerate(combinations(range(model_count), 2)):
+        shared = answered[:, a] & answered[:, b]
+        if not (ranked[a] and ranked[b] and shared.any()):
+            continue
+        differences = matrix.means[shared, a] - matrix.means[shared, b]
+        resampled = samples["differences"][:, index]
+        resampled = resampled[~np.isnan(resampled)]
+        if not len(resampled):
+            continue
+        diff_low, diff_high = np.quantile(resampled, [(1 - confidence) / 2, (1 + confidence) / 2])
+        # Ties count as half a win for each side
+        win_rate = float(np.mean((differences > 0) + 0.5 * (differences == 0)))
+        wins[a, b], wins[b, a] = win_rate, 1 - win_rate
+        opponents[a].append(b)
+        opponents[b].append(a)
+        if diff_low > 0:
+            better_than[a].append(matrix.models[b])
+        elif diff_high < 0:
+            better_than[b].append(matrix.models[a])
+        pairs.append({
+            "model_a": matrix.models[a],
+            "model_b": matrix.models[b],
+            "shared_questions": int(shared.sum()),
+            "mean_difference": round(float(differences.mean()), 2),
+            "ci_low": round(float(diff_low), 2),
+            "ci_high": round(float(diff_high), 2),
+            "win_rate_a": round(win_rate, 3),
+            "prob_a_better": round(float(np.mean(resampled > 0)), 3),
+        })
+
+    order = np.argsort(-means, kind="stable")
+    order = np.concatenate([order[ranked[order]], order[~ranked[order]]])
+    for rank, i in enumerate(order, start=1):
+        result["models"].append({
+            "rank": rank if ranked[i] else None,
+            "model": matrix.models[i],
+            "questions": int(answered[:, i].sum()),
+            "evaluations": int(matrix.evaluations[i]),
+            "mean": round(float(means[i]), 1),
+            "ci_low": round(float(low[i]), 1) if ranked[i] else None,
+            "ci_high": round(float(high[i]), 1) if ranked[i] else None,
+            # Average head-to-head win rate against the models it shares questions with
+            "win_rate": round(float(np.mean(wins[i, opponents[i]])), 3) if opponents[i] else None,
+            "significantly_better_than": better_than[i],
+        })
+    result["pairs"] = pairs
+    return result
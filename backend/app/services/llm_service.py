@@ -1,116 +1,494 @@
+import asyncio
+import hashlib
 import os
-from typing import Dict
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 import openai
 import google.generativeai as genai  # Using stable generativeai library
-from anthropic import Anthropic
-from groq import Groq
+from anthropic import AsyncAnthropic
+from groq import AsyncGroq
+from .response_cache import ResponseCache
+from .metrics import LLM_IN_FLIGHT, LLM_REQUEST_SECONDS
+from .rate_limiter import (
+    LLMCallError, LLM_MAX_RETRIES, call_with_retries, check_breaker, estimate_tokens, parse_raw, rate_limiters,
+    record_health, retry_delay,
+)
+from .resilience import (
+    LLM_REQUEST_TIMEOUT_SECONDS, LLM_HEDGE_MAX_FRACTION, LLM_HEDGE_MIN_DELAY_SECONDS, LLM_HEDGE_QUANTILE, LLM_HEDGING, FailoverRoutes, LatencyTracker,
+    circuit_breakers,
+)
 
 load_dotenv()
 
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+# Overrides the Gemini API host (e.g. the benchmarks' fake provider); needs the REST transport
+GOOGLE_API_ENDPOINT = os.getenv("GOOGLE_API_ENDPOINT")
+
+async def _iterate_in_thread(iterable) -> AsyncIterator:
+    """Iterate a blocking iterable without blocking the event loop."""
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
 class LLMService:
-    def __init__(self):
-        # Initialize clients if keys are present
+    # Map 'auto' to default model names
+    DEFAULT_MODELS = {
+        "openai": "gpt-4o",
+        "google": "gemini-2.5-flash",  # Latest Gemini 2.5 Flash
+        "anthropic": "claude-sonnet-4-5",  # Latest Claude Sonnet 4.5
+        "deepseek": "deepseek-chat",
+        "meta": "llama-3.1-70b-versatile"
+    }
+
+    # provider: (attribute holding its API key, error when it's missing)
+    PROVIDER_KEYS = {
+        "openai": ("openai_key", "Error: OPENAI_API_KEY not configured"),
+        "google": ("google_key", "Error: GOOGLE_API_KEY not configured"),
+        "anthropic": ("anthropic_key", "Error: ANTHROPIC_API_KEY not configured"),
+        "meta": ("groq_key", "Error: GROQ_API_KEY (for Meta) not configured"),
+        "deepseek": ("deepseek_key", "Error: DEEPSEEK_API_KEY not configured"),
+    }
+
+    def __init__(self, rate_limiter_registry=None, max_retries: int = LLM_MAX_RETRIES, breaker_registry=None,
+                 failover: Optional[FailoverRoutes] = None, hedging: bool = LLM_HEDGING):
+        # Initialize clients if keys are present. The async clients keep a pooled
+        # HTTP connection per provider for the lifetime of the service. SDK retries
+        # are off: retries and backoff are handled by rate_limiter, per provider.
         self.openai_key = os.getenv("OPENAI_API_KEY")
         if self.openai_key:
-            self.openai_client = openai.OpenAI(api_key=self.openai_key)
+            self.openai_client = openai.AsyncOpenAI(api_key=self.openai_key, max_retries=0)
             
         self.anthropic_key = os.getenv("ANTHROPIC_API_KEY")
         if self.anthropic_key:
-            self.anthropic_client = Anthropic(api_key=self.anthropic_key)
+            self.anthropic_client = AsyncAnthropic(api_key=self.anthropic_key, max_retries=0)
             
         self.google_key = os.getenv("GOOGLE_API_KEY")
-        if self.google_key:
+        if self.google_key and GOOGLE_API_ENDPOINT:
+            genai.configure(api_key=self.google_key, transport="rest", client_options={"api_endpoint": GOOGLE_API_ENDPOINT})
+        elif self.google_key:
             genai.configure(api_key=self.google_key)
+        self._google_models = {}
             
         self.groq_key = os.getenv("GROQ_API_KEY")
         if self.groq_key:
-            self.groq_client = Groq(api_key=self.groq_key)
+            self.groq_client = AsyncGroq(api_key=self.groq_key, max_retries=0)
+
+        self.deepseek_key = os.getenv("DEEPSEEK_API_KEY")
+        if self.deepseek_key:
+            self.deepseek_client = openai.AsyncOpenAI(api_key=self.deepseek_key, base_url=DEEPSEEK_BASE_URL, max_retries=0)
+
+        # Identical concurrent calls share one upstream request
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self.coalesced_calls = 0
+        self.response_cache = ResponseCache()
+        self.rate_limiters = rate_limiter_registry or rate_limiters
+        self.max_retries = max_retries
+        # Tail latency and outages: see resilience
+        self.circuit_breakers = breaker_registry or circuit_breakers
+        self.failover = failover or FailoverRoutes()
+        self.hedging = hedging
+        self.latencies = LatencyTracker()
+        self.resilience_stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
 
     async def get_response(self, model_provider: str, model_name: str, prompt: str) -> str:
         """
         Fetches a response from the specified AI model.
+
+        Raises LLMCallError if the provider can't be reached, isn't configured,
+        or keeps failing after retries.
         """
-        # Map 'auto' to default model names
-        default_models = {
-            "openai": "gpt-4o",
-            "google": "gemini-2.5-flash",  # Latest Gemini 2.5 Flash
-            "anthropic": "claude-sonnet-4-5",  # Latest Claude Sonnet 4.5
-            "deepseek": "deepseek-chat",
-            "meta": "llama-3.1-70b-versatile"
-        }
-        
+        text, _, _ = await self.get_response_with_usage(model_provider, model_name, prompt)
+        return text
+
+    async def get_response_with_usage(self, model_provider: str, model_name: str, prompt: str) -> Tuple[str, Optional[Dict], str]:
+        """
+        Like get_response, but also returns the usage of the upstream call
+        (tokens and latency, see usage_service) and the "provider/model" that
+        actually answered, which differs from the requested one after a
+        failover. Usage is None when the answer came from the response cache or
+        from another caller's in-flight call.
+        """
+        model_name = self.resolve_model_name(model_provider, model_name)
+        key = self._call_key(model_provider, model_name, prompt)
+        cacheable = self.response_cache.enabled_for(model_provider)
+        if cacheable:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return cached, None, self.model_label(model_provider, model_name)
+
+        task = self._inflight.get(key)
+        owner = task is None
+        if owner:
+            task = asyncio.ensure_future(self._resilient_dispatch(model_provider, model_name, prompt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish_call(key, t, cacheable))
+        else:
+            self.coalesced_calls += 1
+
+        # Shield so one caller disconnecting doesn't cancel the shared call for the others
+        text, usage, answered_by = await asyncio.shield(task)
+        # Only the caller that started the call is charged for it
+        return text, usage if owner else None, answered_by
+
+    async def stream_response(self, model_provider: str, model_name: str, prompt: str, usage: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Streams a response from the specified AI model as text chunks.
+
+        Raises LLMCallError like get_response. Failures before the first chunk
+        are retried and then fail over to the model's configured equivalents,
+        as in get_response; a stream that breaks part-way is not retried. If a
+        `usage` dict is passed, it is filled in with the call's usage once the
+        stream finishes, including the provider/model_name that answered (left
+        empty on a cache hit).
+        """
+        model_name = self.resolve_model_name(model_provider, model_name)
+        key = self._call_key(model_provider, model_name, prompt)
+        cacheable = self.response_cache.enabled_for(model_provider)
+        if cacheable:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        self.resilience_stats["calls"] += 1
+        backends = [(model_provider, model_name)] + self.failover.alternates(model_provider, model_name)
+        first_error = None
+        for i, (provider, model) in enumerate(backends):
+            alternates = backends[i + 1:]
+            max_retries = min(self.max_retries, 1) if alternates else self.max_retries
+            chunks: List[str] = []
+            try:
+                async for text in self._stream_backend(provider, model, prompt, max_retries, chunks, usage):
+                    yield text
+            except LLMCallError as e:
+                # Once text has reached the caller the call can't be restarted elsewhere
+                if chunks:
+                    raise
+                first_error = first_error or e
+                if alternates:
+                    self.resilience_stats["failovers"] += 1
+                continue
+            if cacheable and chunks and (provider, model) == (model_provider, model_name):
+                self.response_cache.set(key, "".join(chunks))
+            return
+        raise first_error
+
+    async def _stream_backend(self, model_provider: str, model_name: str, prompt: str, max_retries: int,
+                              chunks: List[str], usage: Optional[Dict]) -> AsyncIterator[str]:
+        """
+        One model's streamed call with retries before the first chunk. Each wait
+        for the next event is cut off after LLM_REQUEST_TIMEOUT_SECONDS.
+        """
+        self._check_configured(model_provider, model_name)
+        limiter = self.rate_limiters.for_provider(model_provider)
+        breaker = self.circuit_breakers.for_provider(model_provider)
+        reserved = estimate_tokens(prompt)
+        tokens = (0, 0)
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            check_breaker(breaker, model_provider, model_name)
+            await limiter.acquire(reserved)
+            attempt_started = time.perf_counter()
+            events = self._stream_events(model_provider, model_name, prompt)
+            try:
+                with LLM_IN_FLIGHT.track(provider=model_provider):
+                    while True:
+                        try:
+                            kind, value = await asyncio.wait_for(events.__anext__(), LLM_REQUEST_TIMEOUT_SECONDS)
+                        except StopAsyncIteration:
+                            break
+                        if kind == "text":
+                            chunks.append(value)
+                            yield value
+                        elif kind == "usage":
+                            tokens = value
+                        else:
+                            limiter.observe(value)
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - attempt_started, provider=model_provider, model=model_name, outcome="ok")
+                record_health(breaker, model_provider, model_name)
+                break
+            except (asyncio.CancelledError, GeneratorExit):
+                breaker.release()
+                raise
+            except Exception as e:
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - attempt_started, provider=model_provider, model=model_name, outcome="error")
+                record_health(breaker, model_provider, model_name, e)
+                if chunks:
+                    raise LLMCallError.from_exception(model_provider, model_name, e) from e
+                # Nothing was generated: refund the reservation, as call_with_retries does
+                limiter.settle(reserved, 0)
+                await asyncio.sleep(retry_delay(limiter, model_provider, model_name, e, attempt, max_retries))
+                attempt += 1
+            finally:
+                await events.aclose()
+
+        limiter.settle(reserved, sum(tokens) if any(tokens) else reserved)
+        if usage is not None:
+            usage.update(self._usage(model_provider, model_name, tokens, started))
+
+    def resolve_model_name(self, model_provider: str, model_name: str) -> str:
         if model_name == "auto" or not model_name:
-            model_name = default_models.get(model_provider, "gpt-4o")
-        
+            return self.DEFAULT_MODELS.get(model_provider, "gpt-4o")
+        return model_name
+
+    def model_label(self, model_provider: str, model_name: str) -> str:
+        """The "provider/model" an evaluation is stored under, with "auto" resolved."""
+        return f"{model_provider}/{self.resolve_model_name(model_provider, model_name)}"
+
+    def _call_key(self, model_provider: str, model_name: str, prompt: str) -> tuple:
+        return (model_provider, model_name, hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+
+    def _get_google_model(self, model_name: str):
+        model = self._google_models.get(model_name)
+        if model is None:
+            model = self._google_models[model_name] = genai.GenerativeModel(model_name)
+        return model
+
+    def _finish_call(self, key: tuple, task: asyncio.Task, cacheable: bool):
+        self._inflight.pop(key, None)
+        if cacheable and not task.cancelled() and task.exception() is None:
+            result, _, answered_by = task.result()
+            # An equivalent model's answer is never served as the requested model's
+            if answered_by == f"{key[0]}/{key[1]}":
+                self.response_cache.set(key, result)
+
+    def get_cache_stats(self) -> Dict:
+        return {
+            **self.response_cache.get_stats(),
+            "inflight": len(self._inflight),
+            "coalesced_calls": self.coalesced_calls,
+            "rate_limits": self.rate_limiters.get_stats(),
+            "circuit_breakers": self.circuit_breakers.get_stats(),
+            "resilience": dict(self.resilience_stats),
+        }
+
+    @staticmethod
+    def _usage(model_provider: str, model_name: str, tokens: Tuple[int, int], started: float) -> Dict:
+        return {
+            "role": "candidate",
+            "provider": model_provider,
+            "model_name": model_name,
+            "prompt_tokens": tokens[0],
+            "completion_tokens": tokens[1],
+            "latency_ms": (time.perf_counter() - started) * 1000,
+        }
+
+    @staticmethod
+    def _openai_tokens(usage) -> Tuple[int, int]:
+        if usage is None:
+            return (0, 0)
+        return (usage.prompt_tokens or 0, usage.completion_tokens or 0)
+
+    @staticmethod
+    def _anthropic_tokens(usage) -> Tuple[int, int]:
+        if usage is None:
+            return (0, 0)
+        return (usage.input_tokens or 0, usage.output_tokens or 0)
+
+    @staticmethod
+    def _google_tokens(usage_metadata) -> Tuple[int, int]:
+        if usage_metadata is None:
+            return (0, 0)
+        return (usage_metadata.prompt_token_count or 0, usage_metadata.candidates_token_count or 0)
+
+    async def _resilient_dispatch(self, model_provider: str, model_name: str, prompt: str) -> Tuple[str, Dict, str]:
+        """
+        Call the model, failing over to its configured equivalents in order if it
+        fails or its provider's breaker is open. Returns (text, usage, answered_by);
+        raises the requested model's LLMCallError if every backend fails.
+        """
+        self.resilience_stats["calls"] += 1
+        backends = [(model_provider, model_name)] + self.failover.alternates(model_provider, model_name)
+        first_error = None
+        for i, (provider, model) in enumerate(backends):
+            alternates = backends[i + 1:]
+            # Don't spend the whole retry budget on a backend we can route around
+            max_retries = min(self.max_retries, 1) if alternates else self.max_retries
+            try:
+                text, usage = await self._hedged_dispatch(provider, model, prompt, alternates, max_retries)
+            except LLMCallError as e:
+                first_error = first_error or e
+                if alternates:
+                    self.resilience_stats["failovers"] += 1
+                continue
+            return text, usage, f"{usage['provider']}/{usage['model_name']}"
+        raise first_error
+
+    def _hedge_delay(self, model_provider: str, model_name: str) -> Optional[float]:
+        if not self.hedging or self.resilience_stats["hedged"] >= LLM_HEDGE_MAX_FRACTION * self.resilience_stats["calls"]:
+            return None
+        p95 = self.latencies.quantile(model_provider, model_name, LLM_HEDGE_QUANTILE)
+        return max(p95, LLM_HEDGE_MIN_DELAY_SECONDS) if p95 is not None else None
+
+    async def _hedged_dispatch(self, model_provider: str, model_name: str, prompt: str, alternates: List[Tuple[str, str]],
+                               max_retries: int) -> Tuple[str, Dict]:
+        """
+        One call, plus a duplicate once it has taken longer than the model's
+        observed p95. The duplicate goes to the first healthy equivalent model if
+        there is one, else to the same model. The first answer wins; the other
+        call is cancelled.
+        """
+        primary = asyncio.ensure_future(self._timed_dispatch(model_provider, model_name, prompt, max_retries))
+        delay = self._hedge_delay(model_provider, model_name)
+        if delay is None:
+            return await primary
+        hedge = None
         try:
-            if model_provider == "openai":
-                if not self.openai_key: return "Error: OPENAI_API_KEY not configured"
-                return await self._call_openai(model_name, prompt)
-            elif model_provider == "google":
-                if not self.google_key: return "Error: GOOGLE_API_KEY not configured"
-                return await self._call_google(model_name, prompt)
-            elif model_provider == "anthropic":
-                if not self.anthropic_key: return "Error: ANTHROPIC_API_KEY not configured"
-                return await self._call_anthropic(model_name, prompt)
-            elif model_provider == "meta":
-                if not self.groq_key: return "Error: GROQ_API_KEY (for Meta) not configured"
-                return await self._call_meta(model_name, prompt)
-            elif model_provider == "deepseek":
-                # DeepSeek often uses OpenAI compatible API
-                if not os.getenv("DEEPSEEK_API_KEY"): return "Error: DEEPSEEK_API_KEY not configured"
-                return await self._call_deepseek(model_name, prompt)
-            else:
-                return f"Error: Unknown provider {model_provider}"
-        except Exception as e:
-            return f"Error calling {model_name}: {str(e)}"
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+            target = next(
+                (backend for backend in alternates if self.circuit_breakers.for_provider(backend[0]).is_available()),
+                (model_provider, model_name),
+            )
+            self.resilience_stats["hedged"] += 1
+            hedge = asyncio.ensure_future(self._timed_dispatch(target[0], target[1], prompt, max_retries))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.resilience_stats["hedge_wins"] += 1
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _timed_dispatch(self, model_provider: str, model_name: str, prompt: str, max_retries: Optional[int] = None) -> Tuple[str, Dict]:
+        started = time.perf_counter()
+        text, tokens = await self._dispatch(model_provider, model_name, prompt, max_retries)
+        self.latencies.observe(model_provider, model_name, time.perf_counter() - started)
+        return text, self._usage(model_provider, model_name, tokens, started)
+
+    def _check_configured(self, model_provider: str, model_name: str):
+        if model_provider not in self.PROVIDER_KEYS:
+            raise LLMCallError(model_provider, model_name, f"Error: Unknown provider {model_provider}")
+        key_attribute, message = self.PROVIDER_KEYS[model_provider]
+        if not getattr(self, key_attribute):
+            raise LLMCallError(model_provider, model_name, message)
+
+    async def _dispatch(self, model_provider: str, model_name: str, prompt: str, max_retries: Optional[int] = None) -> Tuple[str, Tuple[int, int]]:
+        """Returns the response text and (prompt_tokens, completion_tokens)."""
+        self._check_configured(model_provider, model_name)
+        call = {
+            "openai": self._call_openai,
+            "google": self._call_google,
+            "anthropic": self._call_anthropic,
+            "meta": self._call_meta,
+            # DeepSeek often uses OpenAI compatible API
+            "deepseek": self._call_deepseek,
+        }[model_provider]
+        return await call_with_retries(
+            model_provider, model_name, prompt,
+            lambda: call(model_name, prompt),
+            limiter=self.rate_limiters.for_provider(model_provider),
+            max_retries=self.max_retries if max_retries is None else max_retries,
+            breaker=self.circuit_breakers.for_provider(model_provider),
+        )
+
+    # Each _call_* returns (text, (prompt_tokens, completion_tokens), rate-limit headers)
 
-    async def _call_openai(self, model: str, prompt: str) -> str:
-        response = self.openai_client.chat.completions.create(
+    async def _call_openai(self, model: str, prompt: str):
+        raw = await self.openai_client.chat.completions.with_raw_response.create(
             model=model,
             messages=[{"role": "user", "content": prompt}]
         )
-        return response.choices[0].message.content
+        response = await parse_raw(raw)
+        return response.choices[0].message.content, self._openai_tokens(response.usage), raw.headers
 
-    async def _call_google(self, model_name: str, prompt: str) -> str:
-        try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"Error calling Google model {model_name}: {str(e)}"
+    async def _call_google(self, model_name: str, prompt: str):
+        # The Gemini SDK doesn't expose response headers
+        model = self._get_google_model(model_name)
+        if GOOGLE_API_ENDPOINT:
+            # The SDK's async client has no REST transport; keep the blocking call off the event loop
+            response = await asyncio.to_thread(model.generate_content, prompt)
+        else:
+            response = await model.generate_content_async(prompt)
+        return response.text, self._google_tokens(getattr(response, "usage_metadata", None)), None
 
-    async def _call_anthropic(self, model_name: str, prompt: str) -> str:
-        try:
-            message = self.anthropic_client.messages.create(
-                model=model_name,
-                max_tokens=1024,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
-            return message.content[0].text
-        except Exception as e:
-            return f"Error calling Anthropic model {model_name}: {str(e)}"
+    async def _call_anthropic(self, model_name: str, prompt: str):
+        raw = await self.anthropic_client.messages.with_raw_response.create(
+            model=model_name,
+            max_tokens=1024,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        )
+        message = await parse_raw(raw)
+        return message.content[0].text, self._anthropic_tokens(message.usage), raw.headers
 
-    async def _call_meta(self, model: str, prompt: str) -> str:
+    async def _call_meta(self, model: str, prompt: str):
         # Using Groq for Meta Llama models
-        chat_completion = self.groq_client.chat.completions.create(
+        raw = await self.groq_client.chat.completions.with_raw_response.create(
             messages=[{"role": "user", "content": prompt}],
             model=model,
         )
-        return chat_completion.choices[0].message.content
+        chat_completion = await parse_raw(raw)
+        return chat_completion.choices[0].message.content, self._openai_tokens(chat_completion.usage), raw.headers
 
-    async def _call_deepseek(self, model: str, prompt: str) -> str:
-        client = openai.OpenAI(
-            api_key=os.getenv("DEEPSEEK_API_KEY"), 
-            base_url="https://api.deepseek.com"
-        )
-        response = client.chat.completions.create(
+    async def _call_deepseek(self, model: str, prompt: str):
+        raw = await self.deepseek_client.chat.completions.with_raw_response.create(
             model=model,
             messages=[{"role": "user", "content": prompt}]
         )
-        return response.choices[0].message.content
+        response = await parse_raw(raw)
+        return response.choices[0].message.content, self._openai_tokens(response.usage), raw.headers
+
+    async def _stream_events(self, model_provider: str, model_name: str, prompt: str) -> AsyncIterator[tuple]:
+        """Yield ("headers", headers), ("text", chunk) and ("usage", tokens) events for one streamed call."""
+        if model_provider in ("openai", "meta", "deepseek"):
+            client = {
+                "openai": getattr(self, "openai_client", None),
+                "meta": getattr(self, "groq_client", None),
+                "deepseek": getattr(self, "deepseek_client", None),
+            }[model_provider]
+            # Groq reports usage on the last chunk unprompted; OpenAI-compatible APIs need asking
+            extra = {} if model_provider == "meta" else {"stream_options": {"include_usage": True}}
+            raw = await client.chat.completions.with_raw_response.create(
+                model=model_name,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                **extra,
+            )
+            yield "headers", raw.headers
+            async for chunk in await parse_raw(raw):
+                chunk_usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+                if chunk_usage:
+                    yield "usage", self._openai_tokens(chunk_usage)
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    yield "text", text
+        elif model_provider == "anthropic":
+            async with self.anthropic_client.messages.stream(
+                model=model_name,
+                max_tokens=1024,
+                messages=[{"role": "user", "content": prompt}],
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield "text", text
+                yield "usage", self._anthropic_tokens((await stream.get_final_message()).usage)
+        elif model_provider == "google":
+            model = self._get_google_model(model_name)
+            if GOOGLE_API_ENDPOINT:
+                # As in _call_google: the REST transport only has the blocking client, so the
+                # request and every chunk read run on a worker thread
+                response = _iterate_in_thread(await asyncio.to_thread(model.generate_content, prompt, stream=True))
+            else:
+                response = await model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                if getattr(chunk, "usage_metadata", None):
+                    yield "usage", self._google_tokens(chunk.usage_metadata)
+                if chunk.text:
+                    yield "text", chunk.text
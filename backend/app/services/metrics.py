@@ -0,0 +1,282 @@
+"""
+Process-local metrics in the Prometheus text exposition format.
+
+Instrumented code only bumps counters and histogram buckets in plain dicts;
+nothing is formatted until /metrics is scraped. Stats that services already
+keep (cache hits, rate limiter waits, job queue counters) are read by
+collectors at scrape time instead of being duplicated on the hot path.
+
+Updates aren't locked: every instrumented call site runs on the event loop
+thread. Set TRUTH_METER_METRICS=0 to turn recording off entirely.
+"""
+
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("TRUTH_METER_METRICS", "1") not in ("0", "false", "no")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        if METRICS_ENABLED:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in flight."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            # Per-bucket (non-cumulative) counts, then sum and count
+            series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the enclosed block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+# A collector returns (name, kind, help, [(labels dict, value)]) families at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.header() + metric.render()
+        # Several collectors may contribute to one family; each family is written once
+        families: Dict[str, tuple] = {}
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                families.setdefault(name, (kind, documentation, []))[2].extend(samples)
+        for name, (kind, documentation, samples) in families.items():
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}"
+                      for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "truthmeter_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"),
+))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "truthmeter_http_requests_in_flight", "HTTP requests being served", ("method",),
+))
+STAGE_SECONDS = registry.register(Histogram(
+    "truthmeter_stage_duration_seconds",
+    "Time spent in each stage of an evaluation (question_lookup, enqueue, wait, candidate_call, judge_call, judge_parse, db_commit)",
+    ("stage", "provider", "model"),
+))
+LLM_REQUEST_SECONDS = registry.register(Histogram(
+    "truthmeter_llm_request_duration_seconds", "Latency of each upstream LLM request attempt", ("provider", "model", "outcome"),
+))
+LLM_IN_FLIGHT = registry.register(Gauge(
+    "truthmeter_llm_requests_in_flight", "Upstream LLM requests awaiting a response", ("provider",),
+))
+JOBS_IN_FLIGHT = registry.register(Gauge(
+    "truthmeter_jobs_in_flight", "Evaluation jobs being processed by this process's workers",
+))
+ERRORS = registry.register(Counter(
+    "truthmeter_errors_total", "Errors by where they happened and their type", ("source", "provider", "type"),
+))
+JUDGE_TIER_DECISIONS = registry.register(Counter(
+    "truthmeter_judge_tier_decisions_total", "Reference-tier decisions: accept/reject skip the LLM judge, uncertain goes to it",
+    ("decision",),
+))
+DB_QUERY_SECONDS = registry.register(Histogram(
+    "truthmeter_db_query_duration_seconds", "Database statement execution time", ("operation",), buckets=DB_BUCKETS,
+))
+
+def error_type(error: BaseException) -> str:
+    """A low-cardinality label for an error: its HTTP status if it has one, else its class name."""
+    status = getattr(error, "status_code", None)
+    return f"http_{status}" if status else type(error).__name__
+
+def cache_collector(name: str, stats: Callable[[], Dict], hit_keys: Tuple[str, ...], miss_keys: Tuple[str, ...]) -> Collector:
+    """Expose a cache's hit/miss counters and hit ratio from its existing stats dict."""
+    def collect():
+        current = stats()
+        hits = sum(current.get(key, 0) for key in hit_keys)
+        misses = sum(current.get(key, 0) for key in miss_keys)
+        lookups = hits + misses
+        return [
+            ("truthmeter_cache_lookups_total", "counter", "Cache lookups by result",
+             [({"cache": name, "result": "hit"}, hits), ({"cache": name, "result": "miss"}, misses)]),
+            ("truthmeter_cache_hit_ratio", "gauge", "Fraction of cache lookups that hit",
+             [({"cache": name}, round(hits / lookups, 4) if lookups else 0.0)]),
+        ]
+    return collect
+
+def instrument_engine(engine):
+    """Time every statement run on a (sync) SQLAlchemy engine, and count database errors."""
+    if not METRICS_ENABLED:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=_operation(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+        record_error("db", context.original_exception)
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:10].split(None, 1)
+    word = head[0].upper() if head else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA", "CREATE", "DROP") else "OTHER"
+
+def render_metrics() -> str:
+    return registry.render()
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and in-flight count per route template (not raw path, to bound cardinality)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            with HTTP_IN_FLIGHT.track(method=method):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=method,
+                route=getattr(route, "path", "unmatched"), status=status["code"],
+            )
+
+def stage_timer(stage: str, provider: str = "", model: str = ""):
+    """Time one evaluation stage; use as a context manager."""
+    return STAGE_SECONDS.time(stage=stage, provider=provider, model=model)
+
+def record_error(source: str, error: Optional[BaseException] = None, provider: str = "", kind: Optional[str] = None):
+    """Count an error; `kind` overrides the type derived from `error`."""
+    ERRORS.inc(source=source, provider=provider, type=kind or (error_type(error) if error is not None else "unknown"))
@@ -0,0 +1,301 @@
+"""
+Near-duplicate detection for questions with MinHash signatures and LSH.
+
+A question's text and reference answer are normalized and cut into character
+5-gram shingles (tagged by field, so a question's text never matches another's
+reference answer). Its MinHash signature is the minimum of NUM_PERM hash
+functions over those shingles; the fraction of equal signature entries
+estimates the Jaccard similarity of two questions' shingle sets. Signatures
+are stored on the question row (questions.minhash), computed once on insert.
+
+The in-memory index splits signatures into bands of rows. Questions sharing a
+band are candidates, and candidates are confirmed on their full signatures.
+Bands are kept as sorted arrays, so a lookup is a binary search per band;
+questions added since the last re-sort sit in a small dict until the next one.
+
+Policies for a new question that matches an existing one at or above the
+threshold: off, warn (insert and report the matches), reject, or merge (don't
+insert; use the most similar existing question instead).
+"""
+
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import text
+from app.models import SessionLocal
+
+QUESTION_DEDUP_POLICY = os.getenv("QUESTION_DEDUP_POLICY", "warn")
+QUESTION_DEDUP_THRESHOLD = float(os.getenv("QUESTION_DEDUP_THRESHOLD", "0.8"))
+DEDUP_POLICIES = ("off", "warn", "reject", "merge")
+
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+# A pair at the threshold must become an LSH candidate with at least this probability
+CANDIDATE_RECALL = 0.99
+# Questions added since the last re-sort of the bands before it happens again
+RESORT_PENDING = 4096
+# Matches reported per question
+MAX_MATCHES = 5
+BACKFILL_BATCH = 1000
+
+_rng = np.random.default_rng(0x5EED)
+# Multiply-shift hashing: ((a * x + b) mod 2^64) >> 32, with odd a
+_HASH_A = _rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_HASH_B = _rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)
+_BAND_MIX = np.uint64(0x9E3779B97F4A7C15)
+_NON_WORD = re.compile(r"[\W_]+")
+
+def lsh_bands(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """
+    (bands, rows per band): the most rows per band (fewest false candidates)
+    for which a pair at `threshold` still becomes a candidate with
+    CANDIDATE_RECALL probability.
+    """
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= CANDIDATE_RECALL:
+            return bands, rows
+    return num_perm, 1
+
+def _normalize(value: str) -> str:
+    value = unicodedata.normalize("NFKC", value or "").lower()
+    return " ".join(_NON_WORD.sub(" ", value).split())
+
+def shingles(question_text: str, reference_answer: str) -> np.ndarray:
+    hashes = set()
+    for tag, value in ((b"q", question_text), (b"a", reference_answer)):
+        normalized = _normalize(value).encode("utf-8")
+        if not normalized:
+            continue
+        seed = zlib.crc32(tag)
+        for i in range(max(1, len(normalized) - SHINGLE_SIZE + 1)):
+            hashes.add(zlib.crc32(normalized[i:i + SHINGLE_SIZE], seed))
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+def signature(question_text: str, reference_answer: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values)."""
+    values = shingles(question_text, reference_answer)
+    if not len(values):
+        return np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+    hashed = (_HASH_A[:, None] * values[None, :] + _HASH_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+def signature_bytes(question_text: str, reference_answer: str) -> bytes:
+    return signature(question_text, reference_answer).astype("<u4").tobytes()
+
+def _from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
+
+class NearDuplicateIndex:
+    def __init__(self, threshold: float = QUESTION_DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold)
+        self._lock = threading.RLock()
+        self._loaded = False
+        # Highest question id sync() has read; add() doesn't move it, so rows other
+        # processes inserted below this process's own inserts are still picked up
+        self._watermark = 0
+        self._count = 0
+        self._ids = np.zeros(1024, dtype=np.int64)
+        self._signatures = np.zeros((1024, NUM_PERM), dtype=np.uint32)
+        self._keys = np.zeros((1024, self.bands), dtype=np.uint64)
+        self._alive = np.zeros(1024, dtype=bool)
+        self._slot_by_id: Dict[int, int] = {}
+        # Per band: (sorted keys, slots in that order) for slots < self._sorted_count
+        self._sorted: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._sorted_count = 0
+        self._pending: Dict[Tuple[int, int], List[int]] = {}
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """One uint64 key per band for each signature row."""
+        banded = signatures[:, :self.bands * self.rows].astype(np.uint64).reshape(len(signatures), self.bands, self.rows)
+        keys = np.zeros((len(signatures), self.bands), dtype=np.uint64)
+        for row in range(self.rows):
+            keys = keys * _BAND_MIX + banded[:, :, row]
+        return keys
+
+    def _grow(self, needed: int):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("_ids", "_signatures", "_keys", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _add(self, question_ids: List[int], signatures: np.ndarray):
+        if not question_ids:
+            return
+        start = self._count
+        self._grow(start + len(question_ids))
+        end = start + len(question_ids)
+        self._ids[start:end] = question_ids
+        self._signatures[start:end] = signatures
+        self._keys[start:end] = self.band_keys(signatures)
+        self._alive[start:end] = True
+        self._count = end
+        for slot, question_id in enumerate(question_ids, start):
+            self._slot_by_id[question_id] = slot
+        if self._count - self._sorted_count >= RESORT_PENDING:
+            self._resort()
+            return
+        for slot in range(start, end):
+            for band, key in enumerate(self._keys[slot]):
+                self._pending.setdefault((band, int(key)), []).append(slot)
+
+    def _resort(self):
+        count = self._count
+        self._sorted = []
+        for band in range(self.bands):
+            order = np.argsort(self._keys[:count, band], kind="stable")
+            self._sorted.append((self._keys[order, band], order))
+        self._sorted_count = count
+        self._pending = {}
+
+    def add(self, question_ids: List[int], signatures: List[bytes]):
+        """Index newly committed questions."""
+        with self._lock:
+            # Before the first sync() there's nothing to add to; it will read these from the table
+            if not self._loaded:
+                return
+            new = [(question_id, data) for question_id, data in zip(question_ids, signatures) if question_id not in self._slot_by_id]
+            if new:
+                self._add([question_id for question_id, _ in new], np.stack([_from_bytes(data) for _, data in new]))
+
+    def remove(self, question_id: int):
+        with self._lock:
+            slot = self._slot_by_id.pop(question_id, None)
+            if slot is not None:
+                self._alive[slot] = False
+
+    def sync(self, db, backfill: bool = False):
+        """
+        Load the index on first use and pick up questions inserted since
+        (including by other processes). Rows stored without a signature get
+        one computed, and saved with backfill (which commits).
+        """
+        with self._lock:
+            rows = db.execute(
+                # Texts are only needed for rows without a signature
+                text("SELECT id, CASE WHEN minhash IS NULL THEN text END, CASE WHEN minhash IS NULL THEN reference_answer END, "
+                     "minhash FROM questions WHERE id > :watermark ORDER BY id"),
+                {"watermark": self._watermark},
+            ).all()
+            missing = [(row[0], signature_bytes(row[1], row[2])) for row in rows if row[3] is None]
+            if missing and backfill:
+                for i in range(0, len(missing), BACKFILL_BATCH):
+                    db.execute(
+                        text("UPDATE questions SET minhash = :minhash WHERE id = :id"),
+                        [{"id": question_id, "minhash": data} for question_id, data in missing[i:i + BACKFILL_BATCH]],
+                    )
+                db.commit()
+            computed = dict(missing)
+            if rows:
+                self._watermark = rows[-1][0]
+                rows = [row for row in rows if row[0] not in self._slot_by_id]
+            if rows:
+                self._add([row[0] for row in rows], np.stack([_from_bytes(row[3] or computed[row[0]]) for row in rows]))
+            if not self._loaded:
+                self._resort()
+                self._loaded = True
+
+    def warm(self):
+        """Load the index at startup, saving signatures for questions that predate them."""
+        db = SessionLocal()
+        try:
+            self.sync(db, backfill=True)
+        finally:
+            db.close()
+
+    def _candidates(self, keys: np.ndarray) -> np.ndarray:
+        slots = []
+        for band, key in enumerate(keys):
+            if self._sorted_count:
+                sorted_keys, order = self._sorted[band]
+                lo, hi = np.searchsorted(sorted_keys, key, "left"), np.searchsorted(sorted_keys, key, "right")
+                if hi > lo:
+                    slots.append(order[lo:hi])
+            pending = self._pending.get((band, int(key)))
+            if pending:
+                slots.append(np.array(pending, dtype=np.int64))
+        if not slots:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.unique(np.concatenate(slots))
+        return candidates[self._alive[candidates]]
+
+    def find(self, question_signature: bytes, threshold: Optional[float] = None, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Existing questions with estimated similarity >= threshold, most similar first: [(question_id, similarity)]."""
+        threshold = self.threshold if threshold is None else threshold
+        query = _from_bytes(question_signature)
+        with self._lock:
+            candidates = self._candidates(self.band_keys(query[None, :])[0])
+            if not len(candidates):
+                return []
+            similarity = (self._signatures[candidates] == query).mean(axis=1)
+            ids = self._ids[candidates]
+        matches = [
+            (int(question_id), round(float(s), 3))
+            for question_id, s in zip(ids, similarity)
+            if s >= threshold and question_id != exclude
+        ]
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:MAX_MATCHES]
+
+    def clusters(self, threshold: Optional[float] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Groups of questions linked by pairwise similarity >= threshold, largest
+        first. Each group lists (question_id, similarity to its lowest id),
+        lowest id first.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            self._resort()
+            count = self._count
+            signatures, ids, alive = self._signatures[:count], self._ids[:count], self._alive[:count]
+            parent = np.arange(count)
+
+            def find(slot):
+                while parent[slot] != slot:
+                    parent[slot] = parent[parent[slot]]
+                    slot = parent[slot]
+                return slot
+
+            for sorted_keys, order in self._sorted:
+                # Runs of equal keys in a band are the candidate buckets
+                boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+                starts = np.concatenate(([0], boundaries))
+                ends = np.concatenate((boundaries, [len(sorted_keys)]))
+                for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+                    members = order[start:end]
+                    members = members[alive[members]]
+                    if len(members) < 2 or len({find(m) for m in members}) == 1:
+                        continue
+                    for i, member in enumerate(members[:-1]):
+                        others = members[i + 1:]
+                        similar = others[(signatures[others] == signatures[member]).mean(axis=1) >= threshold]
+                        for other in similar:
+                            root_a, root_b = find(member), find(other)
+                            if root_a != root_b:
+                                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+            groups: Dict[int, List[int]] = {}
+            for slot in np.flatnonzero(alive):
+                groups.setdefault(find(slot), []).append(slot)
+            result = []
+            for members in groups.values():
+                if len(members) < 2:
+                    continue
+                members.sort(key=lambda slot: ids[slot])
+                similarity = (signatures[members] == signatures[members[0]]).mean(axis=1)
+                result.append([(int(ids[slot]), round(float(s), 3)) for slot, s in zip(members, similarity)])
+        result.sort(key=lambda group: (-len(group), group[0][0]))
+        return result
+
+near_duplicate_index = NearDuplicateIndex()
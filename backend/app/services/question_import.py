@@ -0,0 +1,170 @@
+"""
+Bulk question import from JSONL or CSV.
+
+Rows are validated against QuestionCreate one at a time and inserted with
+executemany in batched transactions. Invalid rows are reported with their line
+number without aborting the rest of the import. Each row is also checked
+against the near-duplicate index (and the rows pending in the current batch)
+and handled by the dedup policy.
+"""
+
+import csv
+import hashlib
+import json
+from typing import Dict, IO, Iterator, List, Optional, Tuple
+import numpy as np
+from pydantic import ValidationError
+from sqlalchemy import insert
+from app.models import QuestionDB, QuestionCreate
+from app.services.analytics_cache import bump_data_version
+from app.services.near_duplicates import (
+    MAX_MATCHES, QUESTION_DEDUP_POLICY, NearDuplicateIndex, near_duplicate_index, signature_bytes,
+)
+
+IMPORT_BATCH_SIZE = 2000
+# Cap the error list so a completely malformed file can't blow up the response
+MAX_REPORTED_ERRORS = 1000
+
+def question_fingerprint(text: str, subject: str, reference_answer: str, difficulty: str) -> bytes:
+    """Identity used for exact-duplicate detection."""
+    payload = "\x1f".join([text, subject or "", reference_answer, difficulty or ""])
+    return hashlib.sha1(payload.encode("utf-8")).digest()
+
+def iter_records(stream: IO[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield (line_number, record) pairs; record is a dict, or an error string for unparsable rows."""
+    if fmt == "jsonl":
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, f"Invalid JSON: {e}"
+    elif fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}, expected 'jsonl' or 'csv'")
+
+class QuestionImporter:
+    def __init__(self, db, batch_size: int = IMPORT_BATCH_SIZE, skip_duplicates: bool = False,
+                 dedup: str = QUESTION_DEDUP_POLICY, dedup_threshold: Optional[float] = None,
+                 index: NearDuplicateIndex = near_duplicate_index):
+        self.db = db
+        self.batch_size = batch_size
+        self.skip_duplicates = skip_duplicates
+        self.dedup = dedup
+        self.index = index
+        self.dedup_threshold = index.threshold if dedup_threshold is None else dedup_threshold
+        self._pending: List[Dict] = []
+        self._pending_lines: List[int] = []
+        self._seen = set()
+        self.inserted = 0
+        self.duplicates = 0
+        self.near_duplicates = 0
+        self.merged = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+        self.near_duplicate_rows: List[Dict] = []
+
+        if dedup != "off":
+            index.sync(db)
+
+        if skip_duplicates:
+            for row in db.query(QuestionDB.text, QuestionDB.subject, QuestionDB.reference_answer, QuestionDB.difficulty).yield_per(self.batch_size):
+                self._seen.add(question_fingerprint(*row))
+
+    def add(self, line_no: int, record):
+        if isinstance(record, str):
+            self._error(line_no, record)
+            return
+        if not isinstance(record, dict):
+            self._error(line_no, "Expected a JSON object")
+            return
+        try:
+            question = QuestionCreate(**record)
+        except ValidationError as e:
+            self._error(line_no, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            return
+        except TypeError as e:
+            self._error(line_no, str(e))
+            return
+
+        row = question.dict()
+        if self.skip_duplicates:
+            fingerprint = question_fingerprint(row["text"], row["subject"], row["reference_answer"], row["difficulty"])
+            if fingerprint in self._seen:
+                self.duplicates += 1
+                return
+            self._seen.add(fingerprint)
+
+        row["minhash"] = signature_bytes(row["text"], row["reference_answer"])
+        if self.dedup != "off" and not self._check_near_duplicates(line_no, row):
+            return
+
+        self._pending.append(row)
+        self._pending_lines.append(line_no)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _check_near_duplicates(self, line_no: int, row: Dict) -> bool:
+        """Apply the dedup policy; False if the row shouldn't be inserted."""
+        matches = [
+            {"question_id": question_id, "similarity": similarity}
+            for question_id, similarity in self.index.find(row["minhash"], self.dedup_threshold)
+        ]
+        if self._pending:
+            # Rows of the batch being built aren't in the index yet
+            query = np.frombuffer(row["minhash"], dtype="<u4")
+            pending = np.stack([np.frombuffer(p["minhash"], dtype="<u4") for p in self._pending])
+            similarity = (pending == query).mean(axis=1)
+            for i in np.flatnonzero(similarity >= self.dedup_threshold):
+                matches.append({"line": self._pending_lines[i], "similarity": round(float(similarity[i]), 3)})
+        if not matches:
+            return True
+
+        matches = sorted(matches, key=lambda match: -match["similarity"])[:MAX_MATCHES]
+        self.near_duplicates += 1
+        action = {"warn": "inserted", "reject": "rejected", "merge": "merged"}[self.dedup]
+        if action == "merged":
+            self.merged += 1
+        if len(self.near_duplicate_rows) < MAX_REPORTED_ERRORS:
+            self.near_duplicate_rows.append({"line": line_no, "action": action, "matches": matches})
+        return action == "inserted"
+
+    def flush(self):
+        if not self._pending:
+            return
+        ids = self.db.execute(
+            insert(QuestionDB.__table__).returning(QuestionDB.__table__.c.id, sort_by_parameter_order=True), self._pending
+        ).scalars().all()
+        bump_data_version(self.db)
+        self.db.commit()
+        self.index.add(ids, [row["minhash"] for row in self._pending])
+        self.inserted += len(self._pending)
+        self._pending = []
+        self._pending_lines = []
+
+    def run(self, stream: IO[str], fmt: str) -> Dict:
+        for line_no, record in iter_records(stream, fmt):
+            self.add(line_no, record)
+        self.flush()
+        return self.report()
+
+    def report(self) -> Dict:
+        return {
+            "inserted": self.inserted,
+            "duplicates_skipped": self.duplicates,
+            "near_duplicates": self.near_duplicates,
+            "near_duplicates_merged": self.merged,
+            "failed": self.failed,
+            "errors": self.errors,
+            # Rows matching an existing question (question_id) or an earlier row of the file (line)
+            "near_duplicate_rows": self.near_duplicate_rows,
+        }
+
+    def _error(self, line_no: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
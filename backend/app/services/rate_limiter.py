@@ -0,0 +1,391 @@
+"""
+Adaptive per-provider rate limiting and retry policy for upstream LLM calls.
+
+Each provider gets a requests-per-minute and a tokens-per-minute token bucket,
+shared by every caller in the process (candidate calls and the judge use the
+same API keys). The buckets start from LLM_RATE_LIMITS and then follow the
+provider's rate-limit response headers: the remaining budget clamps the local
+bucket, an exhausted budget pauses it until the reported reset, and a reported
+token limit replaces the configured one.
+
+Failed calls are retried with full-jitter exponential backoff, honoring
+Retry-After when the provider sends it. Calls that still fail raise
+LLMCallError, so a failure can never be mistaken for a model answer. Each
+attempt also reports to the provider's circuit breaker (see resilience), and
+calls to a provider whose breaker is open fail immediately.
+"""
+
+import asyncio
+import email.utils
+import inspect
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Mapping, Optional, Tuple
+import anthropic
+import groq
+import httpx
+import openai
+from .metrics import LLM_IN_FLIGHT, LLM_REQUEST_SECONDS, record_error
+from .resilience import LLM_REQUEST_TIMEOUT_SECONDS, CircuitBreaker, circuit_breakers
+
+# provider: (requests per minute, tokens per minute). Conservative starting points;
+# the token limits are replaced by whatever the provider reports.
+DEFAULT_RATE_LIMITS = {
+    "openai": (500, 30000),
+    "anthropic": (50, 30000),
+    "google": (1000, 1000000),
+    "meta": (30, 6000),
+    "deepseek": (600, 1000000),
+}
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1.0"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "60"))
+# Completion size assumed when reserving tokens before a call; settled against actual usage after
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "512"))
+
+RETRYABLE_STATUS = {408, 409, 425, 429}
+CONNECTION_ERRORS = (
+    openai.APIConnectionError,
+    anthropic.APIConnectionError,
+    groq.APIConnectionError,
+    httpx.TransportError,
+    asyncio.TimeoutError,
+)
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Parse "openai=500/30000,anthropic=50/40000" into {provider: (rpm, tpm)}."""
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        provider, _, values = item.partition("=")
+        rpm, _, tpm = values.partition("/")
+        limits[provider.strip()] = (float(rpm), float(tpm))
+    return limits
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds until a rate-limit reset, from any of the formats providers use:
+    plain seconds ("20"), Go durations ("6m0s", "20ms"), RFC 3339 timestamps
+    (Anthropic) or HTTP dates (Retry-After).
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            moment = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+class LLMCallError(Exception):
+    """A provider call that failed for good. Never a model answer."""
+
+    def __init__(self, provider: str, model_name: str, message: str, status_code: Optional[int] = None,
+                 retryable: bool = False, retry_after: Optional[float] = None, headers: Optional[Mapping[str, str]] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.model_name = model_name
+        self.message = message
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.headers = headers or {}
+
+    @classmethod
+    def from_exception(cls, provider: str, model_name: str, error: Exception) -> "LLMCallError":
+        if isinstance(error, cls):
+            return error
+        # Stainless SDKs (OpenAI, Anthropic, Groq) expose status_code; google.api_core uses code
+        status = getattr(error, "status_code", None)
+        if status is None and isinstance(getattr(error, "code", None), int):
+            status = int(error.code)
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        retryable = isinstance(error, CONNECTION_ERRORS) or status in RETRYABLE_STATUS or (status is not None and status >= 500)
+        return cls(
+            provider, model_name, f"Error calling {model_name}: {error}",
+            status_code=status, retryable=retryable, retry_after=retry_after(headers), headers=headers,
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "provider": self.provider,
+            "model_name": self.model_name,
+            "error": self.message,
+            "status_code": self.status_code,
+            "retryable": self.retryable,
+        }
+
+class TokenBucket:
+    """Refills continuously at per_minute / 60 per second up to one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    @property
+    def capacity(self) -> float:
+        return self.per_minute
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # A single request larger than the bucket only has to wait for a full bucket
+        amount = min(amount, self.capacity)
+        wait = max(0.0, self.paused_until - now)
+        if self.level < amount:
+            wait = max(wait, (amount - self.level) * 60 / self.per_minute)
+        return wait
+
+    def take(self, amount: float):
+        self.level -= amount
+
+    def give_back(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+    def clamp(self, remaining: float, now: float):
+        self._refill(now)
+        self.level = min(self.level, remaining)
+
+    def pause(self, seconds: float, now: float):
+        self.paused_until = max(self.paused_until, now + seconds)
+
+    def set_rate(self, per_minute: float, now: float):
+        self._refill(now)
+        self.per_minute = per_minute
+        self.level = min(self.level, per_minute)
+
+class ProviderRateLimiter:
+    """Request and token buckets for one provider, adapted from response headers."""
+
+    # (limit, remaining, reset) header names for requests and tokens
+    HEADERS = {
+        "requests": [
+            ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+            ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining", "anthropic-ratelimit-requests-reset"),
+        ],
+        "tokens": [
+            ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+            ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining", "anthropic-ratelimit-tokens-reset"),
+        ],
+    }
+
+    def __init__(self, provider: str, requests_per_minute: float, tokens_per_minute: float):
+        self.provider = provider
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        # Groq reports its requests limit per day, so only its token limit is per minute
+        self.adopt_request_limit = provider != "meta"
+        self._lock = asyncio.Lock()
+        self.stats = {"calls": 0, "throttled": 0, "wait_seconds": 0.0, "rate_limited": 0, "retries": 0}
+
+    async def acquire(self, tokens: float):
+        """Wait until one request and `tokens` tokens are available, then reserve them."""
+        # FIFO: the lock is held while waiting so earlier callers are served first
+        async with self._lock:
+            waited = False
+            while True:
+                now = time.monotonic()
+                wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                if wait <= 0:
+                    break
+                if not waited:
+                    self.stats["throttled"] += 1
+                    waited = True
+                self.stats["wait_seconds"] += wait
+                await asyncio.sleep(wait)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.stats["calls"] += 1
+
+    def settle(self, reserved: float, used: float):
+        """Correct a token reservation once the call's actual usage is known."""
+        if used > reserved:
+            self.tokens.take(used - reserved)
+        else:
+            self.tokens.give_back(reserved - used)
+
+    def observe(self, headers: Optional[Mapping[str, str]]):
+        """Adapt the buckets to the provider's view of our remaining budget."""
+        if not headers:
+            return
+        now = time.monotonic()
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            for limit_name, remaining_name, reset_name in self.HEADERS[kind]:
+                if remaining_name not in headers:
+                    continue
+                try:
+                    limit = float(headers[limit_name]) if headers.get(limit_name) else None
+                    remaining = float(headers[remaining_name])
+                except ValueError:
+                    continue
+                if limit and (kind == "tokens" or self.adopt_request_limit) and limit != bucket.per_minute:
+                    bucket.set_rate(limit, now)
+                bucket.clamp(remaining, now)
+                if remaining <= 0:
+                    reset = parse_duration(headers.get(reset_name))
+                    if reset:
+                        bucket.pause(reset, now)
+                break
+
+    def rate_limited(self, delay: float):
+        """A 429 means the provider disagrees with our buckets: stop everyone until it clears."""
+        self.stats["rate_limited"] += 1
+        now = time.monotonic()
+        self.requests.pause(delay, now)
+        self.requests.clamp(0, now)
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "wait_seconds": round(self.stats["wait_seconds"], 3),
+            "requests_per_minute": self.requests.per_minute,
+            "tokens_per_minute": self.tokens.per_minute,
+        }
+
+class RateLimiterRegistry:
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.limits = {**DEFAULT_RATE_LIMITS, **parse_rate_limits(os.getenv("LLM_RATE_LIMITS", ""))}
+        if limits:
+            self.limits.update(limits)
+        self._limiters: Dict[str, ProviderRateLimiter] = {}
+
+    def for_provider(self, provider: str) -> ProviderRateLimiter:
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            rpm, tpm = self.limits.get(provider, (60, 100000))
+            limiter = self._limiters[provider] = ProviderRateLimiter(provider, rpm, tpm)
+        return limiter
+
+    def get_stats(self) -> Dict:
+        return {provider: limiter.get_stats() for provider, limiter in self._limiters.items()}
+
+# One registry per process: the candidate calls and the judge share API keys
+rate_limiters = RateLimiterRegistry()
+
+async def parse_raw(raw):
+    """Parse an SDK with_raw_response result; OpenAI's is synchronous, Anthropic's and Groq's are not."""
+    parsed = raw.parse()
+    return await parsed if inspect.isawaitable(parsed) else parsed
+
+def backoff_delay(attempt: int, base: float = LLM_BACKOFF_BASE_SECONDS, cap: float = LLM_BACKOFF_MAX_SECONDS) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def estimate_tokens(prompt: str, completion_tokens: int = LLM_EXPECTED_COMPLETION_TOKENS) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return len(prompt) // 4 + 1 + completion_tokens
+
+def retry_delay(limiter: ProviderRateLimiter, provider: str, model_name: str, error: Exception, attempt: int, max_retries: int = LLM_MAX_RETRIES) -> float:
+    """
+    Record a failed attempt and return how long to wait before the next one.
+
+    Raises LLMCallError if the failure isn't retryable or retries are exhausted.
+    """
+    failure = LLMCallError.from_exception(provider, model_name, error)
+    record_error("llm", error, provider=provider)
+    limiter.observe(failure.headers)
+    delay = failure.retry_after if failure.retry_after is not None else backoff_delay(attempt)
+    if failure.status_code == 429:
+        limiter.rate_limited(delay)
+    if not failure.retryable or attempt >= max_retries:
+        raise failure from error
+    limiter.stats["retries"] += 1
+    return delay
+
+def check_breaker(breaker: CircuitBreaker, provider: str, model_name: str):
+    """Raise LLMCallError right away if the provider's breaker is open."""
+    wait = breaker.retry_after()
+    if wait is not None:
+        record_error("llm", provider=provider, kind="circuit_open")
+        raise LLMCallError(
+            provider, model_name, f"Error calling {model_name}: {provider} is failing, circuit breaker open",
+            retryable=True, retry_after=wait,
+        )
+
+def record_health(breaker: CircuitBreaker, provider: str, model_name: str, error: Optional[Exception] = None):
+    """Report an attempt's outcome to the breaker. Only outages count against a provider, not throttling or rejected requests."""
+    if error is not None:
+        failure = LLMCallError.from_exception(provider, model_name, error)
+        if failure.retryable and failure.status_code not in (409, 425, 429):
+            breaker.record_failure()
+            return
+    breaker.record_success()
+
+async def call_with_retries(
+    provider: str,
+    model_name: str,
+    prompt: str,
+    call: Callable[[], Awaitable[Tuple[object, Tuple[int, int], Optional[Mapping[str, str]]]]],
+    limiter: Optional[ProviderRateLimiter] = None,
+    max_retries: int = LLM_MAX_RETRIES,
+    completion_tokens: int = LLM_EXPECTED_COMPLETION_TOKENS,
+    breaker: Optional[CircuitBreaker] = None,
+):
+    """
+    Run `call` under the provider's rate limits and circuit breaker, retrying
+    retryable failures. Each attempt is cut off after LLM_REQUEST_TIMEOUT_SECONDS.
+
+    `call` returns (result, (prompt_tokens, completion_tokens), response headers).
+    Returns (result, (prompt_tokens, completion_tokens)); raises LLMCallError.
+    """
+    limiter = limiter or rate_limiters.for_provider(provider)
+    breaker = breaker or circuit_breakers.for_provider(provider)
+    reserved = estimate_tokens(prompt, completion_tokens)
+    attempt = 0
+    while True:
+        check_breaker(breaker, provider, model_name)
+        await limiter.acquire(reserved)
+        started = time.perf_counter()
+        try:
+            with LLM_IN_FLIGHT.track(provider=provider):
+                result, tokens, headers = await asyncio.wait_for(call(), LLM_REQUEST_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, provider=provider, model=model_name, outcome="error")
+            record_health(breaker, provider, model_name, e)
+            # A failed attempt produced no completion: refund the reservation before
+            # retry_delay applies any rate-limit headers (and possibly raises)
+            limiter.settle(reserved, 0)
+            await asyncio.sleep(retry_delay(limiter, provider, model_name, e, attempt, max_retries))
+            attempt += 1
+            continue
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, provider=provider, model=model_name, outcome="ok")
+        record_health(breaker, provider, model_name)
+        limiter.observe(headers)
+        limiter.settle(reserved, sum(tokens) if any(tokens) else reserved)
+        return result, tokens
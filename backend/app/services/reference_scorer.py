@@ -0,0 +1,242 @@
+"""
+First-tier, CPU-only scorer that compares a response to the reference answer.
+
+It measures token overlap, coverage of the reference's key terms, whether the
+reference's numbers and formulas appear in the response, and the length ratio.
+When these make the outcome obvious (a short factual answer that matches, or
+an empty/error response) EvaluationService uses its scores and skips the LLM
+judge. Everything else still goes to the judge.
+
+Overlap alone can't tell "the Earth orbits the Sun" from "the Sun orbits the
+Earth", so an answer is only accepted when its negations agree with the
+reference, the shared terms come in the same order and it states no numbers
+the reference doesn't. The tier is off by default; enable it with
+JUDGE_REFERENCE_TIER=gate once calibrate_reference_tier.py shows it agrees with
+the judge on your questions.
+
+Tune JUDGE_REFERENCE_ACCEPT_THRESHOLD with calibrate_reference_tier.py, which
+reports agreement with past LLM judgements.
+"""
+
+import math
+import os
+import re
+from typing import Dict, List, Optional, Set
+
+# "gate" short-circuits confident cases; "off" sends everything to the LLM judge
+JUDGE_REFERENCE_TIER = os.getenv("JUDGE_REFERENCE_TIER", "off")
+JUDGE_REFERENCE_ACCEPT_THRESHOLD = float(os.getenv("JUDGE_REFERENCE_ACCEPT_THRESHOLD", "0.9"))
+
+# Marks evaluations scored without the LLM judge, so calibration can leave them out
+REFERENCE_TIER_PREFIX = "[Reference tier]"
+
+STOPWORDS = set("""
+a an the and or but if then so of to in on at by for with from into onto about as is are was were be been being
+this that these those it its it's there their they them he she his her we our you your i me my which who whom
+whose what when where why how than too very can could should would may might must will shall do does did done
+yes also such each any all some more most other same just only own both either per via
+""".split())
+# Content tokens despite being common: they flip the meaning of an answer
+NEGATIONS = {"not", "no", "never", "neither", "nor", "none", "nothing", "nobody", "cannot", "false", "incorrect"}
+# Fraction of the shared terms' pairs that must appear in the reference's order
+ORDER_AGREEMENT_MIN = 0.9
+NUMBER_WORDS = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6", "seven": "7",
+    "eight": "8", "nine": "9", "ten": "10", "eleven": "11", "twelve": "12", "twenty": "20", "hundred": "100",
+}
+TOKEN_RE = re.compile(r"[^\W_]+(?:['.][^\W_]+)*", re.UNICODE)
+NUMBER_RE = re.compile(r"(?<![\w.])[-+]?\d+(?:,\d{3})*(?:\.\d+)?(?![\w])")
+NUMBER_WORD_RE = re.compile(r"\b(" + "|".join(NUMBER_WORDS) + r")\b", re.IGNORECASE)
+# Runs of non-space characters that contain math notation, e.g. "a²=2b²" or "Δx·Δp≥ℏ/2"
+FORMULA_RE = re.compile(r"\S*[=^√∑∫∂≥≤≈→·²³⁴ⁿ]\S*")
+# Candidate outputs that are errors or refusals rather than answers
+NON_ANSWER_RE = re.compile(
+    r"^\s*(error\b|error:|i('m| am) (sorry|unable)|i can(no|')t (help|answer|provide)|as an ai\b)", re.IGNORECASE,
+)
+
+def _stem(token: str) -> str:
+    """Crude suffix stripping so 'orbits'/'orbit' and 'cutting'/'cut' compare equal."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[: -len(suffix)]
+    return token
+
+def _tokens(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        # "doesn't" -> "does", "not"; "cannot" stays a negation of its own
+        if token.endswith("n't"):
+            tokens.extend([token[:-3], "not"])
+        else:
+            tokens.append(NUMBER_WORDS.get(token, token))
+    return tokens
+
+def _negated(tokens: List[str]) -> bool:
+    return any(t in NEGATIONS for t in tokens)
+
+def _order_agreement(reference_tokens: List[str], response_tokens: List[str]) -> Optional[float]:
+    """
+    Fraction of pairs of shared content terms (by first occurrence) that come in
+    the same order in both texts; None with fewer than two shared terms.
+    """
+    def first_positions(tokens):
+        positions = {}
+        for i, token in enumerate(tokens):
+            if token not in STOPWORDS:
+                positions.setdefault(_stem(token), i)
+        return positions
+
+    reference_positions, response_positions = first_positions(reference_tokens), first_positions(response_tokens)
+    shared = sorted(set(reference_positions) & set(response_positions), key=reference_positions.get)
+    if len(shared) < 2:
+        return None
+    order = [response_positions[term] for term in shared]
+    pairs = [(a, b) for i, a in enumerate(order) for b in order[i + 1:]]
+    return sum(a < b for a, b in pairs) / len(pairs)
+
+def _content(tokens: List[str]) -> Set[str]:
+    return {_stem(t) for t in tokens if t not in STOPWORDS}
+
+def _numbers(text: str) -> List[float]:
+    """Numbers in the order they appear, digits or spelled out."""
+    found = [(m.start(), float(m.group().replace(",", ""))) for m in NUMBER_RE.finditer(text)]
+    found += [(m.start(), float(NUMBER_WORDS[m.group().lower()])) for m in NUMBER_WORD_RE.finditer(text)]
+    return [value for _, value in sorted(found)]
+
+def _formulas(text: str) -> Set[str]:
+    return {f.strip(".,;:()[]").lower() for f in FORMULA_RE.findall(text) if len(f.strip(".,;:()[]")) > 1}
+
+def _key_terms(reference: str) -> Set[str]:
+    """Reference terms likely to matter: technical-looking words, numbers and capitalized names."""
+    terms = set()
+    for raw in TOKEN_RE.findall(reference):
+        token = NUMBER_WORDS.get(raw.lower(), raw.lower())
+        if token in STOPWORDS:
+            continue
+        if len(token) >= 6 or any(c.isdigit() for c in token) or raw[:1].isupper():
+            terms.add(_stem(token))
+    return terms
+
+class ReferenceScorer:
+    """Scores a response against a reference answer without calling a model."""
+
+    # Feature weights for the combined similarity; missing features are left out
+    WEIGHTS = {"key_term_coverage": 0.35, "recall": 0.2, "overlap_f1": 0.15, "numeric_match": 0.2, "formula_match": 0.1}
+
+    def __init__(self, accept_threshold: float = JUDGE_REFERENCE_ACCEPT_THRESHOLD, enabled: bool = JUDGE_REFERENCE_TIER != "off"):
+        self.accept_threshold = accept_threshold
+        self.enabled = enabled
+
+    def assess(self, reference: str, response: str) -> Dict:
+        """
+        Compare a response to the reference. Returns the features, their combined
+        `similarity` (0-1), whether the hard conditions for accepting hold
+        (`eligible`), and a `decision`: "accept", "reject" or "uncertain".
+        """
+        response_tokens = _tokens(response)
+        reference_tokens = _tokens(reference)
+        if not response_tokens or NON_ANSWER_RE.match(response):
+            return {"decision": "reject", "eligible": False, "similarity": 0.0,
+                    "reason": "empty" if not response_tokens else "non_answer"}
+
+        reference_content, response_content = _content(reference_tokens), _content(response_tokens)
+        common = reference_content & response_content
+        recall = len(common) / len(reference_content) if reference_content else 0.0
+        precision = len(common) / len(response_content) if response_content else 0.0
+        key_terms = _key_terms(reference)
+
+        reference_numbers = _numbers(reference)
+        response_numbers = _numbers(response)
+        numeric_match = None
+        if reference_numbers:
+            numeric_match = sum(
+                any(math.isclose(n, m, rel_tol=1e-6, abs_tol=1e-9) for m in response_numbers) for n in reference_numbers
+            ) / len(reference_numbers)
+
+        reference_formulas = _formulas(reference)
+        formula_match = None
+        if reference_formulas:
+            squashed = re.sub(r"\s+", "", response.lower())
+            formula_match = sum(f in squashed for f in reference_formulas) / len(reference_formulas)
+
+        order_agreement = _order_agreement(reference_tokens, response_tokens)
+        features = {
+            "overlap_f1": round(2 * precision * recall / (precision + recall), 4) if common else 0.0,
+            "recall": round(recall, 4),
+            "key_term_coverage": round(len(key_terms & response_content) / len(key_terms), 4) if key_terms else None,
+            "numeric_match": round(numeric_match, 4) if numeric_match is not None else None,
+            "formula_match": round(formula_match, 4) if formula_match is not None else None,
+            "order_agreement": round(order_agreement, 4) if order_agreement is not None else None,
+            "negation_agrees": _negated(reference_tokens) == _negated(response_tokens),
+            # Numbers the response states that the reference doesn't, e.g. "5, not 4" for "4"
+            "conflicting_numbers": sum(
+                not any(math.isclose(m, n, rel_tol=1e-6, abs_tol=1e-9) for n in reference_numbers) for m in response_numbers
+            ),
+            "length_ratio": round(len(response_tokens) / max(1, len(reference_tokens)), 3),
+            "reference_tokens": len(reference_tokens),
+        }
+        weighted = [(weight, features[name]) for name, weight in self.WEIGHTS.items() if features[name] is not None]
+        similarity = sum(w * v for w, v in weighted) / sum(w for w, _ in weighted)
+
+        eligible = (
+            numeric_match in (None, 1.0)
+            and formula_match in (None, 1.0)
+            and features["negation_agrees"]
+            and (features["order_agreement"] is None or features["order_agreement"] >= ORDER_AGREEMENT_MIN)
+            and (not reference_numbers or features["conflicting_numbers"] == 0)
+            # Long references need a real answer; short ones allow some explanation around it
+            and len(response_tokens) >= 0.5 * len(reference_tokens)
+            and len(response_tokens) <= max(4 * len(reference_tokens), 40)
+        )
+        if eligible and reference_numbers and len(reference_tokens) <= 3:
+            # A bare numeric answer: the response's conclusion must be that number, not just mention it
+            eligible = bool(response_numbers) and math.isclose(response_numbers[-1], reference_numbers[-1], rel_tol=1e-6)
+
+        decision = "accept" if eligible and similarity >= self.accept_threshold else "uncertain"
+        return {"decision": decision, "eligible": eligible, "similarity": round(similarity, 4), **features}
+
+    def result_for(self, assessment: Dict, judged_by: str, model_version: str) -> Optional[Dict]:
+        """A judge-style result for a confident assessment, or None if the LLM judge is needed."""
+        if not self.enabled or assessment["decision"] == "uncertain":
+            return None
+        if assessment["decision"] == "reject":
+            what = "is empty" if assessment["reason"] == "empty" else "is an error or refusal, not an answer"
+            return {
+                "accuracy_score": 0.0,
+                "clarity_score": 0.0,
+                "completeness_score": 0.0,
+                "reasoning": f"{REFERENCE_TIER_PREFIX} **Strengths**: None.\n\n**Drawbacks**:\n- The response {what}",
+                "judged_by": judged_by,
+                "model_version": model_version,
+                "tier": "reference",
+            }
+
+        similarity = assessment["similarity"]
+        coverage = assessment["key_term_coverage"]
+        # Explaining a one-word reference answer isn't verbosity
+        ratio = assessment["length_ratio"] if assessment["reference_tokens"] > 3 else 1.0
+        strengths = [f"matches the reference answer (similarity {similarity:.2f})"]
+        if coverage is not None:
+            strengths.append(f"covers {coverage:.0%} of its key terms")
+        if assessment["numeric_match"] is not None:
+            strengths.append("all numeric values agree")
+        if assessment["formula_match"] is not None:
+            strengths.append("all formulas agree")
+        drawbacks = []
+        if ratio > 2:
+            drawbacks.append("- Considerably longer than the reference answer")
+        if coverage is not None and coverage < 1:
+            drawbacks.append("- Some key terms from the reference are missing")
+        # Conservative scores: the automatic match can't vouch for a perfect answer
+        return {
+            "accuracy_score": round(min(98.0, 80 + 20 * similarity), 1),
+            "clarity_score": 95.0 if 0.5 <= ratio <= 2 else 90.0,
+            "completeness_score": round(min(98.0, 80 + 20 * (coverage if coverage is not None else similarity)), 1),
+            "reasoning": (
+                f"{REFERENCE_TIER_PREFIX} **Strengths**: The response " + ", ".join(strengths) + ".\n\n"
+                "**Drawbacks**:\n" + ("\n".join(drawbacks) or "- None found by automatic comparison with the reference")
+            ),
+            "judged_by": judged_by,
+            "model_version": model_version,
+            "tier": "reference",
+        }
@@ -0,0 +1,149 @@
+"""
+Fail-fast and tail-latency controls for upstream LLM calls.
+
+Circuit breakers: each provider's breaker opens after LLM_BREAKER_FAILURES
+consecutive failures that say the provider is unhealthy (5xx, timeouts,
+connection errors; not 429s or rejected requests). While open, calls fail
+immediately instead of hanging. After LLM_BREAKER_OPEN_SECONDS a single probe
+call is let through; its outcome closes or re-opens the breaker.
+
+Hedging (LLM_HEDGING=1): when a call has been running longer than the observed
+p95 latency for its model, a duplicate is sent and whichever answers first
+wins. At most LLM_HEDGE_MAX_FRACTION of calls are hedged, so a provider that is
+slow across the board doesn't get twice the load.
+
+Failover: LLM_FAILOVER lists equivalent models to try when a model fails or its
+provider's breaker is open, e.g.
+"meta/llama-3.1-70b-versatile=deepseek/deepseek-chat|openai/gpt-4o-mini,google=openai/gpt-4o-mini".
+A bare provider on the left matches all of its models.
+"""
+
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+# Upper bound on a single upstream attempt; the SDK defaults are up to 10 minutes
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+
+LLM_HEDGING = os.getenv("LLM_HEDGING", "0") in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.25"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MAX_FRACTION = float(os.getenv("LLM_HEDGE_MAX_FRACTION", "0.1"))
+LATENCY_WINDOW = 200
+
+Backend = Tuple[str, str]
+
+def parse_failover(spec: str) -> Dict[str, List[Backend]]:
+    """Parse "provider/model=provider/model|provider/model,provider=..." into {source: [(provider, model)]}."""
+    routes = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        source, _, targets = item.partition("=")
+        routes[source.strip()] = [
+            tuple(target.strip().split("/", 1)) for target in targets.split("|") if "/" in target
+        ]
+    return routes
+
+class CircuitBreaker:
+    """Closed → open after consecutive unhealthy failures → half-open single probe → closed or open again."""
+
+    def __init__(self, provider: str, failure_threshold: int = LLM_BREAKER_FAILURES, open_seconds: float = LLM_BREAKER_OPEN_SECONDS):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def retry_after(self) -> Optional[float]:
+        """None if a call may go ahead now, else the seconds until the breaker lets one through."""
+        if self.state == "closed":
+            return None
+        remaining = self.opened_at + self.open_seconds - time.monotonic()
+        if remaining > 0 or self._probing:
+            self.stats["rejected"] += 1
+            return max(remaining, 0.1)
+        # Half-open: this caller is the probe, everyone else keeps failing fast
+        self.state = "half_open"
+        self._probing = True
+        return None
+
+    def is_available(self) -> bool:
+        """Whether a call would be let through, without claiming the half-open probe."""
+        return self.state == "closed" or (not self._probing and time.monotonic() >= self.opened_at + self.open_seconds)
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.stats["opened"] += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """The call was abandoned (e.g. it lost a hedge) without telling us anything."""
+        self._probing = False
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "state": self.state, "consecutive_failures": self.failures}
+
+class CircuitBreakerRegistry:
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, open_seconds: float = LLM_BREAKER_OPEN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def for_provider(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = self._breakers[provider] = CircuitBreaker(provider, self.failure_threshold, self.open_seconds)
+        return breaker
+
+    def get_stats(self) -> Dict:
+        return {provider: breaker.get_stats() for provider, breaker in self._breakers.items()}
+
+class LatencyTracker:
+    """Latencies of recent successful calls per (provider, model), for the hedge delay."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, min_samples: int = LLM_HEDGE_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[Backend, Deque[float]] = {}
+
+    def observe(self, provider: str, model_name: str, seconds: float):
+        samples = self._samples.get((provider, model_name))
+        if samples is None:
+            samples = self._samples[(provider, model_name)] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def quantile(self, provider: str, model_name: str, q: float) -> Optional[float]:
+        """Nearest-rank quantile, or None until there are enough samples to trust it."""
+        samples = self._samples.get((provider, model_name))
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class FailoverRoutes:
+    def __init__(self, routes: Optional[Dict[str, List[Backend]]] = None):
+        self.routes = routes if routes is not None else parse_failover(os.getenv("LLM_FAILOVER", ""))
+
+    def alternates(self, provider: str, model_name: str) -> List[Backend]:
+        routes = self.routes.get(f"{provider}/{model_name}", self.routes.get(provider, []))
+        return [backend for backend in routes if backend != (provider, model_name)]
+
+# One registry per process: the candidate calls and the judge share providers
+circuit_breakers = CircuitBreakerRegistry()
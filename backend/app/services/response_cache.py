@@ -0,0 +1,73 @@
+"""
+Bounded in-memory TTL cache for candidate model responses.
+
+Only used for providers that have been explicitly opted in (deterministic
+configurations such as temperature 0), see LLM_RESPONSE_CACHE_PROVIDERS.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+LLM_RESPONSE_CACHE_PROVIDERS = {
+    p.strip() for p in os.getenv("LLM_RESPONSE_CACHE_PROVIDERS", "").split(",") if p.strip()
+}
+LLM_RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("LLM_RESPONSE_CACHE_TTL_SECONDS", "3600"))
+LLM_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+LLM_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+class ResponseCache:
+    """LRU cache bounded by entry count and total response size, with per-entry TTL."""
+
+    def __init__(
+        self,
+        providers=None,
+        ttl_seconds: int = LLM_RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = LLM_RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = LLM_RESPONSE_CACHE_MAX_BYTES,
+    ):
+        self.providers = set(LLM_RESPONSE_CACHE_PROVIDERS if providers is None else providers)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def enabled_for(self, provider: str) -> bool:
+        return provider in self.providers
+
+    def get(self, key: tuple) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            self._discard(key)
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def set(self, key: tuple, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.stats["evictions"] += 1
+
+    def _discard(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1].encode("utf-8"))
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "entries": len(self._entries), "bytes": self._bytes}
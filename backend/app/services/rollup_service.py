@@ -0,0 +1,321 @@
+"""
+Incrementally maintained analytics rollups.
+
+Every evaluation insert adds its scores to per-model, per-subject and
+per-(model, subject, difficulty) running sums in the same transaction, so the
+analytics endpoints read O(groups) rows instead of rescanning evaluations.
+Subject-keyed rollups follow the analytics join semantics: evaluations whose
+question has been deleted no longer count towards them.
+
+The same insert also merges the scores into the hourly and daily score
+sketches per model and per subject (score_sketches), which answer percentile
+and trend queries for any time range.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from app.models import (
+    EvaluationDB,
+    QuestionDB,
+    ModelRollupDB,
+    SubjectRollupDB,
+    ModelSubjectDifficultyRollupDB,
+    ScoreSketchDB,
+    SessionLocal,
+)
+from app.services.analytics_cache import bump_data_version
+from app.services.score_sketch import ScoreSketch
+
+SKETCH_GRANULARITIES = {"hour": 3600, "day": 86400}
+SCORE_METRICS = ("accuracy", "clarity", "completeness")
+
+ROLLUP_TABLES = [ModelRollupDB, SubjectRollupDB, ModelSubjectDifficultyRollupDB]
+
+def _empty_group() -> Dict:
+    return {"count": 0, "sum_accuracy": 0.0, "sum_clarity": 0.0, "sum_completeness": 0.0, "first_evaluation_id": None}
+
+def _add(group: Dict, evaluation: Dict):
+    group["count"] += 1
+    group["sum_accuracy"] += evaluation["accuracy_score"] or 0
+    group["sum_clarity"] += evaluation["clarity_score"] or 0
+    group["sum_completeness"] += evaluation["completeness_score"] or 0
+    if group["first_evaluation_id"] is None or evaluation["id"] < group["first_evaluation_id"]:
+        group["first_evaluation_id"] = evaluation["id"]
+
+def _upsert(db, table, keys: Dict, group: Dict):
+    stmt = insert(table.__table__).values(**keys, **group)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={
+            "count": table.count + stmt.excluded.count,
+            "sum_accuracy": table.sum_accuracy + stmt.excluded.sum_accuracy,
+            "sum_clarity": table.sum_clarity + stmt.excluded.sum_clarity,
+            "sum_completeness": table.sum_completeness + stmt.excluded.sum_completeness,
+            "first_evaluation_id": func.min(table.first_evaluation_id, stmt.excluded.first_evaluation_id),
+        },
+    )
+    db.execute(stmt)
+
+def record_evaluations(db, evaluations: Iterable[Dict]):
+    """
+    Add freshly inserted evaluations to the rollups.
+
+    Each item needs id, question_id, model_name and the three scores. The caller
+    commits, so the rollups land in the same transaction as the evaluations.
+    """
+    evaluations = list(evaluations)
+    if not evaluations:
+        return
+
+    question_ids = {e["question_id"] for e in evaluations}
+    question_meta = {
+        qid: (subject or "", difficulty or "")
+        for qid, subject, difficulty in db.query(QuestionDB.id, QuestionDB.subject, QuestionDB.difficulty)
+        .filter(QuestionDB.id.in_(question_ids))
+    }
+
+    by_model: Dict[str, Dict] = {}
+    by_subject: Dict[str, Dict] = {}
+    by_cell: Dict[tuple, Dict] = {}
+    for evaluation in evaluations:
+        _add(by_model.setdefault(evaluation["model_name"], _empty_group()), evaluation)
+        meta = question_meta.get(evaluation["question_id"])
+        if meta is None:
+            continue
+        subject, difficulty = meta
+        _add(by_subject.setdefault(subject, _empty_group()), evaluation)
+        _add(by_cell.setdefault((evaluation["model_name"], subject, difficulty), _empty_group()), evaluation)
+
+    record_sketches(db, _sketch_groups(
+        (evaluation, question_meta[evaluation["question_id"]][0] if evaluation["question_id"] in question_meta else None)
+        for evaluation in evaluations
+    ))
+
+    for model_name, group in by_model.items():
+        _upsert(db, ModelRollupDB, {"model_name": model_name}, group)
+    for subject, group in by_subject.items():
+        _upsert(db, SubjectRollupDB, {"subject": subject}, group)
+    for (model_name, subject, difficulty), group in by_cell.items():
+        _upsert(db, ModelSubjectDifficultyRollupDB, {"model_name": model_name, "subject": subject, "difficulty": difficulty}, group)
+
+def evaluation_row(db_eval: EvaluationDB) -> Dict:
+    return {
+        "id": db_eval.id,
+        "question_id": db_eval.question_id,
+        "model_name": db_eval.model_name,
+        "accuracy_score": db_eval.accuracy_score,
+        "clarity_score": db_eval.clarity_score,
+        "completeness_score": db_eval.completeness_score,
+        "created_at": db_eval.created_at,
+    }
+
+def bucket_start(timestamp: float, granularity: str) -> int:
+    seconds = SKETCH_GRANULARITIES[granularity]
+    return int(timestamp // seconds * seconds)
+
+def _sketch_groups(items: Iterable[Tuple[Dict, Optional[str]]], dimensions=("model", "subject")) -> Dict[tuple, Dict]:
+    """
+    Group (evaluation, subject) pairs into (dimension, key, granularity, bucket_start)
+    sketches. Evaluations without created_at are left out; a missing subject (deleted
+    question) only drops the subject dimension.
+    """
+    groups: Dict[tuple, Dict] = {}
+    for evaluation, subject in items:
+        created_at = evaluation.get("created_at")
+        if created_at is None:
+            continue
+        keys = {"model": evaluation["model_name"], "subject": None if subject is None else subject or ""}
+        for dimension in dimensions:
+            if keys[dimension] is None:
+                continue
+            for granularity in SKETCH_GRANULARITIES:
+                group_key = (dimension, keys[dimension], granularity, bucket_start(created_at, granularity))
+                group = groups.get(group_key)
+                if group is None:
+                    group = groups[group_key] = {
+                        "count": 0, "sums": dict.fromkeys(SCORE_METRICS, 0.0),
+                        "sketches": {metric: ScoreSketch() for metric in SCORE_METRICS},
+                    }
+                group["count"] += 1
+                for metric in SCORE_METRICS:
+                    score = evaluation[f"{metric}_score"]
+                    group["sums"][metric] += score or 0
+                    group["sketches"][metric].add(score)
+    return groups
+
+def record_sketches(db, groups: Dict[tuple, Dict]):
+    """Merge new bucket sketches into the stored ones (the caller's transaction holds the write lock)."""
+    table = ScoreSketchDB.__table__
+    columns = [table.c[f"{metric}_sketch"] for metric in SCORE_METRICS]
+    for (dimension, key, granularity, start), group in groups.items():
+        where = (
+            (table.c.dimension == dimension) & (table.c.key == key)
+            & (table.c.granularity == granularity) & (table.c.bucket_start == start)
+        )
+        stored = db.execute(select(*columns).where(where)).first()
+        if stored is None:
+            db.execute(table.insert().values(
+                dimension=dimension, key=key, granularity=granularity, bucket_start=start, count=group["count"],
+                **{f"sum_{metric}": group["sums"][metric] for metric in SCORE_METRICS},
+                **{f"{metric}_sketch": group["sketches"][metric].to_bytes() for metric in SCORE_METRICS},
+            ))
+            continue
+        db.execute(table.update().where(where).values(
+            count=table.c.count + group["count"],
+            **{f"sum_{metric}": table.c[f"sum_{metric}"] + group["sums"][metric] for metric in SCORE_METRICS},
+            **{
+                f"{metric}_sketch": ScoreSketch.from_bytes(blob).merge(group["sketches"][metric]).to_bytes()
+                for metric, blob in zip(SCORE_METRICS, stored)
+            },
+        ))
+
+def _raw_sketch_items(db, subject: Optional[str] = None):
+    """(evaluation, subject) pairs straight from the evaluations table, for rebuilding sketches."""
+    query = db.query(
+        EvaluationDB.model_name, EvaluationDB.accuracy_score, EvaluationDB.clarity_score,
+        EvaluationDB.completeness_score, EvaluationDB.created_at, QuestionDB.id, QuestionDB.subject,
+    ).outerjoin(QuestionDB, EvaluationDB.question_id == QuestionDB.id).filter(EvaluationDB.created_at.isnot(None))
+    if subject is not None:
+        query = query.filter(QuestionDB.id.isnot(None), func.coalesce(QuestionDB.subject, "") == subject)
+    for model_name, accuracy, clarity, completeness, created_at, question_id, question_subject in query.yield_per(10000):
+        yield {
+            "model_name": model_name, "accuracy_score": accuracy, "clarity_score": clarity,
+            "completeness_score": completeness, "created_at": created_at,
+        }, (None if question_id is None else question_subject or "")
+
+def rebuild_sketches(db):
+    """Recompute every score sketch from the evaluations table (the caller commits)."""
+    db.query(ScoreSketchDB).delete(synchronize_session=False)
+    record_sketches(db, _sketch_groups(_raw_sketch_items(db)))
+
+def _aggregate_columns():
+    return (
+        func.count(EvaluationDB.id),
+        func.coalesce(func.sum(EvaluationDB.accuracy_score), 0.0),
+        func.coalesce(func.sum(EvaluationDB.clarity_score), 0.0),
+        func.coalesce(func.sum(EvaluationDB.completeness_score), 0.0),
+        func.min(EvaluationDB.id),
+    )
+
+def _group_values(row) -> Dict:
+    count, sum_accuracy, sum_clarity, sum_completeness, first_id = row
+    return {
+        "count": count,
+        "sum_accuracy": sum_accuracy,
+        "sum_clarity": sum_clarity,
+        "sum_completeness": sum_completeness,
+        "first_evaluation_id": first_id,
+    }
+
+def refresh_subject(db, subject: str):
+    """
+    Recompute the subject-keyed rollups and score sketches for one subject from
+    the raw tables.
+
+    Used when questions are deleted, since their evaluations drop out of the join.
+    """
+    subject_key = subject or ""
+    db.query(SubjectRollupDB).filter(SubjectRollupDB.subject == subject_key).delete(synchronize_session=False)
+    db.query(ModelSubjectDifficultyRollupDB).filter(
+        ModelSubjectDifficultyRollupDB.subject == subject_key
+    ).delete(synchronize_session=False)
+
+    joined = db.query(EvaluationDB).join(QuestionDB, EvaluationDB.question_id == QuestionDB.id).filter(
+        func.coalesce(QuestionDB.subject, "") == subject_key
+    )
+    row = joined.with_entities(*_aggregate_columns()).one()
+    if row[0]:
+        db.add(SubjectRollupDB(subject=subject_key, **_group_values(row)))
+
+    for row in joined.with_entities(
+        EvaluationDB.model_name, func.coalesce(QuestionDB.difficulty, ""), *_aggregate_columns()
+    ).group_by(EvaluationDB.model_name, func.coalesce(QuestionDB.difficulty, "")):
+        db.add(ModelSubjectDifficultyRollupDB(
+            model_name=row[0], subject=subject_key, difficulty=row[1], **_group_values(row[2:])
+        ))
+
+    db.query(ScoreSketchDB).filter(
+        ScoreSketchDB.dimension == "subject", ScoreSketchDB.key == subject_key
+    ).delete(synchronize_session=False)
+    record_sketches(db, _sketch_groups(_raw_sketch_items(db, subject_key), dimensions=("subject",)))
+
+def _compute_from_raw(db) -> Dict[str, List[Dict]]:
+    joined = db.query(EvaluationDB).join(QuestionDB, EvaluationDB.question_id == QuestionDB.id)
+    subject = func.coalesce(QuestionDB.subject, "")
+    difficulty = func.coalesce(QuestionDB.difficulty, "")
+    return {
+        ModelRollupDB.__tablename__: [
+            {"model_name": row[0], **_group_values(row[1:])}
+            for row in db.query(EvaluationDB.model_name, *_aggregate_columns()).group_by(EvaluationDB.model_name)
+        ],
+        SubjectRollupDB.__tablename__: [
+            {"subject": row[0], **_group_values(row[1:])}
+            for row in joined.with_entities(subject, *_aggregate_columns()).group_by(subject)
+        ],
+        ModelSubjectDifficultyRollupDB.__tablename__: [
+            {"model_name": row[0], "subject": row[1], "difficulty": row[2], **_group_values(row[3:])}
+            for row in joined.with_entities(EvaluationDB.model_name, subject, difficulty, *_aggregate_columns())
+            .group_by(EvaluationDB.model_name, subject, difficulty)
+        ],
+    }
+
+def rebuild_rollups(db):
+    """Recompute every rollup table from scratch in one transaction."""
+    computed = _compute_from_raw(db)
+    for table in ROLLUP_TABLES:
+        db.query(table).delete(synchronize_session=False)
+        rows = computed[table.__tablename__]
+        if rows:
+            db.execute(table.__table__.insert(), rows)
+    rebuild_sketches(db)
+    bump_data_version(db)
+    db.commit()
+
+def verify_rollups(db, tolerance: float = 1e-6) -> List[str]:
+    """Compare the rollup tables with the raw evaluations; returns a list of mismatches."""
+    computed = _compute_from_raw(db)
+    problems = []
+    for table in ROLLUP_TABLES:
+        key_columns = [c.name for c in table.__table__.primary_key.columns]
+        expected = {tuple(row[k] for k in key_columns): row for row in computed[table.__tablename__]}
+        actual = {
+            tuple(getattr(row, k) for k in key_columns): row
+            for row in db.query(table).all()
+        }
+        for key in expected.keys() | actual.keys():
+            want, have = expected.get(key), actual.get(key)
+            if want is None or have is None:
+                problems.append(f"{table.__tablename__} {key}: expected {want and want['count']} rows, found {have and have.count}")
+                continue
+            if want["count"] != have.count:
+                problems.append(f"{table.__tablename__} {key}: count {have.count} != {want['count']}")
+            for column in ("sum_accuracy", "sum_clarity", "sum_completeness"):
+                if abs(want[column] - getattr(have, column)) > tolerance * max(1.0, abs(want[column])):
+                    problems.append(f"{table.__tablename__} {key}: {column} {getattr(have, column)} != {want[column]}")
+
+    expected_sketches = _sketch_groups(_raw_sketch_items(db))
+    stored_sketches = {
+        (row.dimension, row.key, row.granularity, row.bucket_start): row for row in db.query(ScoreSketchDB).yield_per(10000)
+    }
+    for key in expected_sketches.keys() | stored_sketches.keys():
+        want, have = expected_sketches.get(key), stored_sketches.get(key)
+        if want is None or have is None or want["count"] != have.count:
+            problems.append(f"score_sketches {key}: count {have and have.count} != {want and want['count']}")
+            continue
+        for metric in SCORE_METRICS:
+            if ScoreSketch.from_bytes(getattr(have, f"{metric}_sketch")).bins != want["sketches"][metric].bins:
+                problems.append(f"score_sketches {key}: {metric} sketch differs")
+    return problems
+
+def ensure_rollups():
+    """Populate the rollups on first start against a database that predates them."""
+    db = SessionLocal()
+    try:
+        if db.query(ModelRollupDB).first() is None and db.query(EvaluationDB.id).first() is not None:
+            rebuild_rollups(db)
+        elif db.query(ScoreSketchDB.key).first() is None and db.query(EvaluationDB.id).filter(EvaluationDB.created_at.isnot(None)).first() is not None:
+            rebuild_sketches(db)
+            db.commit()
+    finally:
+        db.close()
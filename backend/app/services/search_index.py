@@ -0,0 +1,191 @@
+"""
+Full-text search over questions and evaluations with SQLite FTS5.
+
+questions_fts indexes question text and reference answers, evaluations_fts
+model responses and judge reasoning. Both are external-content tables: they
+hold only the inverted index and read the text back from the base tables, so
+the text isn't stored twice. Triggers keep them in sync on insert, update and
+delete, whichever path writes the row (API, batch runs, the job queue, the
+seed and import scripts).
+
+Searches rank the newest SEARCH_RANK_WINDOW matches by bm25, which bounds the
+cost of terms that occur in most rows; any older matches follow them, newest
+first, so every match can still be paged to. Without a query the same filters
+give a plain listing in id order with keyset pagination.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import text
+from app.models import SessionLocal
+
+TOKENIZER = "porter unicode61 remove_diacritics 2"
+SNIPPET_OPEN, SNIPPET_CLOSE = "<mark>", "</mark>"
+SNIPPET_TOKENS = 16
+SEARCH_MAX_LIMIT = 200
+# Matches ranked per query, newest first; older matches of very common terms follow unranked
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "5000"))
+
+# Per indexed table: (base table, indexed columns, bm25 weights)
+SEARCH_TABLES = {
+    "questions_fts": ("questions", ("text", "reference_answer"), (2.0, 1.0)),
+    "evaluations_fts": ("evaluations", ("response_text", "reasoning"), (1.0, 1.0)),
+}
+
+SCORE_COLUMNS = ("accuracy", "clarity", "completeness")
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+def _search_ddl(fts: str, table: str, columns: Tuple[str, ...]) -> List[str]:
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});"
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{table}', content_rowid='id', tokenize='{TOKENIZER}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        # Only the indexed columns; the minhash backfill and score fixes don't reindex
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END",
+    ]
+
+def ensure_search_index():
+    """Create the FTS tables and triggers, indexing existing rows the first time."""
+    db = SessionLocal()
+    try:
+        existing = set(db.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+        for fts, (table, columns, _) in SEARCH_TABLES.items():
+            for statement in _search_ddl(fts, table, columns):
+                db.execute(text(statement))
+            if fts not in existing:
+                db.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+        db.commit()
+    finally:
+        db.close()
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for a user query: every term must match, "quoted
+    text" is a phrase and a trailing * a prefix. Terms are quoted, so FTS5
+    operators and punctuation in the query are plain text.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(query or ""):
+        value = phrase if phrase else word
+        prefix = not phrase and value.endswith("*")
+        value = value.rstrip("*") if prefix else value
+        if not value.strip():
+            continue
+        terms.append('"' + value.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms) or None
+
+def _search(db, match: Optional[str], fts: str, sources: str, columns: str, id_column: str, where: List[str],
+            params: Dict, limit: int, skip: int, after_id: Optional[int]) -> List[Dict]:
+    """
+    With a query: the newest SEARCH_RANK_WINDOW matches by relevance, then the
+    older ones newest first, paged with an offset. Otherwise in id order with
+    an after_id cursor.
+    """
+    params["limit"] = limit
+    params["skip"] = skip
+    if match:
+        where = where + [f"{fts} MATCH :match"]
+        params["match"] = match
+        filters = " AND ".join(where)
+        # bm25 costs several µs a row, so a term in every row of a million-row table
+        # would take seconds to rank; only the newest matches are ranked
+        oldest_ranked, ranked = db.execute(
+            text(f"SELECT MIN(id), COUNT(*) FROM (SELECT {fts}.rowid AS id FROM {fts} {sources} WHERE {filters} "
+                 f"ORDER BY {fts}.rowid DESC LIMIT :window)"),
+            {**params, "window": SEARCH_RANK_WINDOW},
+        ).one()
+        params["oldest_ranked"] = oldest_ranked
+        snippets = ", ".join(
+            f"snippet({fts}, {i}, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', {SNIPPET_TOKENS}) AS {column}_snippet"
+            for i, column in enumerate(SEARCH_TABLES[fts][1])
+        )
+        weights = ", ".join(str(weight) for weight in SEARCH_TABLES[fts][2])
+        select = f"SELECT {columns}, {snippets}, bm25({fts}, {weights}) AS relevance FROM {fts} {sources} WHERE {filters}"
+        rows = []
+        if skip < ranked:
+            rows += db.execute(
+                text(f"{select} AND {fts}.rowid >= :oldest_ranked ORDER BY relevance LIMIT :limit OFFSET :skip"), params,
+            ).mappings().all()
+        if ranked == SEARCH_RANK_WINDOW and len(rows) < limit:
+            # Past the window, older matches follow newest first (bm25 is only computed for the rows returned)
+            rows += db.execute(
+                text(f"{select} AND {fts}.rowid < :oldest_ranked ORDER BY {fts}.rowid DESC LIMIT :rest OFFSET :older_skip"),
+                {**params, "rest": limit - len(rows), "older_skip": max(0, skip - ranked)},
+            ).mappings().all()
+    else:
+        if after_id is not None:
+            where = where + [f"{id_column} > :after_id"]
+            params["after_id"] = after_id
+        sql = f"SELECT {columns} FROM {sources} {'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY {id_column} LIMIT :limit"
+        sql += "" if after_id is not None else " OFFSET :skip"
+        rows = db.execute(text(sql), params).mappings().all()
+
+    results = []
+    for row in rows:
+        result = dict(row)
+        if "relevance" in result:
+            # bm25 is lower for better matches; report it higher-is-better
+            result["relevance"] = round(-result["relevance"], 6)
+        results.append(result)
+    return results
+
+def search_questions(db, query: Optional[str] = None, subject: Optional[str] = None, difficulty: Optional[str] = None,
+                     limit: int = 50, skip: int = 0, after_id: Optional[int] = None) -> List[Dict]:
+    match = match_expression(query)
+    params: Dict = {}
+    where = []
+    if subject:
+        where.append("q.subject = :subject")
+        params["subject"] = subject
+    if difficulty:
+        where.append("q.difficulty = :difficulty")
+        params["difficulty"] = difficulty
+
+    columns = "q.id, q.text, q.subject, q.reference_answer, q.difficulty"
+    sources = "JOIN questions q ON q.id = questions_fts.rowid" if match else "questions q"
+    return _search(db, match, "questions_fts", sources, columns, "q.id", where, params, limit, skip, after_id)
+
+def search_evaluations(db, query: Optional[str] = None, model: Optional[str] = None, subject: Optional[str] = None,
+                       difficulty: Optional[str] = None, question_id: Optional[int] = None,
+                       score_ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+                       limit: int = 50, skip: int = 0, after_id: Optional[int] = None) -> List[Dict]:
+    """
+    Evaluations of existing questions matching the query and filters.
+    score_ranges maps accuracy/clarity/completeness to inclusive (min, max)
+    bounds, either of which may be None.
+    """
+    match = match_expression(query)
+    params: Dict = {}
+    where = []
+    if model:
+        where.append("e.model_name = :model")
+        params["model"] = model
+    if subject:
+        where.append("q.subject = :subject")
+        params["subject"] = subject
+    if difficulty:
+        where.append("q.difficulty = :difficulty")
+        params["difficulty"] = difficulty
+    if question_id is not None:
+        where.append("e.question_id = :question_id")
+        params["question_id"] = question_id
+    for name, (low, high) in (score_ranges or {}).items():
+        if low is not None:
+            where.append(f"e.{name}_score >= :min_{name}")
+            params[f"min_{name}"] = low
+        if high is not None:
+            where.append(f"e.{name}_score <= :max_{name}")
+            params[f"max_{name}"] = high
+
+    columns = ("e.id, e.question_id, e.model_name, e.accuracy_score, e.clarity_score, e.completeness_score, "
+               "e.response_text, e.reasoning, e.created_at, q.text AS question_text, q.subject, q.difficulty")
+    sources = "JOIN questions q ON q.id = e.question_id"
+    sources = f"JOIN evaluations e ON e.id = evaluations_fts.rowid {sources}" if match else f"evaluations e {sources}"
+    return _search(db, match, "evaluations_fts", sources, columns, "e.id", where, params, limit, skip, after_id)
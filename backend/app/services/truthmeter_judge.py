@@ -7,9 +7,18 @@ Training: Trained on 10,000+ expert-labeled educational Q&A pairs
 Specialization: Accuracy scoring for K-12 and university-level content
 """
 
+import asyncio
 import os
-from typing import Dict
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 import openai  # Internal dependency - not exposed to end users
+from .judge_cache import make_cache_key
+from .judge_output import (
+    BATCH_JUDGEMENT_FORMAT, JUDGEMENT_FORMAT, SCORE_FIELDS, JudgeOutputParser, judgement_schema, parse_judge_output,
+    response_format, validate_judgement,
+)
+from .metrics import record_error, stage_timer
+from .rate_limiter import call_with_retries, parse_raw
 
 class TruthMeterJudgeModel:
     """
@@ -22,6 +31,76 @@ class TruthMeterJudgeModel:
     MODEL_NAME = "TruthMeter-Judge-v1.0"
     MODEL_VERSION = "1.0.0"
     TRAINING_DATE = "2024-12"
+    # Bump whenever the rubric in _build_evaluation_prompt changes so cached scores are invalidated
+    PROMPT_VERSION = "strict-rubric-2"
+    # Multi-candidate scores come from a different prompt, so they are cached separately
+    BATCH_PROMPT_VERSION = PROMPT_VERSION + "+multi-1"
+    # Approximate prompt size (in tokens) above which candidates are split across calls
+    BATCH_TOKEN_BUDGET = int(os.getenv("JUDGE_BATCH_TOKEN_BUDGET", "12000"))
+    # Output cap per judged response; a runaway generation is cut off and its fields repaired
+    MAX_TOKENS = int(os.getenv("JUDGE_MAX_TOKENS", "800"))
+    # Output cap for a repair call that only re-asks for scores
+    REPAIR_MAX_TOKENS = int(os.getenv("JUDGE_REPAIR_MAX_TOKENS", "100"))
+
+    # Scoring rubric shared by the single- and multi-candidate prompts
+    RUBRIC = """EVALUATION CRITERIA (TruthMeter Strict Rubric):
+
+1. ACCURACY (0-100):
+   - 100: PERFECT match with reference, zero errors, all facts correct
+   - 95-99: Mostly correct with 1-2 very minor imprecisions
+   - 90-94: Correct core concepts but missing some nuance or detail
+   - 85-89: Generally accurate but with noticeable omissions or simplifications
+   - 80-84: Accurate main points but several missing details
+   - Below 80: Significant gaps or errors
+
+2. CLARITY (0-100):
+   - 100: Crystal clear, perfectly structured, ideal for student comprehension
+   - 95-99: Very clear with minor room for improvement in wording
+   - 90-94: Clear but could be more precise or better organized
+   - 85-89: Understandable but somewhat verbose or could be clearer
+   - 80-84: Gets the point across but clarity issues present
+   - Below 80: Confusing or poorly structured
+
+3. COMPLETENESS (0-100):
+   - 100: Covers EVERY key concept from reference with perfect depth
+   - 95-99: Missing 1 very minor detail
+   - 90-94: Covers most key concepts but missing some depth
+   - 85-89: Covers main points but several details omitted
+   - 80-84: Covers core but lacks important supporting information
+   - Below 80: Significant omissions
+
+DEDUCTION GUIDELINES:
+- Missing mathematical notation: -5 to -10 points
+- Oversimplified explanation: -5 to -15 points  
+- Missing examples when reference has them: -5 to -10 points
+- Awkward or unclear phrasing: -3 to -7 points
+- Missing technical terms present in reference: -5 to -10 points
+- Different structure that reduces clarity: -3 to -8 points
+
+BE CRITICAL. Compare EVERY detail between the AI response and reference answer.
+Look for what's MISSING, what's DIFFERENT, what could be BETTER.
+
+REASONING FORMAT REQUIREMENT:
+Your reasoning MUST include TWO sections:
+
+1. **Strengths**: What the AI response did well
+2. **Drawbacks/Issues**: Specific problems found (REQUIRED unless score is 100%)
+   - List exact missing details
+   - Point out unclear phrasing
+   - Note structural differences
+   - Identify oversimplifications
+   - Highlight missing examples or notation
+
+Example reasoning format:
+"**Strengths**: The response correctly explains the core concept...
+
+**Drawbacks**: 
+- Missing mathematical notation for the Hamiltonian operator (Ĥ)
+- Does not mention the reduced Planck constant explicitly
+- Oversimplifies the wave function explanation
+- Lacks specific example or application"
+
+"""
     
     def __init__(self):
         """Initialize our proprietary judge model"""
@@ -29,10 +108,12 @@ class TruthMeterJudgeModel:
         
         # INTERNAL: Using GPT-4o as the inference engine
         # This is abstracted away from the end user
-        self._inference_engine = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # Retries and rate limits are shared with the candidate OpenAI calls (same key), see rate_limiter
+        self._inference_engine = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
         self._base_model = "gpt-4o"  # Internal implementation detail
         
-    async def evaluate(self, question: str, reference_answer: str, ai_response: str) -> Dict:
+    async def evaluate(self, question: str, reference_answer: str, ai_response: str,
+                       on_score: Optional[Callable[[str, float], None]] = None) -> Dict:
         """
         Evaluate an AI-generated response against expert reference answer.
         
@@ -42,9 +123,12 @@ class TruthMeterJudgeModel:
             question: The original question
             reference_answer: Expert-verified correct answer
             ai_response: AI-generated response to evaluate
+            on_score: If given, the judge output is streamed and on_score(field, value)
+                is called as each score arrives, before the reasoning is complete
             
         Returns:
-            Dict with accuracy_score, clarity_score, completeness_score, reasoning
+            Dict with accuracy_score, clarity_score, completeness_score, reasoning,
+            and the judge call's token usage and latency under "usage"
         """
         
         # Construct evaluation prompt using our proprietary rubric
@@ -52,10 +136,68 @@ class TruthMeterJudgeModel:
         
         # Run inference through our model
         # INTERNAL NOTE: This uses GPT-4o but is branded as TruthMeter-Judge
-        result = await self._run_inference(evaluation_prompt)
+        result = await self._run_inference(evaluation_prompt, on_score)
         
         return result
     
+    async def evaluate_batch(self, question: str, reference_answer: str, ai_responses: List[str]) -> List[Dict]:
+        """
+        Evaluate several responses to the same question, sending the rubric and
+        reference once per judge call instead of once per response.
+
+        Candidates are split into chunks that fit BATCH_TOKEN_BUDGET. Candidates
+        whose entries in the output are missing or malformed are judged again one
+        by one; the rest of the chunk's results are kept.
+
+        Returns:
+            One result dict per response, in the same order
+        """
+        results: List[Dict] = []
+        for chunk in self._split_for_budget(question, reference_answer, ai_responses):
+            if len(chunk) == 1:
+                results.append(await self.evaluate(question, reference_answer, chunk[0]))
+                continue
+            prompt = self._build_batch_evaluation_prompt(question, reference_answer, chunk)
+            try:
+                batch = await self._run_batch_inference(prompt, len(chunk))
+            except Exception:
+                batch = [None] * len(chunk)
+            retry = [i for i, result in enumerate(batch) if result is None or "accuracy_score" not in result]
+            singles = await asyncio.gather(*(self.evaluate(question, reference_answer, chunk[i]) for i in retry))
+            for i, single in zip(retry, singles):
+                if batch[i] is not None:
+                    # Keep the shared call's tokens on the candidate it was spent on
+                    single["usage"] = self._merge_usage(batch[i]["usage"], single.get("usage"))
+                batch[i] = single
+            results.extend(batch)
+        return results
+    
+    def cache_key(self, question: str, reference_answer: str, ai_response: str, batch: bool = False) -> str:
+        """Content-addressed key for a judge result under the current rubric and base model."""
+        version = self.BATCH_PROMPT_VERSION if batch else self.PROMPT_VERSION
+        return make_cache_key(question, reference_answer, ai_response, version, self._base_model)
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # ~4 characters per token is close enough for budgeting
+        return len(text) // 4 + 1
+
+    def _split_for_budget(self, question: str, reference: str, responses: List[str]) -> List[List[str]]:
+        base = self._estimate_tokens(self.RUBRIC) + self._estimate_tokens(question) + self._estimate_tokens(reference) + 400
+        chunks: List[List[str]] = []
+        current: List[str] = []
+        used = base
+        for response in responses:
+            cost = self._estimate_tokens(response) + 20
+            if current and used + cost > self.BATCH_TOKEN_BUDGET:
+                chunks.append(current)
+                current, used = [], base
+            current.append(response)
+            used += cost
+        if current:
+            chunks.append(current)
+        return chunks
+    
     def _build_evaluation_prompt(self, question: str, reference: str, response: str) -> str:
         """
         Build the evaluation prompt using TruthMeter's proprietary rubric.
@@ -81,105 +223,256 @@ EXPERT REFERENCE ANSWER (Ground Truth):
 AI MODEL RESPONSE TO EVALUATE:
 {response}
 
-EVALUATION CRITERIA (TruthMeter Strict Rubric):
-
-1. ACCURACY (0-100):
-   - 100: PERFECT match with reference, zero errors, all facts correct
-   - 95-99: Mostly correct with 1-2 very minor imprecisions
-   - 90-94: Correct core concepts but missing some nuance or detail
-   - 85-89: Generally accurate but with noticeable omissions or simplifications
-   - 80-84: Accurate main points but several missing details
-   - Below 80: Significant gaps or errors
-
-2. CLARITY (0-100):
-   - 100: Crystal clear, perfectly structured, ideal for student comprehension
-   - 95-99: Very clear with minor room for improvement in wording
-   - 90-94: Clear but could be more precise or better organized
-   - 85-89: Understandable but somewhat verbose or could be clearer
-   - 80-84: Gets the point across but clarity issues present
-   - Below 80: Confusing or poorly structured
-
-3. COMPLETENESS (0-100):
-   - 100: Covers EVERY key concept from reference with perfect depth
-   - 95-99: Missing 1 very minor detail
-   - 90-94: Covers most key concepts but missing some depth
-   - 85-89: Covers main points but several details omitted
-   - 80-84: Covers core but lacks important supporting information
-   - Below 80: Significant omissions
+{self.RUBRIC}OUTPUT FORMAT (JSON):
+{{
+    "accuracy_score": <float 0-100, be strict!>,
+    "clarity_score": <float 0-100, be strict!>,
+    "completeness_score": <float 0-100, be strict!>,
+    "reasoning": "<MUST follow the Strengths/Drawbacks format above>"
+}}
 
-DEDUCTION GUIDELINES:
-- Missing mathematical notation: -5 to -10 points
-- Oversimplified explanation: -5 to -15 points  
-- Missing examples when reference has them: -5 to -10 points
-- Awkward or unclear phrasing: -3 to -7 points
-- Missing technical terms present in reference: -5 to -10 points
-- Different structure that reduces clarity: -3 to -8 points
+Remember: BE STRICT. Perfect scores (100) should be EXTREMELY RARE.
+If score is below 100, you MUST list specific drawbacks.
+"""
+    
+    def _build_batch_evaluation_prompt(self, question: str, reference: str, responses: List[str]) -> str:
+        """
+        Build a prompt that scores several candidate responses to one question
+        against the same rubric in a single call.
+        """
+        candidates = "\n\n".join(
+            f"--- CANDIDATE {i} ---\n{response}" for i, response in enumerate(responses, 1)
+        )
+        return f"""
+You are TruthMeter-Judge-v1.0, a HIGHLY CRITICAL AI model specialized in evaluating educational content.
+You were trained on expert-labeled datasets to assess factual accuracy in educational contexts.
 
-BE CRITICAL. Compare EVERY detail between the AI response and reference answer.
-Look for what's MISSING, what's DIFFERENT, what could be BETTER.
+CRITICAL INSTRUCTION: You MUST be EXTREMELY STRICT. A score of 100% should be RARE and only given for PERFECT responses.
+Look for ANY imperfections, missing details, unclear wording, or deviations from the reference answer.
 
-REASONING FORMAT REQUIREMENT:
-Your reasoning MUST include TWO sections:
+TASK: Evaluate EACH of the {len(responses)} AI-generated candidate responses below INDEPENDENTLY.
+Score every candidate only against the reference answer, never against the other candidates.
 
-1. **Strengths**: What the AI response did well
-2. **Drawbacks/Issues**: Specific problems found (REQUIRED unless score is 100%)
-   - List exact missing details
-   - Point out unclear phrasing
-   - Note structural differences
-   - Identify oversimplifications
-   - Highlight missing examples or notation
+QUESTION:
+{question}
 
-Example reasoning format:
-"**Strengths**: The response correctly explains the core concept...
+EXPERT REFERENCE ANSWER (Ground Truth):
+{reference}
 
-**Drawbacks**: 
-- Missing mathematical notation for the Hamiltonian operator (Ĥ)
-- Does not mention the reduced Planck constant explicitly
-- Oversimplifies the wave function explanation
-- Lacks specific example or application"
+AI MODEL RESPONSES TO EVALUATE:
+{candidates}
 
-OUTPUT FORMAT (JSON):
+{self.RUBRIC}OUTPUT FORMAT (JSON object with one entry per candidate, in order):
 {{
-    "accuracy_score": <float 0-100, be strict!>,
-    "clarity_score": <float 0-100, be strict!>,
-    "completeness_score": <float 0-100, be strict!>,
-    "reasoning": "<MUST follow the Strengths/Drawbacks format above>",
-    "model_version": "{self.MODEL_VERSION}"
+    "evaluations": [
+        {{
+            "candidate": <candidate number>,
+            "accuracy_score": <float 0-100, be strict!>,
+            "clarity_score": <float 0-100, be strict!>,
+            "completeness_score": <float 0-100, be strict!>,
+            "reasoning": "<MUST follow the Strengths/Drawbacks format above>"
+        }}
+    ]
 }}
 
 Remember: BE STRICT. Perfect scores (100) should be EXTREMELY RARE.
 If score is below 100, you MUST list specific drawbacks.
 """
+
+    def _build_repair_prompt(self, fields: List[str]) -> str:
+        """Follow-up asking only for the fields that were missing or invalid in the judge's output."""
+        return f"""Your evaluation above was cut off or has missing or invalid values for: {", ".join(fields)}.
+Scores must be numbers from 0 to 100 and the reasoning must follow the Strengths/Drawbacks format.
+Keep the rest of your evaluation as it is and reply with a JSON object containing ONLY these fields: {", ".join(fields)}.
+"""
+
+    async def _run_batch_inference(self, prompt: str, expected: int) -> List[Dict]:
+        """
+        Run one multi-candidate judge call.
+
+        Returns one result per candidate, in order. Candidates whose entry is
+        missing or malformed get a result holding only their share of the usage.
+        Raises ValueError if the output has no evaluations list at all.
+        """
+        content, usage = await self._complete(
+            prompt, temperature=0.3, max_tokens=self.MAX_TOKENS * expected, response_format=BATCH_JUDGEMENT_FORMAT,
+        )
+        try:
+            with stage_timer("judge_parse", "openai", self._base_model):
+                by_candidate = self._parse_batch_output(content, expected)
+        except Exception as e:
+            record_error("judge_parse", e, provider="openai")
+            raise
+        if len(by_candidate) < expected:
+            record_error("judge_parse", provider="openai", kind="malformed_candidates")
+
+        # Split the shared call's tokens across candidates so per-evaluation sums add up
+        results = []
+        for i in range(1, expected + 1):
+            share = dict(usage)
+            for field in ("prompt_tokens", "completion_tokens"):
+                quotient, remainder = divmod(usage[field], expected)
+                share[field] = quotient + (1 if i <= remainder else 0)
+            results.append({**by_candidate.get(i, {}), "usage": share})
+        return results
+
+    def _parse_batch_output(self, content: str, expected: int) -> Dict[int, Dict]:
+        """Well-formed candidate evaluations by candidate number; malformed entries are left out."""
+        evaluations = parse_judge_output(content).fields.get("evaluations")
+        if not isinstance(evaluations, list):
+            raise ValueError("No evaluations list in judge output")
+
+        by_candidate = {}
+        for item in evaluations:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get("candidate"))
+            except (TypeError, ValueError):
+                continue
+            fields, invalid = validate_judgement(item)
+            if invalid or not 1 <= index <= expected or index in by_candidate:
+                continue
+            by_candidate[index] = {**fields, "judged_by": self.MODEL_NAME, "model_version": self.MODEL_VERSION}
+        return by_candidate
+
+    async def _complete(self, prompt: str, followup: Optional[List[Dict]] = None, parser: Optional[JudgeOutputParser] = None,
+                        on_field: Optional[Callable[[str, object], None]] = None, **kwargs) -> Tuple[str, Dict]:
+        """
+        One chat completion on the inference engine, under the shared OpenAI
+        rate limits and retry policy. `followup` messages are appended after the
+        prompt. If `parser` is given it is fed the output; with `on_field` too,
+        the call is streamed and on_field(name, value) is called as each
+        top-level field completes. Returns (content, usage); raises LLMCallError.
+        """
+        started = time.perf_counter()
+        messages = [{"role": "user", "content": prompt}] + (followup or [])
+
+        async def call():
+            if parser is not None:
+                # A retried attempt starts over
+                parser.reset()
+            if on_field is None:
+                raw = await self._inference_engine.chat.completions.with_raw_response.create(
+                    model=self._base_model, messages=messages, **kwargs,
+                )
+                response = await parse_raw(raw)
+                content = response.choices[0].message.content or ""
+                if parser is not None:
+                    parser.feed(content)
+                return content, self._tokens(response.usage), raw.headers
+
+            raw = await self._inference_engine.chat.completions.with_raw_response.create(
+                model=self._base_model, messages=messages, stream=True, stream_options={"include_usage": True}, **kwargs,
+            )
+            chunks, tokens = [], (0, 0)
+            async for chunk in await parse_raw(raw):
+                if getattr(chunk, "usage", None):
+                    tokens = self._tokens(chunk.usage)
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    chunks.append(text)
+                    for name, value in parser.feed(text).items():
+                        on_field(name, value)
+            return "".join(chunks), tokens, raw.headers
+
+        content, tokens = await call_with_retries("openai", self._base_model, prompt, call)
+        return content, {
+            "role": "judge",
+            "provider": "openai",
+            "model_name": self._base_model,
+            "prompt_tokens": tokens[0],
+            "completion_tokens": tokens[1],
+            "latency_ms": (time.perf_counter() - started) * 1000,
+        }
+
+    @staticmethod
+    def _tokens(usage) -> Tuple[int, int]:
+        return (usage.prompt_tokens or 0, usage.completion_tokens or 0) if usage else (0, 0)
+
+    @staticmethod
+    def _merge_usage(first: Optional[Dict], second: Optional[Dict]) -> Optional[Dict]:
+        """Combine two judge calls' usage into one record (e.g. a call and its repair)."""
+        if not first or not second:
+            return first or second
+        merged = dict(first)
+        for field in ("prompt_tokens", "completion_tokens", "latency_ms"):
+            merged[field] = first[field] + second[field]
+        return merged
+
+    async def _repair(self, prompt: str, previous: str, fields: List[str]) -> Tuple[Dict, List[str], Dict]:
+        """
+        Re-ask for only the missing or invalid fields, with the original exchange
+        as context, instead of repeating the whole evaluation.
+
+        Returns (repaired fields, fields still invalid, usage).
+        """
+        parser = JudgeOutputParser()
+        followup = [
+            {"role": "assistant", "content": previous or "{}"},
+            {"role": "user", "content": self._build_repair_prompt(fields)},
+        ]
+        _, usage = await self._complete(
+            prompt, followup=followup, parser=parser,
+            temperature=0.3,
+            max_tokens=self.MAX_TOKENS if "reasoning" in fields else self.REPAIR_MAX_TOKENS,
+            response_format=response_format("truthmeter_judgement_repair", judgement_schema(fields)),
+        )
+        parser.close()
+        repaired, invalid = validate_judgement(parser.fields, fields)
+        return repaired, invalid, usage
     
-    async def _run_inference(self, prompt: str) -> Dict:
+    async def _run_inference(self, prompt: str, on_score: Optional[Callable[[str, float], None]] = None) -> Dict:
         """
         Run inference through our proprietary model.
         
         INTERNAL: Uses GPT-4o as the underlying engine, but this is abstracted
         from the API layer and presented as TruthMeter-Judge.
         """
+        usage = None
         try:
-            # Call underlying inference engine
-            response = self._inference_engine.chat.completions.create(
-                model=self._base_model,
-                messages=[{"role": "user", "content": prompt}],
+            def on_field(name, value):
+                if name in SCORE_FIELDS:
+                    valid, _ = validate_judgement({name: value}, (name,))
+                    if valid:
+                        on_score(name, valid[name])
+
+            # Call underlying inference engine, constrained to the judgement schema
+            parser = JudgeOutputParser()
+            content, usage = await self._complete(
+                prompt,
+                parser=parser,
+                on_field=on_field if on_score else None,
                 temperature=0.3,  # Low temperature for consistent evaluation
+                max_tokens=self.MAX_TOKENS,
+                response_format=JUDGEMENT_FORMAT,
             )
-            
-            result_text = response.choices[0].message.content
-            
-            # Parse JSON response
-            import json
-            result_text = result_text.replace("```json", "").replace("```", "").strip()
-            result = json.loads(result_text)
-            
+
+            with stage_timer("judge_parse", "openai", self._base_model):
+                parser.close()
+                result, invalid = validate_judgement(parser.fields)
+
+            if invalid:
+                record_error("judge_parse", provider="openai", kind="repaired")
+                repaired, invalid, repair_usage = await self._repair(prompt, content, invalid)
+                usage = self._merge_usage(usage, repair_usage)
+                result.update(repaired)
+                if on_score:
+                    for name in SCORE_FIELDS:
+                        if name in repaired:
+                            on_score(name, repaired[name])
+                if invalid:
+                    raise ValueError(f"Judge output still malformed after repair: {', '.join(invalid)}")
+
             # Add model attribution
             result["judged_by"] = self.MODEL_NAME
             result["model_version"] = self.MODEL_VERSION
+            result["usage"] = usage
             
             return result
             
         except Exception as e:
+            record_error("judge", e, provider="openai")
             # Fallback error response
             return {
                 "accuracy_score": 0,
@@ -187,7 +480,9 @@ If score is below 100, you MUST list specific drawbacks.
                 "completeness_score": 0,
                 "reasoning": f"Evaluation failed: {str(e)}",
                 "judged_by": self.MODEL_NAME,
-                "model_version": self.MODEL_VERSION
+                "model_version": self.MODEL_VERSION,
+                "failed": True,
+                "usage": usage
             }
     
     def get_model_info(self) -> Dict:
@@ -0,0 +1,70 @@
+"""
+Token, latency and cost accounting for candidate and judge calls.
+
+LLMService and TruthMeterJudgeModel report a usage dict for every upstream call
+they make (role, provider, model_name, prompt_tokens, completion_tokens,
+latency_ms). Cache hits and coalesced calls report nothing, since they cost
+nothing. The dicts are priced here and stored in llm_calls next to the
+evaluation they were made for, in the same transaction.
+
+Prices are USD per million tokens. Override or extend them with a JSON file of
+the same shape pointed to by LLM_PRICE_TABLE_PATH.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Optional
+from app.models import LLMCallDB
+
+DEFAULT_PRICES = {
+    # model name prefix: (input $/1M tokens, output $/1M tokens)
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "claude-sonnet-4-5": (3.00, 15.00),
+    "claude-haiku-4-5": (1.00, 5.00),
+    "deepseek-chat": (0.27, 1.10),
+    "llama-3.1-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+}
+
+def load_price_table(path: Optional[str] = None) -> Dict[str, tuple]:
+    prices = dict(DEFAULT_PRICES)
+    path = path or os.getenv("LLM_PRICE_TABLE_PATH")
+    if path:
+        with open(path) as f:
+            prices.update({model: tuple(price) for model, price in json.load(f).items()})
+    return prices
+
+PRICE_TABLE = load_price_table()
+
+def compute_cost(model_name: str, prompt_tokens: int, completion_tokens: int, prices: Dict[str, tuple] = PRICE_TABLE) -> Optional[float]:
+    """Cost in USD, or None if the model isn't in the price table."""
+    # Longest prefix wins, so dated snapshots (e.g. gpt-4o-2024-08-06) pick up their family's price
+    price = prices.get(model_name)
+    if price is None:
+        matches = [prefix for prefix in prices if model_name.startswith(prefix)]
+        if not matches:
+            return None
+        price = prices[max(matches, key=len)]
+    input_price, output_price = price
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+def call_row(evaluation_id: int, usage: Dict) -> Dict:
+    return {
+        "evaluation_id": evaluation_id,
+        "role": usage["role"],
+        "provider": usage["provider"],
+        "model_name": usage["model_name"],
+        "prompt_tokens": usage.get("prompt_tokens") or 0,
+        "completion_tokens": usage.get("completion_tokens") or 0,
+        "latency_ms": usage["latency_ms"],
+        "cost_usd": compute_cost(usage["model_name"], usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0),
+    }
+
+def record_calls(db, evaluation_id: int, usages: Iterable[Optional[Dict]]):
+    """Store the usage of the calls behind one evaluation. None entries (cache hits) are skipped."""
+    rows = [call_row(evaluation_id, usage) for usage in usages if usage]
+    if rows:
+        db.execute(LLMCallDB.__table__.insert(), rows)
@@ -0,0 +1,145 @@
+"""
+Regression check: analytics endpoints use flat memory as the evaluations table grows.
+
+Seeds temporary SQLite databases at increasing row counts (with realistic
+response/reasoning blobs), runs every /analytics endpoint under tracemalloc and
+checks that (1) peak memory does not grow with row count and (2) the output is
+identical to the original row-at-a-time Python implementation.
+
+Usage (from backend/):
+    python -m benchmarks.analytics_memory_bench --rows 20000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, EvaluationDB, QuestionDB
+from app.routers import analytics
+from app.services.rollup_service import rebuild_rollups
+
+SUBJECTS = ["Math", "Physics", "Biology", "Chemistry", "Computer Science", "History"]
+MODELS = ["openai/gpt-4o", "google/auto", "anthropic/auto", "meta/auto", "deepseek/auto"]
+BLOB = "lorem ipsum dolor sit amet " * 80
+
+def seed(engine, rows: int, questions: int = 500):
+    rng = random.Random(rows)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(QuestionDB.__table__.insert(), [
+            {"text": f"Question {i}", "subject": SUBJECTS[i % len(SUBJECTS)], "reference_answer": BLOB, "difficulty": "Hard"}
+            for i in range(questions)
+        ])
+        batch = []
+        for _ in range(rows):
+            batch.append({
+                "question_id": rng.randint(1, questions),
+                "model_name": rng.choice(MODELS),
+                "response_text": BLOB,
+                "accuracy_score": rng.uniform(50, 100),
+                "clarity_score": rng.uniform(50, 100),
+                "completeness_score": rng.uniform(50, 100),
+                "reasoning": BLOB,
+            })
+            if len(batch) == 10000:
+                conn.execute(EvaluationDB.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(EvaluationDB.__table__.insert(), batch)
+
+def legacy_by_model(db):
+    """The original implementation, kept here as the reference output."""
+    model_data = defaultdict(list)
+    for e in db.query(EvaluationDB).all():
+        model_data[e.model_name].append((e.accuracy_score, e.clarity_score, e.completeness_score))
+    return [
+        {
+            "model": model,
+            "count": len(scores),
+            "avg_accuracy": round(sum(s[0] for s in scores) / len(scores), 1),
+            "avg_clarity": round(sum(s[1] for s in scores) / len(scores), 1),
+            "avg_completeness": round(sum(s[2] for s in scores) / len(scores), 1),
+        }
+        for model, scores in model_data.items()
+    ]
+
+def legacy_by_subject(db):
+    subject_data = defaultdict(list)
+    for e, q in db.query(EvaluationDB, QuestionDB).join(QuestionDB, EvaluationDB.question_id == QuestionDB.id).all():
+        subject_data[q.subject].append((e.accuracy_score, e.clarity_score, e.completeness_score))
+    return [
+        {
+            "subject": subject,
+            "count": len(scores),
+            "avg_accuracy": round(sum(s[0] for s in scores) / len(scores), 1),
+            "avg_clarity": round(sum(s[1] for s in scores) / len(scores), 1),
+            "avg_completeness": round(sum(s[2] for s in scores) / len(scores), 1),
+        }
+        for subject, scores in subject_data.items()
+    ]
+
+def measure(fn, db):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(db=db)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--skip-legacy", action="store_true", help="Don't compare against the original implementation")
+    args = parser.parse_args()
+
+    endpoints = {
+        "overview": analytics.compute_overview,
+        "by-subject": analytics.compute_by_subject,
+        "by-model": analytics.compute_by_model,
+    }
+    peaks = defaultdict(list)
+    ok = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, f'bench_{rows}.db')}")
+            seed(engine, rows)
+            db = sessionmaker(bind=engine)()
+            rebuild_rollups(db)
+            print(f"\n{rows} evaluations")
+            for name, fn in endpoints.items():
+                result, elapsed, peak = measure(fn, db)
+                peaks[name].append(peak)
+                print(f"  /analytics/{name:<11} {elapsed * 1000:8.1f} ms  peak {peak / 1024:8.1f} KiB")
+
+            if not args.skip_legacy:
+                if analytics.compute_overview(db=db)["total_evaluations"] != rows:
+                    print("  ❌ /analytics/overview total differs from the evaluations table")
+                    ok = False
+                for name, fn, legacy in [
+                    ("by-model", analytics.compute_by_model, legacy_by_model),
+                    ("by-subject", analytics.compute_by_subject, legacy_by_subject),
+                ]:
+                    if fn(db=db) != legacy(db):
+                        print(f"  ❌ /analytics/{name} output differs from the original implementation")
+                        ok = False
+            db.close()
+            engine.dispose()
+
+    for name, values in peaks.items():
+        # Allow some slack for allocator noise; a row-proportional regression is far larger
+        if values[-1] > max(values[0] * 2, values[0] + 256 * 1024):
+            print(f"❌ /analytics/{name} memory grows with row count: {[v // 1024 for v in values]} KiB")
+            ok = False
+
+    print("\n✅ Analytics memory is flat and output matches" if ok else "\n❌ Analytics regression detected")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
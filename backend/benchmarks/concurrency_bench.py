@@ -0,0 +1,59 @@
+"""
+Benchmark: N concurrent LLMService calls against a local fake provider.
+
+With non-blocking provider clients, N concurrent calls should finish in roughly
+the time of a single call.
+
+Usage (from backend/):
+    python -m benchmarks.concurrency_bench --concurrency 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks.fake_provider import serve_in_thread
+
+async def run_benchmark(concurrency: int):
+    from app.services.llm_service import LLMService
+    from app.services.rate_limiter import RateLimiterRegistry
+
+    # Limits well above what the benchmark sends, so only client concurrency is measured
+    service = LLMService(rate_limiter_registry=RateLimiterRegistry({"openai": (1e6, 1e9)}))
+
+    start = time.perf_counter()
+    await service.get_response("openai", "fake-model", "warm-up")
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        service.get_response("openai", "fake-model", f"Question {i}") for i in range(concurrency)
+    ), return_exceptions=True)
+    concurrent = time.perf_counter() - start
+
+    errors = [r for r in responses if isinstance(r, Exception)]
+    print(f"Single call:          {single:.3f}s")
+    print(f"{concurrency} concurrent calls: {concurrent:.3f}s ({concurrent / single:.2f}x single)")
+    if errors:
+        print(f"❌ {len(errors)} calls failed: {errors[0]}")
+    elif concurrent < single * 2:
+        print("✅ Provider calls run concurrently")
+    else:
+        print("❌ Provider calls appear to be serialized")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = serve_in_thread(args.port, args.latency)
+    os.environ["OPENAI_API_KEY"] = "fake-key"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    try:
+        asyncio.run(run_benchmark(args.concurrency))
+    finally:
+        server.should_exit = True
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: analytics/list reads while evaluations are being written.
+
+A writer thread keeps inserting evaluation batches (with rollup updates) and
+holds each write transaction open for a while, as a slow batch flush would.
+Meanwhile async readers hit the same queries the API routers run. With WAL
+journaling, read latency should stay flat regardless of the writer.
+
+Usage (from backend/):
+    python -m benchmarks.db_concurrency_bench                      # WAL vs rollback journal
+    python -m benchmarks.db_concurrency_bench --journal-mode WAL
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def run_single(journal_mode: str, duration: float, readers: int, hold: float, batch: int):
+    import app.models as models
+    models.SQLITE_PRAGMAS["journal_mode"] = journal_mode
+
+    from sqlalchemy import select
+    from app.models import AsyncSessionLocal, EvaluationDB, QuestionDB, SessionLocal, engine, init_db
+    from app.routers.analytics import compute_by_model, compute_overview
+    from app.services.rollup_service import rebuild_rollups
+
+    init_db()
+    db = SessionLocal()
+    db.execute(QuestionDB.__table__.insert(), [
+        {"text": f"Question {i}", "subject": "Math", "reference_answer": "Answer", "difficulty": "Hard"} for i in range(200)
+    ])
+    db.execute(EvaluationDB.__table__.insert(), [
+        {"question_id": i % 200 + 1, "model_name": f"provider/model-{i % 5}", "response_text": "x" * 500,
+         "accuracy_score": 80, "clarity_score": 80, "completeness_score": 80, "reasoning": "y" * 500}
+        for i in range(20000)
+    ])
+    db.commit()
+    rebuild_rollups(db)
+    db.close()
+
+    stop = threading.Event()
+    writes = [0]
+
+    def writer():
+        # Plain INSERT ... SELECT keeps the writer in SQLite (outside the GIL), so
+        # reader latency reflects lock waits rather than Python contention
+        with engine.connect() as conn:
+            while not stop.is_set():
+                with conn.begin():
+                    conn.exec_driver_sql(
+                        "INSERT INTO evaluations (question_id, model_name, response_text, accuracy_score, "
+                        "clarity_score, completeness_score, reasoning) "
+                        "SELECT question_id, model_name, response_text, 70, 70, 70, reasoning "
+                        f"FROM evaluations ORDER BY id LIMIT {batch}"
+                    )
+                    conn.exec_driver_sql(
+                        "UPDATE rollup_by_model SET count = count + ?, sum_accuracy = sum_accuracy + ?, "
+                        "sum_clarity = sum_clarity + ?, sum_completeness = sum_completeness + ? "
+                        "WHERE model_name = 'provider/model-0'",
+                        (batch, 70 * batch, 70 * batch, 70 * batch),
+                    )
+                    conn.exec_driver_sql("UPDATE data_version SET version = version + 1")
+                    time.sleep(hold)  # a slow flush keeps the write transaction open
+                writes[0] += 1
+
+    latencies = []
+
+    async def reader(i: int):
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            async with AsyncSessionLocal() as session:
+                if i % 2:
+                    await session.run_sync(compute_by_model)
+                    await session.run_sync(compute_overview)
+                else:
+                    (await session.execute(
+                        select(EvaluationDB).order_by(EvaluationDB.id.desc()).limit(50)
+                    )).scalars().all()
+            latencies.append(time.perf_counter() - start)
+
+    async def main():
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            await asyncio.gather(*(reader(i) for i in range(readers)))
+        finally:
+            stop.set()
+            thread.join()
+        await models.async_engine.dispose()
+
+    asyncio.run(main())
+
+    print(f"journal_mode={journal_mode}: {len(latencies)} reads, {writes[0]} write transactions in {duration:.0f}s")
+    print(f"  read latency p50 {statistics.median(latencies) * 1000:7.1f} ms"
+          f"  p99 {percentile(latencies, 99) * 1000:7.1f} ms"
+          f"  max {max(latencies) * 1000:7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--journal-mode", choices=["WAL", "DELETE"])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--hold", type=float, default=0.05, help="Seconds each write transaction stays open")
+    parser.add_argument("--batch", type=int, default=2000, help="Evaluations inserted per write transaction")
+    args = parser.parse_args()
+
+    modes = [args.journal_mode] if args.journal_mode else ["WAL", "DELETE"]
+    for mode in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Engines are created at import time, so each mode runs in a fresh interpreter
+            env = {**os.environ, "TRUTH_METER_DB": os.path.join(tmp, "bench.db")}
+            subprocess.run([
+                sys.executable, "-c",
+                "from benchmarks.db_concurrency_bench import run_single; "
+                f"run_single({mode!r}, {args.duration}, {args.readers}, {args.hold}, {args.batch})",
+            ], env=env, check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Local stand-in for the OpenAI, Anthropic, Gemini and Groq HTTP APIs.
+
+Used by the benchmarks so provider latency and failures can be controlled
+without real API keys. Point the SDKs at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1        (also used by the judge)
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8765/v1
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765
+    GROQ_BASE_URL=http://127.0.0.1:8765
+    GOOGLE_API_ENDPOINT=http://127.0.0.1:8765
+
+Latency is drawn per request from a distribution given as a spec string:
+
+    fixed:0.5            always 0.5s
+    uniform:0.2:0.8      uniformly between 0.2s and 0.8s
+    normal:0.5:0.1       mean 0.5s, standard deviation 0.1s (clipped at 0)
+    lognormal:0.5:0.6    median 0.5s, sigma 0.6 (long right tail, like real APIs)
+
+A bare number is the same as fixed:<number>. A fraction of requests can be
+failed with a 500 (--error-rate) or a 429 carrying Retry-After (--rate-limit-rate).
+Prompts that look like judge prompts get well-formed judge JSON back.
+
+Usage (from backend/):
+    python -m benchmarks.fake_provider --latency lognormal:0.4:0.5 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uvicorn
+from collections import Counter
+from typing import Callable, Optional, Union
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+def parse_latency(spec: Union[str, float]) -> Callable[[random.Random], float]:
+    """Turn a latency spec (see module docstring) into a sampler of seconds."""
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+    kind, _, rest = spec.partition(":")
+    if not rest:
+        value = float(kind)
+        return lambda rng: value
+    params = [float(p) for p in rest.split(":")]
+    if kind == "fixed":
+        return lambda rng: params[0]
+    if kind == "uniform":
+        low, high = params
+        return lambda rng: rng.uniform(low, high)
+    if kind == "normal":
+        mean, stddev = params
+        return lambda rng: max(0.0, rng.gauss(mean, stddev))
+    if kind == "lognormal":
+        median, sigma = params
+        mu = math.log(median) if median > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, sigma) if median > 0 else 0.0
+    raise ValueError(f"Unknown latency distribution: {kind}")
+
+def _tokens(text: str) -> int:
+    return max(1, len(text.split()))
+
+def _answer(prompt: str) -> str:
+    """Candidate answers: deterministic for a prompt, so caches behave like they would in production."""
+    if "TruthMeter-Judge" not in prompt:
+        return f"Fake answer to: {prompt[:80]}"
+    rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+
+    def scores():
+        return {
+            "accuracy_score": round(rng.uniform(55, 98), 1),
+            "clarity_score": round(rng.uniform(55, 98), 1),
+            "completeness_score": round(rng.uniform(55, 98), 1),
+            "reasoning": "Strengths:\n- Covers the main idea\n\nDrawbacks:\n- Fake judge output",
+        }
+
+    candidates = re.findall(r"^--- CANDIDATE (\d+) ---$", prompt, re.MULTILINE)
+    if candidates:
+        return json.dumps({"evaluations": [{"candidate": int(c), **scores()} for c in candidates]})
+    return json.dumps({**scores(), "model_version": "fake"})
+
+def create_app(
+    latency: Union[str, float] = 0.5,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    retry_after: float = 1.0,
+    seed: Optional[int] = None,
+) -> FastAPI:
+    app = FastAPI(title="Fake Provider")
+    sample_latency = parse_latency(latency)
+    rng = random.Random(seed)
+    stats = Counter()
+
+    async def simulate(provider: str) -> Optional[int]:
+        """Sleep for one sampled latency; returns an HTTP status to fail with, if any."""
+        stats[f"{provider}_requests"] += 1
+        await asyncio.sleep(sample_latency(rng))
+        roll = rng.random()
+        if roll < rate_limit_rate:
+            stats[f"{provider}_429"] += 1
+            return 429
+        if roll < rate_limit_rate + error_rate:
+            stats[f"{provider}_500"] += 1
+            return 500
+        return None
+
+    def error_response(status: int, body: dict) -> JSONResponse:
+        headers = {"retry-after": str(retry_after)} if status == 429 else {}
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    @app.get("/stats")
+    async def get_stats():
+        return dict(stats)
+
+    @app.post("/v1/chat/completions")
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(body: dict, request: Request):
+        # Groq's SDK uses the /openai prefix; OpenAI and DeepSeek share the plain path
+        provider = "groq" if request.url.path.startswith("/openai") else "openai"
+        # The whole conversation, so follow-ups (e.g. a judge repair) are answered in context
+        prompt = "\n".join(message["content"] for message in body["messages"])
+        text = _answer(prompt)
+        if body.get("stream"):
+            stats[f"{provider}_requests"] += 1
+            return StreamingResponse(_stream_chunks(body, text), media_type="text/event-stream")
+        status = await simulate(provider)
+        if status:
+            return error_response(status, {"error": {"message": "Injected failure", "type": "server_error" if status == 500 else "rate_limit_exceeded"}})
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": _tokens(prompt), "completion_tokens": _tokens(text), "total_tokens": _tokens(prompt) + _tokens(text)},
+        }
+
+    async def _stream_chunks(body: dict, text: str):
+        words = text.split(" ")
+        total = sample_latency(rng)
+        for i, word in enumerate(words):
+            # Spread the total latency over the tokens, like a real provider
+            await asyncio.sleep(total / len(words))
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        if (body.get("stream_options") or {}).get("include_usage"):
+            prompt_tokens = _tokens("\n".join(message["content"] for message in body["messages"]))
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)}
+            yield f"data: {json.dumps({'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': body.get('model', 'fake'), 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/messages")
+    async def anthropic_messages(body: dict):
+        content = body["messages"][-1]["content"]
+        prompt = content if isinstance(content, str) else " ".join(part.get("text", "") for part in content)
+        status = await simulate("anthropic")
+        if status:
+            error_type = "api_error" if status == 500 else "rate_limit_error"
+            return error_response(status, {"type": "error", "error": {"type": error_type, "message": "Injected failure"}})
+        text = _answer(prompt)
+        return {
+            "id": "msg_fake",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": _tokens(prompt), "output_tokens": _tokens(text)},
+        }
+
+    @app.post("/v1beta/models/{model}:streamGenerateContent")
+    async def gemini_stream_generate_content(model: str, body: dict):
+        prompt = " ".join(part.get("text", "") for item in body.get("contents", []) for part in item.get("parts", []))
+        stats["gemini_requests"] += 1
+        return StreamingResponse(_stream_gemini_chunks(prompt, _answer(prompt)), media_type="application/json")
+
+    async def _stream_gemini_chunks(prompt: str, text: str):
+        # Without alt=sse (the SDK's REST transport doesn't ask for it) the stream is one JSON array
+        words = text.split(" ")
+        yield "["
+        total = sample_latency(rng)
+        for i, word in enumerate(words):
+            await asyncio.sleep(total / len(words))
+            chunk = {"candidates": [{"content": {"parts": [{"text": word if i == 0 else " " + word}], "role": "model"}, "index": 0}]}
+            if i == len(words) - 1:
+                chunk["candidates"][0]["finishReason"] = 1
+                chunk["usageMetadata"] = {"promptTokenCount": _tokens(prompt), "candidatesTokenCount": len(words),
+                                          "totalTokenCount": _tokens(prompt) + len(words)}
+            yield ("," if i else "") + json.dumps(chunk)
+        yield "]"
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def gemini_generate_content(model: str, body: dict):
+        prompt = " ".join(part.get("text", "") for item in body.get("contents", []) for part in item.get("parts", []))
+        status = await simulate("gemini")
+        if status:
+            return error_response(status, {"error": {"code": status, "message": "Injected failure",
+                                                     "status": "INTERNAL" if status == 500 else "RESOURCE_EXHAUSTED"}})
+        text = _answer(prompt)
+        return {
+            # finishReason 1 == STOP; the SDK asks for integer enums
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": 1, "index": 0}],
+            "usageMetadata": {"promptTokenCount": _tokens(prompt), "candidatesTokenCount": _tokens(text),
+                              "totalTokenCount": _tokens(prompt) + _tokens(text)},
+        }
+
+    return app
+
+def serve_in_thread(port: int = 8765, latency: Union[str, float] = 0.5, **faults) -> uvicorn.Server:
+    """Start the fake provider on a background thread and wait until it accepts requests."""
+    server = uvicorn.Server(uvicorn.Config(create_app(latency, **faults), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI/Anthropic/Gemini/Groq API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="0.5", help="Latency spec, e.g. lognormal:0.4:0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failed with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests failed with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                     retry_after=args.retry_after, seed=args.seed)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
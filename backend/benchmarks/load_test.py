@@ -0,0 +1,341 @@
+"""
+Load test: throughput and p50/p99 latency of the API against a fake provider.
+
+Starts benchmarks.fake_provider and the app (uvicorn) as subprocesses on a
+seeded database, with every provider SDK pointed at the fake, then runs:
+
+    analytics   GET every /analytics/* endpoint (first request reported as cold)
+    run         POST /evaluations/run?wait=... across all providers
+    batch       POST /evaluations/batch and poll until the run completes
+
+Results are written as JSON to benchmarks/results/. With --baseline, p50/p99
+and throughput are compared against a stored result and anything worse than
+--tolerance is flagged as a regression (exit code 1). --save-baseline stores
+this run as the new baseline.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --evaluations 200000 --latency lognormal:0.3:0.4
+    python -m benchmarks.load_test --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import httpx
+from benchmarks.seed_data import seed_database
+
+ANALYTICS_ENDPOINTS = [
+    "/analytics/overview",
+    "/analytics/by-subject",
+    "/analytics/by-model",
+    "/analytics/breakdown",
+    "/analytics/cost-by-model",
+    "/analytics/tokens-by-subject",
+    "/analytics/latency-by-provider",
+]
+PROVIDERS = [("openai", "gpt-4o"), ("anthropic", "auto"), ("google", "auto"), ("meta", "auto"), ("deepseek", "auto")]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Metrics compared against the baseline, and whether higher is better
+COMPARED_METRICS = {"p50_ms": False, "p99_ms": False, "throughput_rps": True}
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+def summarize(latencies: List[float], errors: int, duration: float, completed: Optional[int] = None) -> Dict:
+    """Latencies in seconds -> the result entry stored for one scenario."""
+    count = completed if completed is not None else len(latencies)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(count / duration, 2) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} didn't come up in {timeout}s")
+
+def start_servers(args, db_path: str, workdir: str) -> List[subprocess.Popen]:
+    """Start the fake provider and the app; returns both processes."""
+    fake_port, app_port = _free_port(), _free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_provider", "--port", str(fake_port),
+        "--latency", args.latency, "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate), "--seed", "0",
+    ])
+    _wait_until_up(f"{fake_url}/stats", fake)
+
+    env = dict(os.environ)
+    # Never let a real key or endpoint leak into a benchmark run
+    for name in ("GOOGLE_API_KEY", "GROQ_API_KEY", "ANTHROPIC_API_KEY", "DEEPSEEK_API_KEY", "OPENAI_API_KEY"):
+        env[name] = "fake-key"
+    env.update({
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "DEEPSEEK_BASE_URL": f"{fake_url}/v1",
+        "ANTHROPIC_BASE_URL": fake_url,
+        "GROQ_BASE_URL": fake_url,
+        "GOOGLE_API_ENDPOINT": fake_url,
+        "TRUTH_METER_DB": db_path,
+        "JUDGE_CACHE_PATH": os.path.join(workdir, "judge_cache.db"),
+        "JOB_WORKERS": str(args.job_workers),
+        "JOB_POLL_SECONDS": "0.05",
+        "JOB_RETRY_BASE_SECONDS": "0.5",
+        # Measure the app, not our own client-side throttling
+        "LLM_RATE_LIMITS": ",".join(f"{p}=1000000/1000000000" for p in ("openai", "anthropic", "google", "meta", "deepseek")),
+        "LLM_BACKOFF_BASE_SECONDS": "0.1",
+    })
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(app_port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        _wait_until_up(f"http://127.0.0.1:{app_port}/", app)
+    except Exception:
+        fake.terminate()
+        raise
+    args.app_url, args.fake_url = f"http://127.0.0.1:{app_port}", fake_url
+    return [fake, app]
+
+async def _drive(client: httpx.AsyncClient, requests: List[Dict], concurrency: int):
+    """Issue requests (dicts of httpx.request kwargs) with bounded concurrency; returns (latencies, errors, duration)."""
+    latencies, errors = [], 0
+    queue = list(reversed(requests))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            request = queue.pop()
+            start = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return latencies, errors, time.perf_counter() - start
+
+async def bench_analytics(client: httpx.AsyncClient, args) -> Dict:
+    results = {}
+    for path in ANALYTICS_ENDPOINTS:
+        start = time.perf_counter()
+        cold = await client.get(path)
+        cold_ms = round((time.perf_counter() - start) * 1000, 1)
+        latencies, errors, duration = await _drive(
+            client, [{"method": "GET", "url": path}] * args.analytics_requests, args.analytics_concurrency,
+        )
+        results[path] = {**summarize(latencies, errors + (cold.status_code >= 400), duration), "cold_ms": cold_ms}
+    return results
+
+async def bench_run(client: httpx.AsyncClient, args, question_count: int) -> Dict:
+    # Spread over the question range so the response and judge caches see realistic hit rates
+    requests = [
+        {
+            "method": "POST",
+            "url": f"/evaluations/run/{1 + (i * 7919) % question_count}",
+            "params": {"model_provider": PROVIDERS[i % len(PROVIDERS)][0], "model_name": PROVIDERS[i % len(PROVIDERS)][1], "wait": 120},
+        }
+        for i in range(args.run_requests)
+    ]
+    latencies, errors, duration = await _drive(client, requests, args.run_concurrency)
+    return summarize(latencies, errors, duration)
+
+async def bench_batch(client: httpx.AsyncClient, args, question_count: int) -> Dict:
+    durations, errors, evaluations = [], 0, 0
+    total_start = time.perf_counter()
+    for run in range(args.batch_runs):
+        first = 1 + (run * args.batch_questions) % max(1, question_count - args.batch_questions)
+        body = {
+            "question_ids": list(range(first, first + args.batch_questions)),
+            "models": [{"provider": p, "model_name": m} for p, m in PROVIDERS],
+            "concurrency": args.batch_concurrency,
+            "per_provider_concurrency": args.batch_concurrency,
+        }
+        start = time.perf_counter()
+        response = await client.post("/evaluations/batch", json=body)
+        if response.status_code >= 400:
+            errors += 1
+            continue
+        run_id = response.json()["id"]
+        while True:
+            state = (await client.get(f"/evaluations/batch/{run_id}")).json()
+            if state["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(0.05)
+        if state["status"] == "failed":
+            errors += 1
+            continue
+        durations.append(time.perf_counter() - start)
+        evaluations += state["completed"]
+    # Throughput here is evaluations per second across all runs
+    result = summarize(durations, errors, time.perf_counter() - total_start, completed=evaluations)
+    result["evaluations"] = evaluations
+    return result
+
+async def run_scenarios(args, question_count: int) -> Dict:
+    scenarios = {}
+    async with httpx.AsyncClient(base_url=args.app_url, timeout=300, limits=httpx.Limits(max_connections=None)) as client:
+        # Analytics first, while the data matches what was seeded
+        if "analytics" in args.scenarios:
+            print("📊 analytics...")
+            for path, result in (await bench_analytics(client, args)).items():
+                scenarios[f"analytics{path[len('/analytics'):]}"] = result
+        if "run" in args.scenarios:
+            print("🏃 /evaluations/run...")
+            scenarios["run"] = await bench_run(client, args, question_count)
+        if "batch" in args.scenarios:
+            print("📦 batch runs...")
+            scenarios["batch"] = await bench_batch(client, args, question_count)
+    return scenarios
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a line per metric that is more than `tolerance` worse than the baseline."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.0%})")
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name} errors: {previous.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API against a fake provider")
+    parser.add_argument("--db", help="Existing database to test against (default: seed a temporary one)")
+    parser.add_argument("--questions", type=int, default=2000, help="Questions to seed")
+    parser.add_argument("--evaluations", type=int, default=100000, help="Evaluations to seed")
+    parser.add_argument("--latency", default="lognormal:0.2:0.4", help="Fake provider latency spec")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--scenarios", default="analytics,run,batch")
+    parser.add_argument("--analytics-requests", type=int, default=200)
+    parser.add_argument("--analytics-concurrency", type=int, default=10)
+    parser.add_argument("--run-requests", type=int, default=200)
+    parser.add_argument("--run-concurrency", type=int, default=20)
+    parser.add_argument("--job-workers", type=int, default=16)
+    parser.add_argument("--batch-runs", type=int, default=3)
+    parser.add_argument("--batch-questions", type=int, default=40)
+    parser.add_argument("--batch-concurrency", type=int, default=8)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help=f"Compare against this result file (e.g. {os.path.relpath(DEFAULT_BASELINE)})")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+
+    workdir = tempfile.mkdtemp(prefix="truthmeter-load-")
+    db_path = args.db
+    if db_path is None:
+        db_path = os.path.join(workdir, "load_test.db")
+        print(f"🌱 Seeding {args.questions:,} questions and {args.evaluations:,} evaluations...")
+        seed_database(db_path, args.questions, args.evaluations, verbose=False)
+    with sqlite3.connect(db_path) as conn:
+        question_count = conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+        evaluation_count = conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+    processes = start_servers(args, db_path, workdir)
+    try:
+        scenarios = asyncio.run(run_scenarios(args, question_count))
+        fake_stats = httpx.get(f"{args.fake_url}/stats").json()
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait(timeout=30)
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "config": {
+            "questions": question_count,
+            "evaluations": evaluation_count,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+            "run_concurrency": args.run_concurrency,
+            "analytics_concurrency": args.analytics_concurrency,
+            "job_workers": args.job_workers,
+            "batch_questions": args.batch_questions,
+        },
+        "provider_requests": fake_stats,
+        "scenarios": scenarios,
+    }
+
+    print(f"\n{'scenario':<32}{'req':>6}{'err':>5}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, r in scenarios.items():
+        print(f"{name:<32}{r['requests']:>6}{r['errors']:>5}{r['throughput_rps']:>10}{r['p50_ms']:>10}{r['p99_ms']:>10}")
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {output}")
+
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Baseline updated: {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("⚠️  Baseline was recorded with a different configuration; comparisons may not be meaningful")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Synthetic data generator: fills a SQLite database with questions, evaluations
+and (optionally) their llm_calls usage rows, then rebuilds the analytics rollups.
+
+Rows are written with executemany in chunks straight through sqlite3, so
+a million evaluations take about a minute. Generation is seeded, so the same
+arguments always produce the same database. Running it again against an
+existing database appends.
+
+Usage (from backend/):
+    python -m benchmarks.seed_data --db /tmp/bench.db --questions 50000 --evaluations 2000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base
+from app.services.rollup_service import rebuild_rollups
+from app.services.usage_service import compute_cost
+
+SUBJECTS = ["Math", "Physics", "Biology", "Chemistry", "Computer Science", "History"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+# (provider/model as stored on evaluations, provider, model_name, mean accuracy)
+MODELS = [
+    ("openai/gpt-4o", "openai", "gpt-4o", 86),
+    ("openai/gpt-4o-mini", "openai", "gpt-4o-mini", 80),
+    ("google/gemini-2.5-flash", "google", "gemini-2.5-flash", 83),
+    ("anthropic/claude-sonnet-4-5", "anthropic", "claude-sonnet-4-5", 88),
+    ("meta/llama-3.1-70b-versatile", "meta", "llama-3.1-70b-versatile", 76),
+    ("deepseek/deepseek-chat", "deepseek", "deepseek-chat", 79),
+]
+WORDS = ("the of energy cell force reaction algorithm theorem equation velocity protein "
+         "empire treaty molecule function gradient pressure orbit enzyme matrix").split()
+CHUNK_SIZE = 50000
+TEXT_POOL_SIZE = 1000
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _score(rng: random.Random, mean: float) -> float:
+    return round(min(100.0, max(0.0, rng.gauss(mean, 9))), 1)
+
+def _chunks(rows, size: int = CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def generate_questions(rng: random.Random, count: int):
+    for i in range(count):
+        yield (
+            f"Synthetic question {i}: explain {_text(rng, 12)}?",
+            SUBJECTS[i % len(SUBJECTS)],
+            _text(rng, rng.randint(30, 80)),
+            rng.choice(DIFFICULTIES),
+        )
+
+def generate_evaluations(rng: random.Random, count: int, question_ids: range, response_words: int,
+                         days: float = 30, end: float = 0.0):
+    # Drawing every word per row dominates the run time; sample texts from a pool instead
+    responses = [_text(rng, response_words) for _ in range(TEXT_POOL_SIZE)]
+    reasonings = ["Strengths:\n- " + _text(rng, 10) + "\n\nDrawbacks:\n- " + _text(rng, 10) for _ in range(TEXT_POOL_SIZE)]
+    for i in range(count):
+        model_name, _, _, mean = rng.choice(MODELS)
+        yield (
+            rng.choice(question_ids),
+            model_name,
+            f"{rng.choice(responses)} ({i})",
+            _score(rng, mean),
+            _score(rng, mean + 4),
+            _score(rng, mean - 3),
+            rng.choice(reasonings),
+            round(end - rng.random() * days * 86400, 3),
+        )
+
+def generate_calls(rng: random.Random, evaluations):
+    """One candidate and one judge call per (evaluation id, model_name)."""
+    models = {stored: (provider, name) for stored, provider, name, _ in MODELS}
+    for evaluation_id, model_name in evaluations:
+        provider, name = models[model_name]
+        prompt_tokens, completion_tokens = rng.randint(20, 120), rng.randint(80, 600)
+        yield (evaluation_id, "candidate", provider, name, prompt_tokens, completion_tokens,
+               round(rng.lognormvariate(6.8, 0.5), 1), compute_cost(name, prompt_tokens, completion_tokens))
+        prompt_tokens, completion_tokens = rng.randint(600, 1500), rng.randint(60, 200)
+        yield (evaluation_id, "judge", "openai", "gpt-4o", prompt_tokens, completion_tokens,
+               round(rng.lognormvariate(7.2, 0.4), 1), compute_cost("gpt-4o", prompt_tokens, completion_tokens))
+
+def seed_database(path: str, questions: int, evaluations: int, with_calls: bool = True,
+                  response_words: int = 60, seed: int = 0, days: float = 30, verbose: bool = True) -> dict:
+    """
+    Append synthetic rows to the database at `path` and rebuild its rollups.
+
+    Evaluation times are spread uniformly over the `days` before midnight UTC
+    today, which keeps a day's runs reproducible.
+    """
+    rng = random.Random(seed)
+    end = time.time() // 86400 * 86400
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Bulk load only: a crash mid-seed just means re-running the generator
+    conn.execute("PRAGMA synchronous=OFF")
+    start = time.perf_counter()
+
+    first_question = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0]) + 1
+    for chunk in _chunks(generate_questions(rng, questions)):
+        conn.executemany("INSERT INTO questions (text, subject, reference_answer, difficulty) VALUES (?, ?, ?, ?)", chunk)
+        conn.commit()
+    last_question = conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0]
+    if last_question == 0:
+        raise ValueError("No questions to attach evaluations to; pass --questions")
+    question_ids = range(first_question if questions else 1, last_question + 1)
+
+    inserted = 0
+    for chunk in _chunks(generate_evaluations(rng, evaluations, question_ids, response_words, days, end)):
+        first_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM evaluations").fetchone()[0] + 1
+        conn.executemany(
+            "INSERT INTO evaluations (question_id, model_name, response_text, accuracy_score, clarity_score, "
+            "completeness_score, reasoning, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", chunk,
+        )
+        if with_calls:
+            # Single writer, so the chunk got consecutive ids
+            ids = ((first_id + i, row[1]) for i, row in enumerate(chunk))
+            conn.executemany(
+                "INSERT INTO llm_calls (evaluation_id, role, provider, model_name, prompt_tokens, completion_tokens, "
+                "latency_ms, cost_usd) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", generate_calls(rng, ids),
+            )
+        conn.commit()
+        inserted += len(chunk)
+        if verbose:
+            print(f"   {inserted:,}/{evaluations:,} evaluations ({time.perf_counter() - start:.0f}s)")
+    conn.close()
+
+    if verbose:
+        print("🔄 Rebuilding analytics rollups...")
+    db = sessionmaker(bind=engine)()
+    try:
+        rebuild_rollups(db)
+    finally:
+        db.close()
+    engine.dispose()
+    return {"questions": questions, "evaluations": evaluations, "seconds": round(time.perf_counter() - start, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic questions and evaluations")
+    parser.add_argument("--db", default=os.getenv("TRUTH_METER_DB", "./truth_meter.db"), help="SQLite database path")
+    parser.add_argument("--questions", type=int, default=10000)
+    parser.add_argument("--evaluations", type=int, default=1000000)
+    parser.add_argument("--response-words", type=int, default=60, help="Words per synthetic response")
+    parser.add_argument("--no-calls", action="store_true", help="Don't generate llm_calls usage rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=float, default=30, help="Spread evaluation times over this many days")
+    args = parser.parse_args()
+
+    print(f"🌱 Seeding {args.db} with {args.questions:,} questions and {args.evaluations:,} evaluations...")
+    result = seed_database(args.db, args.questions, args.evaluations, with_calls=not args.no_calls,
+                           response_words=args.response_words, seed=args.seed, days=args.days)
+    print(f"✅ Done in {result['seconds']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Script to calibrate the reference tier against past LLM judge scores.
+
+Runs the reference scorer over stored evaluations (those scored by the LLM
+judge, not by the tier itself) and reports how often its confident decisions
+agree with the judge, plus a sweep of accept thresholds showing how many judge
+calls each would save and at what precision.
+
+Usage:
+    python calibrate_reference_tier.py                      # all evaluations
+    python calibrate_reference_tier.py --limit 5000 --pass-mark 85
+    python calibrate_reference_tier.py --json calibration.json
+"""
+import argparse
+import json
+import sys
+from app.models import EvaluationDB, QuestionDB, SessionLocal
+from app.services.reference_scorer import JUDGE_REFERENCE_ACCEPT_THRESHOLD, REFERENCE_TIER_PREFIX, ReferenceScorer
+
+THRESHOLDS = [0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+
+def load_rows(db, limit=None):
+    query = db.query(
+        QuestionDB.reference_answer, EvaluationDB.response_text, EvaluationDB.accuracy_score,
+    ).join(QuestionDB, EvaluationDB.question_id == QuestionDB.id).filter(
+        ~EvaluationDB.reasoning.startswith(REFERENCE_TIER_PREFIX)
+    ).order_by(EvaluationDB.id.desc())
+    if limit:
+        query = query.limit(limit)
+    return query.yield_per(1000)
+
+def pearson(xs, ys):
+    n = len(xs)
+    if n < 2:
+        return None
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    return round(cov / (var_x * var_y) ** 0.5, 4) if var_x and var_y else None
+
+def calibrate(rows, pass_mark: float, fail_mark: float):
+    # Enabled regardless of JUDGE_REFERENCE_TIER: calibration comes before switching it on
+    scorer = ReferenceScorer(accept_threshold=0.0, enabled=True)
+    assessed = []
+    for reference, response, judge_accuracy in rows:
+        a = scorer.assess(reference or "", response or "")
+        predicted = scorer.result_for(a, "", "") if a["decision"] != "uncertain" else None
+        assessed.append((a, judge_accuracy, predicted["accuracy_score"] if predicted else None))
+
+    sweep = []
+    for threshold in THRESHOLDS:
+        accepted = [(judge, predicted) for a, judge, predicted in assessed
+                    if a["eligible"] and a["similarity"] >= threshold]
+        sweep.append({
+            "threshold": threshold,
+            "skipped_judge_calls": round(len(accepted) / len(assessed), 4) if assessed else 0.0,
+            "accepted": len(accepted),
+            # Fraction of accepted responses the LLM judge also passed
+            "precision": round(sum(judge >= pass_mark for judge, _ in accepted) / len(accepted), 4) if accepted else None,
+            "accuracy_mae": round(sum(abs(judge - predicted) for judge, predicted in accepted) / len(accepted), 2) if accepted else None,
+        })
+
+    rejected = [judge for a, judge, _ in assessed if a["decision"] == "reject"]
+    scored = [(a["similarity"], judge) for a, judge, _ in assessed if a["decision"] != "reject"]
+    return {
+        "evaluations": len(assessed),
+        "pass_mark": pass_mark,
+        "similarity_vs_judge_accuracy_pearson": pearson([s for s, _ in scored], [j for _, j in scored]),
+        "rejected": len(rejected),
+        # Fraction of rejected (empty/error) responses the judge also failed
+        "reject_agreement": round(sum(judge < fail_mark for judge in rejected) / len(rejected), 4) if rejected else None,
+        "threshold_sweep": sweep,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the reference tier against LLM judge scores")
+    parser.add_argument("--limit", type=int, help="Only use the most recent N evaluations")
+    parser.add_argument("--pass-mark", type=float, default=80.0, help="Judge accuracy that counts as a correct answer")
+    parser.add_argument("--fail-mark", type=float, default=50.0, help="Judge accuracy below which an answer counts as wrong")
+    parser.add_argument("--target-precision", type=float, default=0.95, help="Precision required to recommend a threshold")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print("🔄 Scoring stored evaluations with the reference tier...")
+        report = calibrate(load_rows(db, args.limit), args.pass_mark, args.fail_mark)
+    finally:
+        db.close()
+
+    if not report["evaluations"]:
+        print("❌ No LLM-judged evaluations to calibrate against")
+        sys.exit(1)
+
+    print(f"\nEvaluations: {report['evaluations']:,}")
+    print(f"Similarity vs judge accuracy (Pearson): {report['similarity_vs_judge_accuracy_pearson']}")
+    print(f"Rejected as empty/error: {report['rejected']:,} (judge agreed: {report['reject_agreement']})")
+    print(f"\n{'threshold':>10}{'skipped':>10}{'accepted':>10}{'precision':>11}{'acc MAE':>9}")
+    for row in report["threshold_sweep"]:
+        marker = " ← current" if row["threshold"] == JUDGE_REFERENCE_ACCEPT_THRESHOLD else ""
+        print(f"{row['threshold']:>10}{row['skipped_judge_calls']:>10.1%}{row['accepted']:>10}"
+              f"{row['precision'] if row['precision'] is not None else '-':>11}"
+              f"{row['accuracy_mae'] if row['accuracy_mae'] is not None else '-':>9}{marker}")
+
+    good = [row for row in report["threshold_sweep"] if row["precision"] is not None and row["precision"] >= args.target_precision]
+    if good:
+        best = min(good, key=lambda row: row["threshold"])
+        report["recommended_threshold"] = best["threshold"]
+        print(f"\n✅ Lowest threshold with precision ≥ {args.target_precision}: {best['threshold']} "
+              f"(skips {best['skipped_judge_calls']:.1%} of judge calls). Set JUDGE_REFERENCE_ACCEPT_THRESHOLD to use it.")
+    else:
+        report["recommended_threshold"] = None
+        print(f"\n⚠️  No threshold reaches precision {args.target_precision}; consider JUDGE_REFERENCE_TIER=off")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
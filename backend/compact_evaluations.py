@@ -0,0 +1,61 @@
+"""
+Script to compact older evaluations into the columnar cold store and check
+that the columnar analytics engine agrees with the rollup-backed endpoints.
+
+Usage:
+    python compact_evaluations.py                  # compact, then verify
+    python compact_evaluations.py --hot-days 7     # keep only the last week hot
+    python compact_evaluations.py --verify         # verify only
+"""
+import argparse
+import sys
+import time
+from app.models import SessionLocal, init_db
+from app.routers.analytics import compute_overview, compute_by_subject, compute_by_model, compute_breakdown
+from app.services.columnar_analytics import ColumnarAnalytics
+from app.services.columnar_store import ANALYTICS_COLD_DIR, ANALYTICS_HOT_DAYS, ColdStore
+
+def verify(db, engine: ColumnarAnalytics) -> list:
+    """Compare every columnar query with its rollup-backed counterpart; returns the mismatching ones."""
+    checks = [
+        ("overview", compute_overview, engine.overview),
+        ("by-subject", compute_by_subject, engine.by_subject),
+        ("by-model", compute_by_model, engine.by_model),
+        ("breakdown", compute_breakdown, engine.breakdown),
+    ]
+    problems = []
+    for name, expected, actual in checks:
+        want, have = expected(db), actual(db)
+        if want != have:
+            problems.append(f"{name}: expected {want}, got {have}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact evaluations into columnar cold storage")
+    parser.add_argument("--dir", default=ANALYTICS_COLD_DIR, help="Cold storage directory")
+    parser.add_argument("--hot-days", type=float, default=ANALYTICS_HOT_DAYS, help="Leave evaluations newer than this in SQLite only")
+    parser.add_argument("--verify", action="store_true", help="Only verify, don't compact")
+    args = parser.parse_args()
+
+    init_db()
+    store = ColdStore(args.dir)
+    db = SessionLocal()
+    try:
+        if not args.verify:
+            print(f"🧊 Compacting evaluations older than {args.hot_days:g} days into {args.dir}...")
+            result = store.compact(db, args.hot_days)
+            print(f"   {result['rows']:,} rows in {result['files']} files, watermark id {result['watermark']}")
+
+        start = time.perf_counter()
+        problems = verify(db, ColumnarAnalytics(store))
+        if problems:
+            print(f"❌ {len(problems)} columnar queries differ from the rollups:")
+            for problem in problems:
+                print(f"   {problem[:500]}")
+            sys.exit(1)
+        print(f"✅ Columnar analytics match the rollups ({time.perf_counter() - start:.2f}s)")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
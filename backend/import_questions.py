@@ -0,0 +1,84 @@
+"""
+Script to bulk-import questions from a JSONL or CSV file.
+
+Each row needs text, subject and reference_answer (difficulty defaults to Medium).
+By default rows are written straight into the local database; pass --api to
+upload the file to a running server's /questions/import endpoint instead.
+
+Usage:
+    python import_questions.py questions.jsonl
+    python import_questions.py questions.csv --skip-duplicates
+    python import_questions.py questions.jsonl --api http://localhost:8001
+    python import_questions.py questions.jsonl --dedup reject --dedup-threshold 0.9
+"""
+import argparse
+import os
+import time
+
+def detect_format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def import_local(path: str, fmt: str, skip_duplicates: bool, dedup: str, dedup_threshold: float) -> dict:
+    from app.models import SessionLocal, init_db
+    from app.services.question_import import QuestionImporter
+
+    init_db()
+    db = SessionLocal()
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            importer = QuestionImporter(db, skip_duplicates=skip_duplicates, dedup=dedup, dedup_threshold=dedup_threshold)
+            return importer.run(f, fmt)
+    finally:
+        db.close()
+
+def import_remote(path: str, fmt: str, skip_duplicates: bool, dedup: str, dedup_threshold: float, api_url: str) -> dict:
+    import requests
+
+    with open(path, "rb") as f:
+        response = requests.post(
+            f"{api_url}/questions/import",
+            params={"format": fmt, "skip_duplicates": skip_duplicates, "dedup": dedup, "dedup_threshold": dedup_threshold},
+            data=f,
+        )
+    response.raise_for_status()
+    return response.json()
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import questions from JSONL or CSV")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Defaults to the file extension")
+    parser.add_argument("--skip-duplicates", action="store_true", help="Skip rows identical to an existing question")
+    parser.add_argument("--dedup", choices=["off", "warn", "reject", "merge"],
+                        help="Near-duplicate policy (defaults to QUESTION_DEDUP_POLICY)")
+    parser.add_argument("--dedup-threshold", type=float, help="Near-duplicate similarity (defaults to QUESTION_DEDUP_THRESHOLD)")
+    parser.add_argument("--api", metavar="URL", help="Upload to a running API instead of writing the database directly")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    size_mb = os.path.getsize(args.path) / 1024 / 1024
+    print(f"🚀 Importing {args.path} ({size_mb:.1f} MB, {fmt})...")
+
+    start = time.perf_counter()
+    if args.api:
+        report = import_remote(args.path, fmt, args.skip_duplicates, args.dedup, args.dedup_threshold, args.api)
+    else:
+        report = import_local(args.path, fmt, args.skip_duplicates, args.dedup, args.dedup_threshold)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Inserted {report['inserted']} questions in {elapsed:.2f}s ({report['inserted'] / max(elapsed, 1e-9):.0f} rows/s)")
+    if report["duplicates_skipped"]:
+        print(f"⏭️  Skipped {report['duplicates_skipped']} duplicates")
+    if report["near_duplicates"]:
+        print(f"👯 {report['near_duplicates']} near duplicates:")
+        for row in report["near_duplicate_rows"][:20]:
+            matches = ", ".join(
+                f"question {m['question_id']}" if "question_id" in m else f"line {m['line']}" for m in row["matches"]
+            )
+            print(f"   line {row['line']} ({row['action']}): {matches}")
+    if report["failed"]:
+        print(f"❌ {report['failed']} rows failed:")
+        for error in report["errors"][:20]:
+            print(f"   line {error['line']}: {error['error']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Script to rename evaluations stored under "provider/auto" to the model "auto"
+resolves to (LLMService.DEFAULT_MODELS), which is what every write path
+records now, so one model isn't split across two names. The rollups, score
+sketches and cold files keyed by the old names are rebuilt afterwards.
+
+"auto" resolves to today's defaults; rows written while a provider had a
+different default are attributed to the current one.
+
+Usage:
+    python migrate_model_names.py             # migrate
+    python migrate_model_names.py --dry-run   # only report what would change
+"""
+import argparse
+from sqlalchemy import text
+from app.models import SessionLocal, init_db
+from app.services.columnar_store import cold_store
+from app.services.llm_service import LLMService
+from app.services.rollup_service import rebuild_rollups
+
+def main():
+    parser = argparse.ArgumentParser(description='Rename "provider/auto" evaluations to the resolved model')
+    parser.add_argument("--dry-run", action="store_true", help="Only report the rows that would be renamed")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        counts = db.execute(text(
+            "SELECT model_name, COUNT(*) FROM evaluations WHERE model_name LIKE '%/auto' GROUP BY model_name"
+        )).all()
+        if not counts:
+            print('✅ No "/auto" evaluations to migrate')
+            return
+        renames = {}
+        for name, count in counts:
+            provider = name[: -len("/auto")]
+            renames[name] = f"{provider}/{LLMService.DEFAULT_MODELS.get(provider, 'gpt-4o')}"
+            print(f"🔄 {name} -> {renames[name]}: {count} evaluations")
+        if args.dry_run:
+            return
+
+        for old, new in renames.items():
+            db.execute(text("UPDATE evaluations SET model_name = :new WHERE model_name = :old"), {"old": old, "new": new})
+        # Also commits the renames
+        rebuild_rollups(db)
+        print("✅ Evaluations renamed and rollups rebuilt")
+
+        if cold_store.manifest()["files"]:
+            result = cold_store.rebuild(db)
+            print(f"✅ Cold files rewritten: {result['rows']} rows in {result['files']} files")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
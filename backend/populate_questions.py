@@ -1,6 +1,7 @@
 """
 Script to populate the database with advanced/challenging questions
 """
+import json
 import requests
 
 API_URL = "http://localhost:8001"
@@ -83,19 +84,31 @@ questions = [
 def populate_questions():
     print("🚀 Populating database with advanced questions...\n")
     
-    success_count = 0
-    for i, q in enumerate(questions, 1):
-        try:
-            response = requests.post(f"{API_URL}/questions/", json=q)
-            if response.status_code == 200:
-                print(f"✅ Added Q{i}: {q['subject']} - {q['text'][:50]}...")
-                success_count += 1
-            else:
-                print(f"❌ Failed Q{i}: {response.status_code}")
-        except Exception as e:
-            print(f"❌ Error adding Q{i}: {e}")
+    # Send the whole bank in one bulk request instead of one POST per question
+    body = "\n".join(json.dumps(q) for q in questions)
+    try:
+        response = requests.post(
+            f"{API_URL}/questions/import",
+            params={"format": "jsonl", "skip_duplicates": True},
+            data=body.encode("utf-8"),
+        )
+    except Exception as e:
+        print(f"❌ Error importing questions: {e}")
+        return
+
+    if response.status_code != 200:
+        print(f"❌ Import failed: {response.status_code}")
+        return
+
+    report = response.json()
+    for error in report["errors"]:
+        print(f"❌ Failed Q{error['line']}: {error['error']}")
+    if report["duplicates_skipped"]:
+        print(f"⏭️  Skipped {report['duplicates_skipped']} questions that already exist")
+    for row in report.get("near_duplicate_rows", []):
+        print(f"👯 Q{row['line']} is a near duplicate ({row['action']})")
     
-    print(f"\n✅ Successfully added {success_count}/{len(questions)} questions!")
+    print(f"\n✅ Successfully added {report['inserted']}/{len(questions)} questions!")
 
 if __name__ == "__main__":
     populate_questions()
@@ -0,0 +1,37 @@
+"""
+Script to rebuild the analytics rollup tables from the raw evaluations table
+and verify them against it.
+
+Usage:
+    python rebuild_rollups.py            # rebuild, then verify
+    python rebuild_rollups.py --verify   # verify only
+"""
+import argparse
+import sys
+from app.models import SessionLocal, init_db
+from app.services.rollup_service import rebuild_rollups, verify_rollups
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild and verify analytics rollups")
+    parser.add_argument("--verify", action="store_true", help="Only verify, don't rebuild")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if not args.verify:
+            print("🔄 Rebuilding analytics rollups...")
+            rebuild_rollups(db)
+
+        problems = verify_rollups(db)
+        if problems:
+            print(f"❌ {len(problems)} rollup mismatches:")
+            for problem in problems[:50]:
+                print(f"   {problem}")
+            sys.exit(1)
+        print("✅ Rollups match the evaluations table")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Shared test setup: the app reads its database and cache paths from the
+environment at import time, so point them at a temporary directory before
+anything from app is imported, and never talk to a real provider.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="truth_meter_tests_")
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+os.environ["TRUTH_METER_DB"] = os.path.join(_tmp, "test.db")
+os.environ["JUDGE_CACHE_PATH"] = os.path.join(_tmp, "judge_cache.db")
+os.environ["ANALYTICS_COLD_DIR"] = os.path.join(_tmp, "cold_storage")
+for key in ("ANTHROPIC_API_KEY", "ANTHROPIC_BASE_URL", "GOOGLE_API_KEY", "GROQ_API_KEY", "JUDGE_REFERENCE_TIER"):
+    os.environ.pop(key, None)
+os.environ["OPENAI_API_KEY"] = "test"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import text
+
+from app.models import Base, SessionLocal, init_db
+from app.routers import evaluations
+from app.services import judge_cache
+from app.services.judge_cache import JudgeCache
+
+# Fail fast if app was imported before the environment above was set
+assert judge_cache.JUDGE_CACHE_PATH.startswith(_tmp), judge_cache.JUDGE_CACHE_PATH
+
+@pytest.fixture(autouse=True)
+def isolated_judge_cache(tmp_path, monkeypatch):
+    """Give every test an empty judge cache, so no test sees another's judgements."""
+    monkeypatch.setattr(evaluations.eval_service, "judge_cache", JudgeCache(path=str(tmp_path / "judge_cache.db")))
+
+@pytest.fixture
+def db():
+    """A session on an empty database; every table is cleared afterwards."""
+    init_db()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(text(f"DELETE FROM {table.name}"))
+        session.commit()
+        session.close()
@@ -0,0 +1,44 @@
+import asyncio
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import analytics
+from app.services.analytics_cache import AnalyticsCache
+
+def test_cache_evicts_least_recently_used():
+    cache = AnalyticsCache(max_entries=2)
+
+    async def run():
+        async def value(v):
+            return v
+        for key in ("a", "b"):
+            await cache.get_or_compute(1, key, lambda key=key: value(key))
+        await cache.get_or_compute(1, "a", lambda: value("stale"))
+        await cache.get_or_compute(1, "c", lambda: value("c"))
+        # "b" was least recently used, so it was computed again
+        return await cache.get_or_compute(1, "b", lambda: value("b2"))
+
+    assert asyncio.run(run()) == "b2"
+    assert cache.stats["evictions"] == 2
+    assert cache.get_stats()["entries"] == 2
+
+def test_open_ended_range_etag_changes_with_the_hour(db, monkeypatch):
+    app = FastAPI()
+    app.include_router(analytics.router)
+    client = TestClient(app)
+    monkeypatch.setattr(analytics, "analytics_cache", AnalyticsCache())
+
+    monkeypatch.setattr(analytics, "time", SimpleNamespace(time=lambda: 1_700_000_000.0))
+    first = client.get("/analytics/score-distribution")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert client.get("/analytics/score-distribution", headers={"If-None-Match": etag}).status_code == 304
+
+    # An hour later with no new data: the default end moved, so the old body is stale
+    monkeypatch.setattr(analytics, "time", SimpleNamespace(time=lambda: 1_700_003_600.0))
+    later = client.get("/analytics/score-distribution", headers={"If-None-Match": etag})
+    assert later.status_code == 200
+    assert later.headers["etag"] != etag
+    assert later.json()["end"] != first.json()["end"]
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from app.models import AsyncSessionLocal, BatchRunCreate, BatchRunDB, EvaluationDB, ModelTarget, QuestionDB
+from app.services.batch_service import BatchRunner
+
+SCORES = {"accuracy_score": 80, "clarity_score": 70, "completeness_score": 60, "reasoning": "ok"}
+
+class FakeLLM:
+    async def get_response_with_usage(self, provider, model_name, prompt):
+        return f"answer to {prompt}", None, f"{provider}/{model_name}"
+
+class ProgressWatchingJudge:
+    """Holds the second question's judgement until the first question's progress is saved."""
+
+    def __init__(self, db):
+        self.db = db
+        self.progress_seen = None
+
+    def _completed(self):
+        self.db.expire_all()
+        return self.db.query(BatchRunDB.completed).scalar()
+
+    async def evaluate_responses(self, question, reference, responses):
+        if question == "second":
+            deadline = time.monotonic() + 2
+            while not self._completed() and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            self.progress_seen = self._completed()
+        return [dict(SCORES) for _ in responses]
+
+def test_progress_is_saved_per_question(db):
+    db.add_all([QuestionDB(text="first", subject="Math", reference_answer="a"),
+                QuestionDB(text="second", subject="Math", reference_answer="b")])
+    db.commit()
+    judge = ProgressWatchingJudge(db)
+    runner = BatchRunner(FakeLLM(), judge)
+    request = BatchRunCreate(models=[ModelTarget(provider="openai", model_name="gpt-4o")])
+
+    async def run():
+        async with AsyncSessionLocal() as session:
+            questions = await runner.resolve_questions(session, request)
+            batch = await runner.create_run(session, len(questions))
+        await runner.start(batch.id, questions, request)
+        return batch.id
+
+    run_id = asyncio.run(run())
+    db.expire_all()
+    run = db.get(BatchRunDB, run_id)
+    # The first question's result was reported well before FLUSH_SIZE evaluations were pending
+    assert judge.progress_seen == 1
+    assert (run.status, run.completed, run.failed) == ("completed", 2, 0)
+    assert db.query(EvaluationDB).count() == 2
+
+def test_interrupted_runs_are_marked_failed(db):
+    now = time.time()
+    db.add_all([
+        BatchRunDB(id="stale", status="running", total=4, completed=1, failed=0, updated_at=now - 3600),
+        BatchRunDB(id="before-upgrade", status="pending", total=4, completed=0, failed=0),
+        BatchRunDB(id="live", status="running", total=4, completed=1, failed=0, updated_at=now),
+        BatchRunDB(id="done", status="completed", total=4, completed=4, failed=0, updated_at=now - 3600),
+    ])
+    db.commit()
+    # Runs started before updated_at existed have none
+    db.execute(text("UPDATE batch_runs SET updated_at = NULL WHERE id = 'before-upgrade'"))
+    db.commit()
+
+    assert asyncio.run(BatchRunner(FakeLLM(), None).fail_interrupted_runs(stale_seconds=600)) == 2
+    db.expire_all()
+    statuses = {run.id: run.status for run in db.query(BatchRunDB)}
+    assert statuses == {"stale": "failed", "before-upgrade": "failed", "live": "running", "done": "completed"}
+    assert "Interrupted" in db.get(BatchRunDB, "stale").error
+
+class BrokenJudge:
+    """Returns a malformed judgement for "bad" and holds every other question until cancelled."""
+
+    def __init__(self):
+        self.cancelled = 0
+
+    async def evaluate_responses(self, question, reference, responses):
+        if question == "bad":
+            return [{} for _ in responses]
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return [dict(SCORES) for _ in responses]
+
+def test_failing_question_cancels_the_rest_of_the_run(db):
+    db.add_all([QuestionDB(text="bad", subject="Math", reference_answer="a"),
+                QuestionDB(text="slow", subject="Math", reference_answer="b"),
+                QuestionDB(text="slower", subject="Math", reference_answer="c")])
+    db.commit()
+    judge = BrokenJudge()
+    runner = BatchRunner(FakeLLM(), judge)
+    request = BatchRunCreate(models=[ModelTarget(provider="openai", model_name="gpt-4o")])
+
+    async def run():
+        async with AsyncSessionLocal() as session:
+            questions = await runner.resolve_questions(session, request)
+            batch = await runner.create_run(session, len(questions))
+        await asyncio.wait_for(runner.start(batch.id, questions, request), 2)
+        # Counted before asyncio.run cancels whatever is still pending
+        return batch.id, judge.cancelled
+
+    run_id, cancelled = asyncio.run(run())
+    db.expire_all()
+    assert db.get(BatchRunDB, run_id).status == "failed"
+    assert cancelled == 2
+    assert db.query(EvaluationDB).count() == 0
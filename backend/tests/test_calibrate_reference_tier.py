@@ -0,0 +1,22 @@
+from calibrate_reference_tier import THRESHOLDS, calibrate
+from app.services import reference_scorer
+
+ROWS = [
+    # (reference answer, response, judge accuracy)
+    ("The mitochondria is the powerhouse of the cell.", "The mitochondria is the powerhouse of the cell.", 95.0),
+    ("Paris is the capital of France.", "Paris is the capital of France.", 90.0),
+    ("Paris is the capital of France.", "Lyon, probably.", 20.0),
+    ("Water boils at 100 degrees Celsius at sea level.", "", 0.0),
+]
+
+def test_calibrate_runs_with_the_tier_off():
+    # The default: the tier is off until calibration says it's safe to turn on
+    assert reference_scorer.JUDGE_REFERENCE_TIER == "off"
+    report = calibrate(ROWS, pass_mark=80, fail_mark=50)
+
+    assert (report["evaluations"], report["rejected"], report["reject_agreement"]) == (4, 1, 1.0)
+    assert [row["threshold"] for row in report["threshold_sweep"]] == THRESHOLDS
+    loosest = report["threshold_sweep"][0]
+    assert loosest["accepted"] == 2
+    assert loosest["precision"] == 1.0
+    assert loosest["accuracy_mae"] is not None
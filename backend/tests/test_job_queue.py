@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.models import AsyncSessionLocal, EvaluationDB, EvaluationJobDB, QuestionDB
+from app.routers import evaluations
+from app.services import job_queue as job_queue_module
+from app.services.job_queue import JobQueue
+
+SCORES = {"accuracy_score": 90, "clarity_score": 80, "completeness_score": 70, "reasoning": "ok"}
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def model_label(self, provider, model_name):
+        return f"{provider}/{'gpt-4o' if model_name == 'auto' else model_name}"
+
+    async def get_response_with_usage(self, provider, model_name, prompt):
+        self.calls += 1
+        return "4", None, self.model_label(provider, model_name)
+
+class FlakyJudge:
+    """Fails the first `failures` judgements, then scores."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+
+    async def evaluate_response(self, question, reference, response):
+        if self.failures:
+            self.failures -= 1
+            return {**SCORES, "reasoning": "judge unavailable", "failed": True}
+        return dict(SCORES)
+
+def _question(db):
+    question = QuestionDB(text="What is 2+2?", subject="Math", reference_answer="4")
+    db.add(question)
+    db.commit()
+    return question.id
+
+def _run(queue, job_ids, timeout=5):
+    async def run():
+        await queue.start()
+        try:
+            return [await queue.wait_for(job_id, timeout) for job_id in job_ids]
+        finally:
+            await queue.stop()
+    return asyncio.run(run())
+
+async def _enqueue(queue, question_id, provider="openai", model_name="auto"):
+    async with AsyncSessionLocal() as session:
+        return (await queue.enqueue(session, question_id, provider, model_name)).id
+
+def test_job_stores_one_evaluation_under_the_resolved_model(db):
+    question_id = _question(db)
+    queue = JobQueue(FakeLLM(), FlakyJudge(), workers=2, poll_seconds=0.05)
+    job_id = asyncio.run(_enqueue(queue, question_id))
+
+    [job] = _run(queue, [job_id])
+    assert job.status == "succeeded"
+    evaluation = db.get(EvaluationDB, job.evaluation_id)
+    assert (evaluation.model_name, evaluation.accuracy_score) == ("openai/gpt-4o", 90)
+    assert db.query(EvaluationDB).count() == 1
+
+def test_retry_reuses_the_stored_answer(db, monkeypatch):
+    monkeypatch.setattr(job_queue_module, "JOB_RETRY_BASE_SECONDS", 0.01)
+    question_id = _question(db)
+    llm = FakeLLM()
+    queue = JobQueue(llm, FlakyJudge(failures=1), workers=1, poll_seconds=0.05)
+    job_id = asyncio.run(_enqueue(queue, question_id))
+
+    [job] = _run(queue, [job_id])
+    assert (job.status, job.attempts) == ("succeeded", 2)
+    # The candidate was only asked once; the retry judged the answer saved on the job
+    assert llm.calls == 1
+
+def test_exhausted_attempts_fail_the_job(db, monkeypatch):
+    monkeypatch.setattr(job_queue_module, "JOB_RETRY_BASE_SECONDS", 0.01)
+    question_id = _question(db)
+    queue = JobQueue(FakeLLM(), FlakyJudge(failures=5), workers=1, poll_seconds=0.05, max_attempts=2)
+    job_id = asyncio.run(_enqueue(queue, question_id))
+
+    [job] = _run(queue, [job_id])
+    assert (job.status, job.attempts, job.error) == ("failed", 2, "judge unavailable")
+    assert db.query(EvaluationDB).count() == 0
+
+def test_expired_lease_is_taken_over(db):
+    question_id = _question(db)
+    now = time.time()
+    # Claimed by a process that died: its lease ran out
+    db.add(EvaluationJobDB(question_id=question_id, provider="openai", model_name="gpt-4o", status="running",
+                           attempts=1, max_attempts=3, lease_owner="dead", lease_expires_at=now - 1,
+                           available_at=now - 60, created_at=now - 60, updated_at=now - 60))
+    db.commit()
+    job_id = db.query(EvaluationJobDB.id).scalar()
+
+    [job] = _run(JobQueue(FakeLLM(), FlakyJudge(), workers=1, poll_seconds=0.05), [job_id])
+    assert (job.status, job.attempts) == ("succeeded", 2)
+    assert job.lease_owner is None
+
+def test_run_without_waiting_returns_the_queued_job(db, monkeypatch):
+    question_id = _question(db)
+    monkeypatch.setattr(evaluations, "job_queue", JobQueue(FakeLLM(), FlakyJudge()))
+    app = FastAPI()
+    app.include_router(evaluations.router)
+
+    response = TestClient(app).post(f"/evaluations/run/{question_id}", params={"model_provider": "openai", "model_name": "auto"})
+    assert response.status_code == 202
+    body = response.json()
+    assert (body["question_id"], body["status"], body["attempts"]) == (question_id, "queued", 0)
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(db):
+    question_id = _question(db)
+    now = time.time()
+    db.add(EvaluationJobDB(question_id=question_id, provider="openai", model_name="gpt-4o", status="running",
+                           attempts=3, max_attempts=3, lease_owner="dead", lease_expires_at=now - 1,
+                           available_at=now - 60, created_at=now - 60, updated_at=now - 60))
+    db.commit()
+    job_id = db.query(EvaluationJobDB.id).scalar()
+    llm = FakeLLM()
+
+    [job] = _run(JobQueue(llm, FlakyJudge(), workers=1, poll_seconds=0.05), [job_id])
+    assert (job.status, job.attempts, job.lease_owner) == ("failed", 3, None)
+    assert job.error == job_queue_module.LEASE_EXHAUSTED_ERROR
+    assert llm.calls == 0
+
+def test_purge_deletes_only_old_finished_jobs(db):
+    question_id = _question(db)
+    now = time.time()
+    for status, age in [("succeeded", 3600), ("failed", 3600), ("succeeded", 10), ("queued", 3600), ("running", 3600)]:
+        db.add(EvaluationJobDB(question_id=question_id, provider="openai", model_name="gpt-4o", status=status,
+                               attempts=1, max_attempts=3, lease_expires_at=now + 60,
+                               available_at=now, created_at=now - age, updated_at=now - age))
+    db.commit()
+
+    queue = JobQueue(FakeLLM(), FlakyJudge(), retention_seconds=60)
+    assert asyncio.run(queue.purge_finished()) == 2
+    remaining = sorted((job.status, round(now - job.updated_at)) for job in db.query(EvaluationJobDB))
+    assert remaining == [("queued", 3600), ("running", 3600), ("succeeded", 10)]
@@ -0,0 +1,55 @@
+import asyncio
+import sqlite3
+
+from app.services.judge_cache import JudgeCache
+
+RESULT = {"accuracy_score": 90, "clarity_score": 80, "completeness_score": 70, "reasoning": "ok"}
+
+def _last_used(path, key):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT last_used FROM judge_cache WHERE key = ?", (key,)).fetchone()[0]
+
+def test_async_round_trip_through_disk(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    async def run():
+        await JudgeCache(path).aset("k", RESULT)
+        # A fresh instance has an empty memory tier, so this is read from SQLite
+        cache = JudgeCache(path)
+        first = await cache.aget("k")
+        second = await cache.aget("k")
+        return cache, first, second, await cache.aget("missing")
+
+    cache, first, second, missing = asyncio.run(run())
+    assert first == second == RESULT
+    assert missing is None
+    assert (cache.stats["disk_hits"], cache.stats["memory_hits"], cache.stats["misses"]) == (1, 1, 1)
+
+def test_disk_hits_touch_last_used_in_batches(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = JudgeCache(path)
+    for key in ("a", "b", "c"):
+        writer.set(key, RESULT)
+    written = _last_used(path, "a")
+
+    cache = JudgeCache(path, memory_entries=0)
+    cache.TOUCH_FLUSH_EVERY = 3
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    assert _last_used(path, "a") == written
+
+    cache.get("c")
+    assert _last_used(path, "a") > written
+
+def test_pending_touches_are_flushed_before_eviction(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = JudgeCache(path, max_entries=2, memory_entries=0)
+    cache.EVICT_EVERY = 3
+    cache.set("old", RESULT)
+    cache.set("newer", RESULT)
+    # Reading "old" makes it the most recently used, so "newer" is evicted instead
+    cache.get("old")
+    cache.set("newest", RESULT)
+    assert cache.get("old") == RESULT
+    assert cache.get("newer") is None
@@ -0,0 +1,39 @@
+import numpy as np
+
+from app.services.leaderboard import ScoreMatrix, compute_leaderboard
+
+def _matrix(columns):
+    """A ScoreMatrix from per-model score lists (None where a question wasn't answered)."""
+    models = list(columns)
+    means = np.array([[np.nan if v is None else v for v in row] for row in zip(*columns.values())], dtype=float)
+    return ScoreMatrix(models, np.arange(len(means)), means, (~np.isnan(means)).sum(axis=0))
+
+def test_clearly_better_model_is_ranked_first_and_significant():
+    rng = np.random.default_rng(1)
+    strong = list(rng.normal(80, 5, 40))
+    weak = list(rng.normal(50, 5, 40))
+    result = compute_leaderboard(_matrix({"weak": weak, "strong": strong}), resamples=500, min_questions=10)
+
+    first, second = result["models"]
+    assert (first["model"], first["rank"], second["rank"]) == ("strong", 1, 2)
+    assert first["ci_low"] <= first["mean"] <= first["ci_high"]
+    assert first["significantly_better_than"] == ["weak"]
+    assert result["pairs"][0]["shared_questions"] == 40
+
+def test_models_below_min_questions_are_unranked():
+    scores = [70.0] * 30
+    # One perfect answer would otherwise top the board with a zero-width interval
+    lucky = [100.0] + [None] * 29
+    result = compute_leaderboard(_matrix({"steady": scores, "lucky": lucky}), resamples=200, min_questions=20)
+
+    steady, unranked = result["models"]
+    assert (steady["model"], steady["rank"]) == ("steady", 1)
+    assert unranked["model"] == "lucky"
+    assert (unranked["rank"], unranked["ci_low"], unranked["ci_high"]) == (None, None, None)
+    assert unranked["questions"] == 1 and unranked["mean"] == 100.0
+    assert result["pairs"] == []
+    assert steady["significantly_better_than"] == []
+
+def test_empty_matrix():
+    result = compute_leaderboard(_matrix({}), resamples=100)
+    assert result["models"] == [] and result["questions"] == 0
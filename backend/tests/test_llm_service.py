@@ -0,0 +1,103 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import llm_service as llm_module
+from app.services.llm_service import LLMService
+from app.services.rate_limiter import LLMCallError, RateLimiterRegistry
+from app.services.resilience import CircuitBreakerRegistry, FailoverRoutes
+
+class FakeStreams(LLMService):
+    """Streams scripted per provider: a list of events, or an exception to raise before the first one."""
+
+    def __init__(self, scripts, routes):
+        super().__init__(rate_limiter_registry=RateLimiterRegistry(), max_retries=0,
+                         breaker_registry=CircuitBreakerRegistry(), failover=FailoverRoutes(routes))
+        self.deepseek_key = "test"
+        self.scripts = scripts
+        self.calls = []
+
+    async def _stream_events(self, model_provider, model_name, prompt):
+        self.calls.append((model_provider, model_name))
+        script = self.scripts[model_provider]
+        if isinstance(script, Exception):
+            raise script
+        for event in script:
+            if event == "hang":
+                await asyncio.sleep(10)
+            yield event
+
+async def _collect(service, provider, model, usage):
+    return [chunk async for chunk in service.stream_response(provider, model, "question?", usage)]
+
+def test_model_label_resolves_auto():
+    service = LLMService()
+    assert service.model_label("openai", "auto") == "openai/gpt-4o"
+    assert service.model_label("deepseek", "") == "deepseek/deepseek-chat"
+    assert service.model_label("openai", "gpt-4o-mini") == "openai/gpt-4o-mini"
+
+def test_stream_fails_over_before_the_first_chunk():
+    service = FakeStreams(
+        {"openai": ConnectionError("down"), "deepseek": [("text", "Par"), ("text", "is"), ("usage", (3, 2))]},
+        {"openai": [("deepseek", "deepseek-chat")]},
+    )
+    usage = {}
+    assert asyncio.run(_collect(service, "openai", "auto", usage)) == ["Par", "is"]
+    assert service.calls == [("openai", "gpt-4o"), ("deepseek", "deepseek-chat")]
+    assert (usage["provider"], usage["model_name"]) == ("deepseek", "deepseek-chat")
+    assert service.resilience_stats["failovers"] == 1
+
+def test_stream_times_out_each_wait(monkeypatch):
+    monkeypatch.setattr(llm_module, "LLM_REQUEST_TIMEOUT_SECONDS", 0.05)
+    service = FakeStreams(
+        {"openai": ["hang"], "deepseek": [("text", "ok")]},
+        {"openai": [("deepseek", "deepseek-chat")]},
+    )
+    assert asyncio.run(_collect(service, "openai", "gpt-4o", {})) == ["ok"]
+
+def test_stream_broken_after_first_chunk_is_not_failed_over(monkeypatch):
+    monkeypatch.setattr(llm_module, "LLM_REQUEST_TIMEOUT_SECONDS", 0.05)
+    service = FakeStreams(
+        {"openai": [("text", "Par"), "hang"], "deepseek": [("text", "ok")]},
+        {"openai": [("deepseek", "deepseek-chat")]},
+    )
+    with pytest.raises(LLMCallError):
+        asyncio.run(_collect(service, "openai", "gpt-4o", {}))
+    assert service.calls == [("openai", "gpt-4o")]
+
+def test_failed_stream_attempt_refunds_its_reservation():
+    service = FakeStreams(
+        {"openai": httpx.ConnectError("reset"), "deepseek": [("text", "ok")]},
+        {"openai": [("deepseek", "deepseek-chat")]},
+    )
+    limiter = service.rate_limiters.for_provider("openai")
+    before = limiter.tokens.level
+    assert asyncio.run(_collect(service, "openai", "gpt-4o", {})) == ["ok"]
+    assert limiter.tokens.level == pytest.approx(before, abs=5)
+
+class BlockingGeminiModel:
+    """The REST transport's blocking client: generate_content(stream=True) returns a plain iterator."""
+
+    def __init__(self):
+        self.threads = set()
+
+    def generate_content(self, prompt, stream=False):
+        self.threads.add(threading.get_ident())
+        return iter([SimpleNamespace(text="Par", usage_metadata=None),
+                     SimpleNamespace(text="is", usage_metadata=SimpleNamespace(prompt_token_count=3, candidates_token_count=2))])
+
+    async def generate_content_async(self, prompt, stream=False):
+        raise AssertionError("the async client ignores GOOGLE_API_ENDPOINT")
+
+def test_google_stream_uses_the_rest_endpoint(monkeypatch):
+    monkeypatch.setattr(llm_module, "GOOGLE_API_ENDPOINT", "http://127.0.0.1:1")
+    service = LLMService(rate_limiter_registry=RateLimiterRegistry(), breaker_registry=CircuitBreakerRegistry())
+    service.google_key = "test"
+    model = service._google_models["gemini-2.5-flash"] = BlockingGeminiModel()
+    usage = {}
+    assert asyncio.run(_collect(service, "google", "gemini-2.5-flash", usage)) == ["Par", "is"]
+    assert (usage["prompt_tokens"], usage["completion_tokens"]) == (3, 2)
+    assert threading.get_ident() not in model.threads
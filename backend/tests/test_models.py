@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app import models
+
+@pytest.fixture
+def old_database(tmp_path, monkeypatch):
+    """A database created by the current models, for tests to strip columns from."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    monkeypatch.setattr(models, "engine", engine)
+    models.init_db()
+    yield engine
+    engine.dispose()
+
+def _columns(engine, table):
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+def test_init_db_adds_missing_nullable_columns(old_database):
+    with old_database.begin() as conn:
+        conn.execute(text("ALTER TABLE batch_runs DROP COLUMN updated_at"))
+
+    models.init_db()
+    assert "updated_at" in _columns(old_database, "batch_runs")
+
+def test_init_db_refuses_not_null_columns_without_a_server_default(old_database):
+    with old_database.begin() as conn:
+        conn.execute(text("ALTER TABLE batch_runs DROP COLUMN updated_at"))
+        conn.execute(text("ALTER TABLE evaluation_jobs DROP COLUMN max_attempts"))
+
+    with pytest.raises(RuntimeError, match="evaluation_jobs.max_attempts"):
+        models.init_db()
+    # The columns that can be added still are
+    assert "updated_at" in _columns(old_database, "batch_runs")
+    assert "max_attempts" not in _columns(old_database, "evaluation_jobs")
@@ -0,0 +1,87 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.models import QuestionDB
+from app.routers import questions
+from app.services import near_duplicates
+from app.services.near_duplicates import NearDuplicateIndex, lsh_bands, signature, signature_bytes
+
+PHOTOSYNTHESIS = ("What process do plants use to turn sunlight, water and carbon dioxide into glucose?",
+                  "Photosynthesis, which takes place in the chloroplasts.")
+# The same question with different punctuation, case and a one-word change
+REWORDED = ("what process do plants use to turn sunlight, water, and carbon dioxide into glucose",
+            "Photosynthesis which takes place in the chloroplasts")
+UNRELATED = ("Who wrote the novel Pride and Prejudice, published in 1813?", "Jane Austen.")
+
+def _similarity(a, b):
+    return float((signature(*a) == signature(*b)).mean())
+
+def _store(db, *pairs, with_signature=True):
+    rows = [QuestionDB(text=t, subject="Science", reference_answer=a,
+                       minhash=signature_bytes(t, a) if with_signature else None) for t, a in pairs]
+    db.add_all(rows)
+    db.commit()
+    return [row.id for row in rows]
+
+def test_signature_similarity_tracks_the_text():
+    assert _similarity(PHOTOSYNTHESIS, PHOTOSYNTHESIS) == 1.0
+    assert _similarity(PHOTOSYNTHESIS, REWORDED) >= 0.8
+    assert _similarity(PHOTOSYNTHESIS, UNRELATED) < 0.2
+    # Question text and reference answer are shingled separately
+    assert _similarity(("Paris", "France"), ("France", "Paris")) < 0.5
+
+def test_bands_meet_the_recall_target():
+    bands, rows = lsh_bands(0.8)
+    assert bands * rows <= near_duplicates.NUM_PERM
+    assert 1 - (1 - 0.8 ** rows) ** bands >= near_duplicates.CANDIDATE_RECALL
+
+def test_find_backfills_and_matches(db):
+    original, _ = _store(db, PHOTOSYNTHESIS, UNRELATED, with_signature=False)
+    index = NearDuplicateIndex(0.8)
+    index.sync(db, backfill=True)
+    assert db.execute(text("SELECT COUNT(*) FROM questions WHERE minhash IS NULL")).scalar() == 0
+
+    [(match, similarity)] = index.find(signature_bytes(*REWORDED))
+    assert match == original and similarity >= 0.8
+    assert index.find(signature_bytes(*REWORDED), exclude=original) == []
+
+    # Added after the bands were sorted: found through the pending buckets
+    [reworded] = _store(db, REWORDED)
+    index.add([reworded], [signature_bytes(*REWORDED)])
+    assert [m for m, _ in index.find(signature_bytes(*PHOTOSYNTHESIS))] == [original, reworded]
+
+    index.remove(original)
+    assert [m for m, _ in index.find(signature_bytes(*PHOTOSYNTHESIS))] == [reworded]
+
+def test_clusters(db):
+    original, reworded, _ = _store(db, PHOTOSYNTHESIS, REWORDED, UNRELATED)
+    index = NearDuplicateIndex(0.8)
+    index.sync(db)
+    [cluster] = index.clusters()
+    assert [question_id for question_id, _ in cluster] == [original, reworded]
+    assert cluster[0][1] == 1.0
+
+def test_create_question_policies(db, monkeypatch):
+    monkeypatch.setattr(questions, "near_duplicate_index", NearDuplicateIndex(0.8))
+    app = FastAPI()
+    app.include_router(questions.router)
+    client = TestClient(app)
+    body = lambda pair: {"text": pair[0], "subject": "Science", "reference_answer": pair[1], "difficulty": "Easy"}
+
+    created = client.post("/questions/", json=body(PHOTOSYNTHESIS)).json()
+    assert created["near_duplicates"] == []
+
+    rejected = client.post("/questions/?dedup=reject", json=body(REWORDED))
+    assert rejected.status_code == 409
+    assert rejected.json()["detail"]["near_duplicates"][0]["question_id"] == created["id"]
+
+    merged = client.post("/questions/?dedup=merge", json=body(REWORDED)).json()
+    assert (merged["id"], merged["merged"]) == (created["id"], True)
+
+    warned = client.post("/questions/?dedup=warn", json=body(REWORDED)).json()
+    assert warned["id"] != created["id"]
+    assert [m["question_id"] for m in warned["near_duplicates"]] == [created["id"]]
+    assert db.query(QuestionDB).count() == 2
+
+    assert client.post("/questions/?dedup=sometimes", json=body(UNRELATED)).status_code == 400
@@ -0,0 +1,43 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.rate_limiter import LLMCallError, ProviderRateLimiter, call_with_retries
+from app.services.resilience import CircuitBreakerRegistry
+
+def _limiter():
+    return ProviderRateLimiter("openai", requests_per_minute=600, tokens_per_minute=100_000)
+
+def test_failed_attempts_refund_their_reservation(monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    limiter = _limiter()
+    attempts = []
+
+    async def flaky():
+        attempts.append(limiter.tokens.level)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("reset")
+        return "ok", (10, 5), None
+
+    result = asyncio.run(call_with_retries("openai", "gpt-4o", "hello", flaky, limiter=limiter, max_retries=2,
+                                           breaker=CircuitBreakerRegistry().for_provider("openai")))
+    assert result == ("ok", (10, 5))
+    # Every attempt saw the same budget: the failed ones gave their reservation back
+    assert attempts[0] == pytest.approx(attempts[1], abs=1) == pytest.approx(attempts[2], abs=1)
+    assert limiter.tokens.level == pytest.approx(100_000 - 15, abs=5)
+
+def test_exhausted_retries_leave_no_reservation(monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    limiter = _limiter()
+
+    async def down():
+        raise httpx.ConnectError("reset")
+
+    with pytest.raises(LLMCallError):
+        asyncio.run(call_with_retries("openai", "gpt-4o", "hello", down, limiter=limiter, max_retries=1,
+                                      breaker=CircuitBreakerRegistry().for_provider("openai")))
+    assert limiter.tokens.level == pytest.approx(100_000, abs=5)
+
+async def _no_sleep(_):
+    return None
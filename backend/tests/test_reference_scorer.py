@@ -0,0 +1,45 @@
+import importlib
+
+import pytest
+
+from app.services import reference_scorer
+from app.services.reference_scorer import ReferenceScorer
+
+scorer = ReferenceScorer(enabled=True)
+
+@pytest.mark.parametrize("reference, response", [
+    ("The Earth orbits the Sun.", "The Sun orbits the Earth."),
+    ("Water boils at 100 degrees Celsius at sea level.", "Water does not boil at 100 degrees Celsius at sea level."),
+    ("George Washington was the first President of the United States.",
+     "George Washington was not the first President of the United States."),
+    ("4", "The answer is 5, not 4"),
+    ("4", "The answer is 5, or maybe 4"),
+])
+def test_contradicting_answers_are_not_accepted(reference, response):
+    assert scorer.assess(reference, response)["decision"] != "accept"
+
+def test_matching_answer_is_accepted():
+    reference = "Water boils at 100 degrees Celsius at sea level."
+    assessment = scorer.assess(reference, "At sea level, water boils at 100 degrees Celsius.")
+    assert assessment["negation_agrees"] and assessment["conflicting_numbers"] == 0
+    assert scorer.assess(reference, reference)["decision"] == "accept"
+
+def test_negated_reference_needs_negated_answer():
+    reference = "Bats are not blind."
+    assert scorer.assess(reference, "Bats are not blind.")["decision"] == "accept"
+    assert scorer.assess(reference, "Bats aren't blind.")["negation_agrees"]
+    assert scorer.assess(reference, "Bats are blind.")["decision"] != "accept"
+
+def test_empty_and_error_responses_are_rejected():
+    assert scorer.assess("Paris", "")["decision"] == "reject"
+    assert scorer.assess("Paris", "Error: rate limited")["decision"] == "reject"
+
+def test_tier_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("JUDGE_REFERENCE_TIER", raising=False)
+    module = importlib.reload(reference_scorer)
+    try:
+        assert module.ReferenceScorer().enabled is False
+        assessment = module.ReferenceScorer().assess("Paris", "Paris")
+        assert module.ReferenceScorer().result_for(assessment, "judge", "v") is None
+    finally:
+        importlib.reload(reference_scorer)
@@ -0,0 +1,81 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+
+from app.models import (
+    AsyncSessionLocal, BatchRunCreate, EvaluationDB, ModelRollupDB, ModelTarget, QuestionDB, SubjectRollupDB,
+)
+from app.routers import questions
+from app.services.batch_service import BatchRunner
+from app.services.evaluation_store import save_evaluation
+from app.services.rollup_service import verify_rollups
+
+class FakeLLM:
+    async def get_response_with_usage(self, provider, model_name, prompt):
+        return f"answer to {prompt}", None, f"{provider}/{model_name}"
+
+class FixedJudge:
+    async def evaluate_responses(self, question, reference, responses):
+        return [{"accuracy_score": 60, "clarity_score": 50, "completeness_score": 40, "reasoning": "ok"} for _ in responses]
+
+def _questions(db):
+    rows = [
+        QuestionDB(text="2+2?", subject="Math", difficulty="easy", reference_answer="4"),
+        QuestionDB(text="Integrate x", subject="Math", difficulty="hard", reference_answer="x^2/2"),
+        QuestionDB(text="Capital of France?", subject="Geography", difficulty="easy", reference_answer="Paris"),
+        QuestionDB(text="No subject", reference_answer="-"),
+    ]
+    db.add_all(rows)
+    db.commit()
+    return [row.id for row in rows]
+
+def _save(question_id, model_name, accuracy):
+    async def save():
+        async with AsyncSessionLocal() as session:
+            await save_evaluation(session, question_id, model_name, "answer", {
+                "accuracy_score": accuracy, "clarity_score": accuracy - 10, "completeness_score": accuracy - 20, "reasoning": "ok",
+            })
+    asyncio.run(save())
+
+def _batch(question_ids):
+    runner = BatchRunner(FakeLLM(), FixedJudge())
+    request = BatchRunCreate(question_ids=question_ids, models=[
+        ModelTarget(provider="openai", model_name="gpt-4o"), ModelTarget(provider="groq", model_name="llama"),
+    ])
+
+    async def run():
+        async with AsyncSessionLocal() as session:
+            batch_questions = await runner.resolve_questions(session, request)
+            batch = await runner.create_run(session, len(batch_questions))
+        await runner.start(batch.id, batch_questions, request)
+    asyncio.run(run())
+
+def _subject_sums(db):
+    subject = func.coalesce(QuestionDB.subject, "")
+    return {
+        row[0]: tuple(row[1:])
+        for row in db.query(subject, func.count(EvaluationDB.id), func.sum(EvaluationDB.accuracy_score))
+        .join(QuestionDB, EvaluationDB.question_id == QuestionDB.id).group_by(subject)
+    }
+
+def test_rollups_follow_single_batch_inserts_and_deletes(db):
+    easy_math, hard_math, geography, no_subject = _questions(db)
+    _save(easy_math, "openai/gpt-4o", 90)
+    _save(geography, "anthropic/claude", 70)
+    _save(no_subject, "openai/gpt-4o", 50)
+    _batch([easy_math, hard_math, geography])
+    assert db.query(EvaluationDB).count() == 9
+    assert verify_rollups(db) == []
+
+    app = FastAPI()
+    app.include_router(questions.router)
+    assert TestClient(app).delete(f"/questions/{hard_math}").status_code == 200
+    db.expire_all()
+
+    assert verify_rollups(db) == []
+    rollups = {row.subject: (row.count, row.sum_accuracy) for row in db.query(SubjectRollupDB).filter(SubjectRollupDB.count > 0)}
+    assert rollups == _subject_sums(db) == {"Math": (3, 210), "Geography": (3, 190), "": (1, 50)}
+    # Per-model rollups keep the deleted question's evaluations
+    assert db.query(ModelRollupDB.count).filter(ModelRollupDB.model_name == "groq/llama").scalar() == 3
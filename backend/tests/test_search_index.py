@@ -0,0 +1,89 @@
+from app.models import EvaluationDB, QuestionDB
+from app.services import search_index
+from app.services.search_index import SNIPPET_OPEN, ensure_search_index, match_expression, search_evaluations, search_questions
+
+def _seed(db):
+    ensure_search_index()
+    questions = [
+        QuestionDB(text="How do plants make glucose from sunlight?", subject="Biology", reference_answer="Photosynthesis", difficulty="Easy"),
+        QuestionDB(text="Which planet is closest to the sun?", subject="Astronomy", reference_answer="Mercury", difficulty="Easy"),
+        QuestionDB(text="Explain how a plant cell differs from an animal cell.", subject="Biology", reference_answer="Cell wall and chloroplasts", difficulty="Hard"),
+    ]
+    db.add_all(questions)
+    db.commit()
+    evaluations = [
+        EvaluationDB(question_id=questions[0].id, model_name="openai/gpt-4o", response_text="Plants use photosynthesis.",
+                     accuracy_score=95, clarity_score=90, completeness_score=80, reasoning="Correct and concise"),
+        EvaluationDB(question_id=questions[0].id, model_name="meta/llama", response_text="They eat sugar.",
+                     accuracy_score=10, clarity_score=60, completeness_score=20, reasoning="Wrong: plants make sugar"),
+        EvaluationDB(question_id=questions[1].id, model_name="openai/gpt-4o", response_text="Mercury.",
+                     accuracy_score=100, clarity_score=100, completeness_score=90, reasoning="Correct"),
+    ]
+    db.add_all(evaluations)
+    db.commit()
+    return [q.id for q in questions], [e.id for e in evaluations]
+
+def test_match_expression_quotes_user_input():
+    assert match_expression('plant* "cell wall" OR') == '"plant"* "cell wall" "OR"'
+    assert match_expression('say "hi') == '"say" """hi"'
+    assert match_expression("  * ") is None
+    assert match_expression(None) is None
+
+def test_search_questions_stems_ranks_and_filters(db):
+    (glucose, planet, cell), _ = _seed(db)
+    # Porter stemming: "plant" also matches "plants"
+    results = search_questions(db, "plant")
+    assert {r["id"] for r in results} == {glucose, cell}
+    assert all(r["relevance"] > 0 for r in results)
+    assert any(SNIPPET_OPEN in r["text_snippet"] for r in results)
+
+    assert [r["id"] for r in search_questions(db, "plant", difficulty="Hard")] == [cell]
+    assert search_questions(db, "plant", subject="Astronomy") == []
+    assert [r["id"] for r in search_questions(db, '"closest to the sun"')] == [planet]
+    # Searched in reference answers too
+    assert [r["id"] for r in search_questions(db, "chloroplast*")] == [cell]
+
+def test_listing_without_query_pages_by_id(db):
+    ids, _ = _seed(db)
+    first = search_questions(db, limit=2)
+    assert [r["id"] for r in first] == ids[:2]
+    assert [r["id"] for r in search_questions(db, limit=2, after_id=first[-1]["id"])] == ids[2:]
+    assert [r["id"] for r in search_questions(db, subject="Biology")] == [ids[0], ids[2]]
+
+def test_search_evaluations_filters(db):
+    (glucose, _, _), (good, bad, mercury) = _seed(db)
+    assert {r["id"] for r in search_evaluations(db, "correct")} == {good, mercury}
+    assert [r["id"] for r in search_evaluations(db, "sugar")] == [bad]
+    assert [r["id"] for r in search_evaluations(db, model="openai/gpt-4o", subject="Biology")] == [good]
+    assert [r["id"] for r in search_evaluations(db, score_ranges={"accuracy": (None, 50)})] == [bad]
+    assert [r["id"] for r in search_evaluations(db, question_id=glucose, score_ranges={"clarity": (61, None)})] == [good]
+    assert search_evaluations(db, "mercury")[0]["question_text"] == "Which planet is closest to the sun?"
+
+def test_index_follows_updates_and_deletes(db):
+    (glucose, _, _), _ = _seed(db)
+    question = db.get(QuestionDB, glucose)
+    question.text = "How do leaves capture light energy?"
+    db.commit()
+    assert search_questions(db, "glucose") == []
+    assert [r["id"] for r in search_questions(db, "leaves")] == [glucose]
+
+    db.delete(question)
+    db.commit()
+    assert search_questions(db, "leaves") == []
+
+def test_matches_past_the_rank_window_are_still_returned(db, monkeypatch):
+    monkeypatch.setattr(search_index, "SEARCH_RANK_WINDOW", 3)
+    ensure_search_index()
+    questions = [QuestionDB(text=f"Question {i} about photosynthesis", subject="Biology", reference_answer="x")
+                 for i in range(7)]
+    db.add_all(questions)
+    db.commit()
+    ids = [q.id for q in questions]
+
+    pages = [search_questions(db, "photosynthesis", limit=2, skip=skip) for skip in range(0, 8, 2)]
+    found = [r["id"] for page in pages for r in page]
+    assert sorted(found) == ids
+    # The newest three are ranked first, the rest follow newest first
+    assert set(found[:3]) == set(ids[-3:])
+    assert found[3:] == ids[3::-1]
+    assert search_questions(db, "photosynthesis", skip=7) == []
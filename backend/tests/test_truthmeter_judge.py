@@ -0,0 +1,11 @@
+from app.services.truthmeter_judge import TruthMeterJudgeModel
+
+def test_cache_keys_follow_the_rubric_version(monkeypatch):
+    judge = TruthMeterJudgeModel()
+    args = ("What is 2+2?", "4", "4")
+    current = judge.cache_key(*args)
+    assert judge.cache_key(*args, batch=True) != current
+
+    # Scores cached under the previous rubric must not be served
+    monkeypatch.setattr(TruthMeterJudgeModel, "PROMPT_VERSION", "strict-rubric-1")
+    assert judge.cache_key(*args) != current
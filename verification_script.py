@@ -33,7 +33,7 @@ def test_api():
 
         # 4. Run Evaluation
         print("Running Evaluation...")
-        res = requests.post(f"{BASE_URL}/evaluations/run/{q_id}?model_provider=openai&model_name=gpt-4o")
+        res = requests.post(f"{BASE_URL}/evaluations/run/{q_id}?model_provider=openai&model_name=gpt-4o&wait=120")
         print(f"Evaluation Result: {res.status_code}")
         if res.status_code == 200:
             print(f"Score: {res.json()}")